@@ -2,8 +2,9 @@ import os
 import datetime as dt
 from typing import Optional
 
-from sqlalchemy import create_engine, Integer, String, Float, DateTime, inspect, text, ForeignKey
+from sqlalchemy import create_engine, Integer, String, Float, DateTime, Text, Index, inspect, text, ForeignKey
 from sqlalchemy.orm import declarative_base, Mapped, mapped_column, sessionmaker, relationship
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker, AsyncSession
 
 def _normalize_db_url(url: str) -> str:
     if not url:
@@ -20,8 +21,32 @@ DATABASE_URL = _normalize_db_url(os.getenv("DATABASE_URL", ""))
 if not DATABASE_URL:
     raise RuntimeError("Chýba DATABASE_URL")
 
-engine = create_engine(DATABASE_URL, pool_pre_ping=True)
+def _async_db_url(url: str) -> str:
+    # psycopg 3 má async režim pod tým istým dialektom; psycopg2 nie
+    if url.startswith("sqlite:"):
+        return "sqlite+aiosqlite:" + url[len("sqlite:"):]
+    return url.replace("+psycopg2", "+psycopg")
+
+def _envi(name: str, default: int) -> int:
+    try: return int(os.getenv(name, str(default)))
+    except: return int(default)
+
+def _pool_kw(prefix: str, size: int, overflow: int) -> dict:
+    # sqlite (StaticPool/SingletonThreadPool pre :memory:) pool_size/max_overflow nepozná
+    if DATABASE_URL.startswith("sqlite"):
+        return {}
+    return {"pool_size": _envi(prefix + "POOL_SIZE", size), "max_overflow": _envi(prefix + "MAX_OVERFLOW", overflow)}
+
+# Dva pooly v jednom procese: sync pre init_db a sync endpointy (threadpool FastAPI),
+# async pre scheduler joby a async endpointy. Spolu max
+# DB_POOL_SIZE + DB_MAX_OVERFLOW + DB_ASYNC_POOL_SIZE + DB_ASYNC_MAX_OVERFLOW spojení.
+engine = create_engine(DATABASE_URL, pool_pre_ping=True, **_pool_kw("DB_", 5, 10))
 SessionLocal = sessionmaker(bind=engine, autocommit=False, autoflush=False)
+
+ASYNC_DATABASE_URL = _async_db_url(DATABASE_URL)
+async_engine = create_async_engine(ASYNC_DATABASE_URL, pool_pre_ping=True, **_pool_kw("DB_ASYNC_", 5, 5))
+# expire_on_commit=False: objekty ostanú čitateľné po commite bez ďalšieho (implicitného) dotazu
+AsyncSessionLocal = async_sessionmaker(async_engine, class_=AsyncSession, autoflush=False, expire_on_commit=False)
 Base = declarative_base()
 
 # -------- Trades --------
@@ -71,6 +96,8 @@ class Signal(Base):
 
 class SignalPick(Base):
     __tablename__ = "signal_picks"
+    # cooldown: posledných n pickov pre coin (ROW_NUMBER() OVER (PARTITION BY coin_id ORDER BY id DESC))
+    __table_args__ = (Index("ix_signal_picks_coin_id_id", "coin_id", "id"),)
     id: Mapped[int] = mapped_column(Integer, primary_key=True)
     signal_id: Mapped[int] = mapped_column(Integer, ForeignKey("signals.id", ondelete="CASCADE"))
     coin_id: Mapped[str] = mapped_column(String(100), index=True)
@@ -79,6 +106,42 @@ class SignalPick(Base):
 
     signal: Mapped[Signal] = relationship("Signal", back_populates="picks")
 
+# -------- News (spracované RSS položky) --------
+class NewsEntry(Base):
+    __tablename__ = "news_entries"
+    key: Mapped[str] = mapped_column(String(40), primary_key=True)          # sha1(guid | link | title)
+    published_at: Mapped[dt.datetime] = mapped_column(DateTime, index=True)  # UTC
+    matches: Mapped[str] = mapped_column(Text, default="[]")                 # JSON [[id, symbol, name, cashtag], ...]
+    seen_at: Mapped[dt.datetime] = mapped_column(DateTime, default=lambda: dt.datetime.utcnow())
+
+# -------- AI verdikty (cache pre wildcards) --------
+class AiVerdict(Base):
+    __tablename__ = "ai_verdicts"
+    key: Mapped[str] = mapped_column(String(40), primary_key=True)          # sha1(symbol, režim, model, buckety)
+    verdict: Mapped[str] = mapped_column(Text)                               # JSON {approve, horizon_days, rationale}
+    created_at: Mapped[dt.datetime] = mapped_column(DateTime, index=True, default=lambda: dt.datetime.utcnow())
+
+# -------- E-mail outbox (fronta pre notifikačný worker) --------
+class EmailOutbox(Base):
+    __tablename__ = "email_outbox"
+    id: Mapped[int] = mapped_column(Integer, primary_key=True)
+    subject: Mapped[str] = mapped_column(String(300))
+    html: Mapped[str] = mapped_column(Text)
+    created_at: Mapped[dt.datetime] = mapped_column(DateTime, default=lambda: dt.datetime.utcnow())
+    # čakajúce: sent_at IS NULL a next_attempt_at <= teraz
+    next_attempt_at: Mapped[dt.datetime] = mapped_column(DateTime, index=True, default=lambda: dt.datetime.utcnow())
+    sent_at: Mapped[Optional[dt.datetime]] = mapped_column(DateTime, nullable=True, index=True)
+    attempts: Mapped[int] = mapped_column(Integer, default=0)
+    last_error: Mapped[Optional[str]] = mapped_column(String(300), nullable=True)
+
+# -------- Výsledky behov (signál, dips, wildcards) zdieľané medzi procesmi --------
+class ResultEntry(Base):
+    __tablename__ = "results"
+    name: Mapped[str] = mapped_column(String(40), primary_key=True)   # signal | dips | wildcards
+    version: Mapped[int] = mapped_column(Integer, default=1)           # +1 pri každom publish
+    payload: Mapped[str] = mapped_column(Text)                         # JSON
+    updated_at: Mapped[dt.datetime] = mapped_column(DateTime, default=lambda: dt.datetime.utcnow())
+
 def _ensure_columns() -> None:
     insp = inspect(engine)
     if "trades" not in insp.get_table_names():
@@ -99,6 +162,12 @@ def _ensure_columns() -> None:
         with engine.begin() as conn:
             conn.execute(text(f'ALTER TABLE trades {", ".join(to_add)}'))
 
+def _ensure_indexes() -> None:
+    # create_all pridá indexy iba k novým tabuľkám; existujúce ich dostanú tu
+    with engine.begin() as conn:
+        conn.execute(text("CREATE INDEX IF NOT EXISTS ix_signal_picks_coin_id_id ON signal_picks (coin_id, id)"))
+
 def init_db() -> None:
     Base.metadata.create_all(bind=engine)
     _ensure_columns()
+    _ensure_indexes()
@@ -9,11 +9,21 @@ from sqlalchemy.orm import Session
 
 from . import scheduler as sched
 from .services.notifier import send_email
-from .services.coingecko import ping as cg_ping_api, fetch_many_hourly, get_markets_top200_cached
+from .services.http import close_clients
+from .services.coingecko import (
+    ping as cg_ping_api, limiter as cg_limiter,
+    start_markets_refresher, stop_markets_refresher, markets_cache_state,
+)
+from .services import snapshot
+from .services import news
 from .services.news import fetch_candidates_from_rss
 from .services.ai import evaluate_wildcards
+from .services import verdict_cache
+from .services import outbox, results
+from .services.leader import LeaderElector
 from .services.dips import pick_dips   # <-- NOVÉ
-from .db import SessionLocal, init_db, Trade
+from .services.features import extract_features
+from .db import SessionLocal, async_engine, init_db, Trade
 
 logging.basicConfig(level=logging.INFO)
 app = FastAPI(title="crypto-broker")
@@ -27,31 +37,69 @@ def _envf(name: str, default: float) -> float:
     except: return float(default)
 
 # ---------- shared state ----------
-LAST_WILDCARDS: List[Dict] = []
-LAST_DIPS: List[Dict] = []  # <-- NOVÉ
+# posledné výsledky (signal, dips, wildcards) sú v results.store (DB + cache), nie v globáloch
 
 @app.on_event("startup")
-def _start_scheduler():
+async def _start_scheduler():
     init_db()
+    await results.store.preload()
+    await sched.warm_recent_picks()
     sch = sched.create_scheduler()
-    sch.start()
+    # joby beží iba líder (leader.py); ostatné procesy obsluhujú API
+    sch.start(paused=True)
     app.state.scheduler = sch
+    app.state.elector = LeaderElector(_on_elected, _on_demoted)
+    await app.state.elector.start()
+
+async def _on_elected():
+    # po failoveri ring neobsahuje picky, ktoré medzitým uložil predošlý líder
+    await sched.warm_recent_picks()
+    sched.activate(app.state.scheduler)
+    start_markets_refresher("usd")
+    outbox.start_worker()
     logging.info("Scheduler started (cron: 07:30, 13:00, 22:00; TZ %s)", os.getenv("TZ", "Europe/Bratislava"))
 
+async def _on_demoted():
+    app.state.scheduler.pause()
+    await stop_markets_refresher()
+    await outbox.stop_worker()
+    logging.info("Scheduler paused (standby)")
+
+@app.on_event("shutdown")
+async def _shutdown():
+    el = getattr(app.state, "elector", None)
+    if el is not None:
+        await el.stop()
+    sch = getattr(app.state, "scheduler", None)
+    if sch is not None:
+        sch.shutdown(wait=False)
+    await stop_markets_refresher()
+    await outbox.stop_worker()
+    await close_clients()
+    await async_engine.dispose()
+
+def _is_leader() -> bool:
+    el = getattr(app.state, "elector", None)
+    return el is not None and el.is_leader
+
 @app.get("/")
 def root():
-    return {"status": "ok", "app": "crypto-broker", "scheduler": "running"}
+    el = getattr(app.state, "elector", None)
+    leader = _is_leader()
+    return {"status": "ok", "app": "crypto-broker", "scheduler": "running" if leader else "standby",
+            "leader": el.state() if el is not None else None}
 
 @app.get("/signal")
-def get_signal():
-    if sched.LAST_SIGNAL is None:
+async def get_signal():
+    sig = await results.store.get("signal")
+    if sig is None:
         return {"ready": False, "message": "Zatiaľ nie je signál. Počkaj na plánovaný beh alebo použi /run-now."}
     return {
         "ready": True,
-        "created_at": sched.LAST_SIGNAL.created_at,
-        "regime": sched.LAST_SIGNAL.regime,
-        "picks": [p.__dict__ for p in sched.LAST_SIGNAL.picks],
-        "note": sched.LAST_SIGNAL.note,
+        "created_at": sig["created_at"],
+        "regime": sig["regime"],
+        "picks": sig["picks"],
+        "note": sig["note"],
     }
 
 @app.get("/run-now")
@@ -59,50 +107,45 @@ async def run_now():
     await sched.job_morning_scan()
     return {"ok": True}
 
+async def _publish_quiet(name: str, value) -> None:
+    try: await results.store.publish(name, value)
+    except Exception as e:
+        logging.warning("publish %s failed: %s", name, e)
+
 # ---------- WILDCARDS (AI) ----------
+WILDCARD_FEATURES = ("mom_3h", "mom_24h", "mom_7d", "atr_pct", "ema50", "rsi")
+
 def _enrich_from_prices(cid: str, prices: List[List[float]], seed: Dict) -> Optional[Dict]:
-    from .services.indicators import pct_change, atr_from_closes, ema, rsi
     closes = [p[1] for p in prices]
     if len(closes) < 200:
         return None
-    close = closes[-1]
-    mom_3h  = pct_change(close, closes[-4]) if len(closes) > 4 else 0.0
-    mom_24h = pct_change(close, closes[-24]) if len(closes) > 24 else 0.0
-    mom_7d  = pct_change(close, closes[-24*7]) if len(closes) > 24*7 else 0.0
-    atr = atr_from_closes(closes, period=14)
-    atr_pct = (atr[-1] / close) if close else 0.0
-    em50 = ema(closes, 50)[-1]
-    rsi14 = rsi(closes, 14)[-1]
+    f = extract_features(closes, WILDCARD_FEATURES)
     z = dict(seed)
-    z.update({
-        "price": float(close),
-        "mom_3h": float(mom_3h),
-        "mom_24h": float(mom_24h),
-        "mom_7d": float(mom_7d),
-        "atr_pct": float(atr_pct),
-        "ema50": float(em50),
-        "rsi": float(rsi14),
-    })
+    z.update({k: f[k] for k in ("price",) + WILDCARD_FEATURES})
     return z
 
 @app.get("/run-wildcards")
 async def run_wildcards():
-    global LAST_WILDCARDS
     try:
-        markets = await get_markets_top200_cached("usd", ttl_minutes=10)
+        snap = await snapshot.get()
+        markets = list(snap.markets)
         vol_by_id = {m.get("id"): float(m.get("total_volume") or 0.0) for m in markets if m.get("id")}
 
         pool_n = _envi("WILDCARDS_POOL", 12)
-        cands = fetch_candidates_from_rss(markets, hours_back=36, max_candidates=pool_n)
+        # kandidáti zo živého news indexu (plní ho job_news_poll); pred prvým pollom priamo z RSS
+        if news.LAST_POLL is not None:
+            cands = news.top(pool_n)
+        else:
+            cands = await fetch_candidates_from_rss(markets, hours_back=36, max_candidates=pool_n)
         if not cands:
-            LAST_WILDCARDS = []
+            await _publish_quiet("wildcards", [])
             return {"ok": True, "items": []}
 
         for c in cands:
             c["vol24"] = vol_by_id.get(c["id"], 0.0)
 
         ids = [c["id"] for c in cands]
-        charts = await fetch_many_hourly(ids, days=10)
+        charts = (await snapshot.with_charts(ids, days=10)).charts
         enriched: List[Dict] = []
         for c in cands:
             data = charts.get(c["id"], {})
@@ -111,38 +154,46 @@ async def run_wildcards():
                 enriched.append(row)
 
         if not enriched:
-            LAST_WILDCARDS = []
+            await _publish_quiet("wildcards", [])
             return {"ok": True, "items": []}
 
-        regime = sched.LAST_SIGNAL.regime if sched.LAST_SIGNAL else "risk-on"
-        rated = evaluate_wildcards(enriched, regime=regime)
+        regime = snap.regime_text
+        rated = await evaluate_wildcards(enriched, regime=regime)
 
         approved = [x for x in rated if x.get("ai_approve")]
         approved.sort(key=lambda x: (x.get("news_score", 0.0), x.get("mom_7d", 0.0)), reverse=True)
         k = _envi("WILDCARDS_COUNT", 2)
-        LAST_WILDCARDS = approved[:k]
-        return {"ok": True, "items": LAST_WILDCARDS}
+        items = approved[:k]
+        await _publish_quiet("wildcards", items)
+        return {"ok": True, "items": items}
     except Exception as e:
         logging.exception("wildcards error: %s", e)
-        LAST_WILDCARDS = []
+        await _publish_quiet("wildcards", [])
         return {"ok": False, "error": str(e)}
 
+@app.get("/news/top")
+def news_top(n: int = 20):
+    if not _is_leader():
+        # news index plní iba job_news_poll u lídra
+        return {"ok": False, "error": "not leader", "leader": False}
+    return {"ok": True, "items": news.top(n), **news.index_state()}
+
 @app.get("/wildcards")
-def wildcards():
-    return {"ok": True, "items": LAST_WILDCARDS}
+async def wildcards():
+    return {"ok": True, "items": await results.store.get("wildcards", [])}
 
 # ---------- DIPS (nové) ----------
 @app.get("/run-dips")
 async def run_dips():
     """
-    1) markets: TOP200 + 24h % zmena a vol24
+    1) markets: TOP200 + 24h % zmena a vol24 (zo zdieľaného snapshotu)
     2) vyber ~40 najväčších 24h prepadov
-    3) grafy (10 dní hourly) -> metriky
+    3) grafy (10 dní hourly) -> metriky; sťahujú sa iba chýbajúce v snapshote
     4) filtre a scoring -> top K
     """
-    global LAST_DIPS
     try:
-        markets = await get_markets_top200_cached("usd", ttl_minutes=10)
+        snap = await snapshot.get()
+        markets = list(snap.markets)
         # kandidáti: sort podľa 24h zmeny (už v markets)
         ids_sorted = []
         for m in markets:
@@ -154,7 +205,7 @@ async def run_dips():
         ids_sorted.sort(key=lambda x: x[0])  # najväčší prepad navrchu
         ids_pick = [cid for _, cid in ids_sorted[:40]]
 
-        charts = await fetch_many_hourly(ids_pick, days=10)
+        charts = (await snapshot.with_charts(ids_pick, days=10)).charts
 
         dips = pick_dips(
             markets=markets,
@@ -165,16 +216,16 @@ async def run_dips():
             min_vol24=float(os.getenv("DIPS_MIN_VOL", "5000000")),
         )
 
-        LAST_DIPS = dips
+        await _publish_quiet("dips", dips)
         return {"ok": True, "items": dips}
     except Exception as e:
         logging.exception("dips error: %s", e)
-        LAST_DIPS = []
+        await _publish_quiet("dips", [])
         return {"ok": False, "error": str(e)}
 
 @app.get("/dips")
-def get_dips():
-    return {"ok": True, "items": LAST_DIPS}
+async def get_dips():
+    return {"ok": True, "items": await results.store.get("dips", [])}
 
 # ---------- misc ----------
 @app.get("/test-email")
@@ -185,10 +236,23 @@ def test_email():
     except Exception as e:
         return {"ok": False, "error": str(e)}
 
+@app.get("/email-outbox")
+async def email_outbox_status():
+    return {"ok": True, **(await outbox.state())}
+
 @app.get("/cg-ping")
 async def cg_ping_route():
     data = await cg_ping_api()
-    return {"ok": True, "plan": os.getenv("COINGECKO_PLAN"), "resp": data}
+    return {"ok": True, "plan": os.getenv("COINGECKO_PLAN"), "resp": data, "rate_limit": cg_limiter.state()}
+
+@app.get("/ai-cache")
+def ai_cache_status():
+    return {"ok": True, **verdict_cache.cache.stats()}
+
+@app.get("/markets-status")
+def markets_status():
+    snap = snapshot.current()
+    return {"ok": True, **markets_cache_state("usd"), "snapshot": snap.info() if snap else None}
 
 @app.get("/dashboard")
 def dashboard(request: Request):
@@ -275,12 +339,13 @@ def create_trade(body: TradeIn):
 
         FX = _envf("FX_EURUSD", 1.10)
         atr_pct = None
-        if sched.LAST_SIGNAL:
-            for p in sched.LAST_SIGNAL.picks:
-                if p.id == body.coin_id:
-                    atr_pct = p.atr_pct
+        sig = results.store.get_sync("signal")
+        if sig:
+            for p in sig["picks"]:
+                if p["id"] == body.coin_id:
+                    atr_pct = p["atr_pct"]
                     if body.buy_price_usd is None:
-                        body.buy_price_usd = p.price
+                        body.buy_price_usd = p["price"]
                     break
 
         t = Trade(
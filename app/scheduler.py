@@ -2,28 +2,28 @@ import os
 import math
 import logging
 import asyncio
+from collections import deque
+from dataclasses import asdict
 from datetime import datetime, timedelta
 from typing import List, Dict, Optional, Set
 
 from apscheduler.schedulers.asyncio import AsyncIOScheduler
 from apscheduler.triggers.cron import CronTrigger
-from sqlalchemy.orm import Session
-
-from .services.coingecko import (
-    get_markets_top200_cached,
-    fetch_many_hourly,
-    get_simple_prices,
-)
-from .services.indicators import atr_from_closes, pct_change, ema, rsi
-from .services.regime import regime_flag
+from apscheduler.triggers.interval import IntervalTrigger
+from sqlalchemy import func, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from .services.coingecko import get_simple_prices
+from .services.features import extract_features
+from .services.indicator_state import advance_features
+from .services import snapshot, news
 from .services.scorer import compute_scores
-from .services.notifier import send_email
+from .services import outbox, results
 from .services.signals import Pick, SignalPack
 from .services.coinbase import get_coinbase_usd_symbols_cached
-from .db import SessionLocal, Trade, Signal, SignalPick
+from .db import AsyncSessionLocal, Trade, Signal, SignalPick
 
 _scheduler: Optional[AsyncIOScheduler] = None
-LAST_SIGNAL: Optional[SignalPack] = None
 
 STABLE_IDS = {
     "tether","usd-coin","dai","usdd","frax","first-digital-usd","paxos-standard","true-usd","paypal-usd","gemini-dollar","usdp"
@@ -37,67 +37,135 @@ def _envi(name: str, default: int) -> int:
     try: return int(os.getenv(name, str(default)))
     except: return int(default)
 
-def _safe_send_email(subject: str, html: str) -> None:
-    try: send_email(subject, html)
+async def _notify(subject: str, html: str) -> None:
+    try: await outbox.enqueue(subject, html)
     except Exception as e:
-        logging.warning("email send failed: %s", e)
+        logging.warning("email enqueue failed: %s", e)
+
+SCAN_FEATURES = ("mom_3h", "mom_24h", "mom_7d", "atr_pct", "ema50", "ema100", "rsi", "spark")
+SERIES_FEATURES = ("mom_3h", "mom_24h", "mom_7d", "spark")
 
 def _enrich_from_prices(id_: str, prices: List[List[float]], vol24: float = 1.0) -> Optional[Dict]:
     closes = [p[1] for p in prices]
     if len(closes) < 200:
         return None
-    close = closes[-1]
-    mom_3h  = pct_change(close, closes[-4]) if len(closes) > 4 else 0.0
-    mom_24h = pct_change(close, closes[-24]) if len(closes) > 24 else 0.0
-    mom_7d  = pct_change(close, closes[-24*7]) if len(closes) > 24*7 else 0.0
-    atr = atr_from_closes(closes, period=14)
-    atr_pct = (atr[-1] / close) if close else 0.0
-    em50 = ema(closes, 50)[-1]
-    em100 = ema(closes, 100)[-1]
-    rsi14 = rsi(closes, 14)[-1]
+    # EMA/RSI/ATR z inkrementálneho stavu (O(1) na novú sviečku), inak plný prepočet
+    inc = None
+    if os.getenv("INCREMENTAL_INDICATORS", "1") == "1":
+        try: inc = advance_features(id_, prices, ema_periods=(50, 100))
+        except Exception as e:
+            logging.warning("incremental indicators %s failed: %s", id_, e)
+    f = extract_features(closes, SCAN_FEATURES if inc is None else SERIES_FEATURES)
+    if inc is not None:
+        f.update(inc)
     symbol = id_[:6].upper(); name = id_
     return {
         "id": id_, "symbol": symbol, "name": name,
-        "price": float(close), "vol24": float(vol24),
-        "mom_3h": float(mom_3h), "mom_24h": float(mom_24h), "mom_7d": float(mom_7d),
-        "atr_pct": float(atr_pct),
-        "ema50": float(em50), "ema100": float(em100),
-        "ema_above_50": 1 if close > em50 else 0,
-        "ema_above_100": 1 if close > em100 else 0,
-        "rsi": float(rsi14),
-        "trend_flag": 1 if mom_7d > 0 else 0,
+        "price": f["price"], "vol24": float(vol24),
+        "mom_3h": f["mom_3h"], "mom_24h": f["mom_24h"], "mom_7d": f["mom_7d"],
+        "atr_pct": f["atr_pct"],
+        "ema50": f["ema50"], "ema100": f["ema100"],
+        "ema_above_50": f["ema_above_50"],
+        "ema_above_100": f["ema_above_100"],
+        "rsi": f["rsi"],
+        "trend_flag": 1 if f["mom_7d"] > 0 else 0,
         # mini sparkline: posledných 50 close
-        "spark": [float(x) for x in closes[-50:]],
+        "spark": f["spark"],
     }
 
+# ---------- cooldown história ----------
+# Ring buffer posledných pickov pre každý coin: coin_id -> deque[(pick_id, score)], najnovší vpravo.
+# Zahreje sa z DB pri štarte a dopĺňa sa v _persist_signal. Picky ukladajú aj iné procesy
+# (predošlý líder, /run-now na followeri), preto _recent_scores porovná max(id) v DB so
+# _recent_synced_id (po ktoré ring určite zodpovedá DB) a pri rozdiele ring znova zahreje.
+COOLDOWN_RING = _envi("COOLDOWN_RING", 8)
+_recent_picks: Dict[str, deque] = {}
+_recent_warm = False
+_recent_synced_id = 0
+
+def _recent_push(coin_id: str, pick_id: int, score: float) -> None:
+    dq = _recent_picks.get(coin_id)
+    if dq is None:
+        dq = _recent_picks[coin_id] = deque(maxlen=COOLDOWN_RING)
+    dq.append((pick_id, score))
+
+def _recent_stmt(n: int, ids: Optional[List[str]] = None):
+    """Posledných n pickov pre každý coin (najnovšie prvé) jedným window dotazom."""
+    rn = func.row_number().over(partition_by=SignalPick.coin_id, order_by=SignalPick.id.desc()).label("rn")
+    q = select(SignalPick.coin_id, SignalPick.id, SignalPick.score, rn)
+    if ids is not None:
+        q = q.where(SignalPick.coin_id.in_(ids))
+    sub = q.subquery()
+    return select(sub.c.coin_id, sub.c.id, sub.c.score).where(sub.c.rn <= n).order_by(sub.c.coin_id, sub.c.id.desc())
+
+async def _query_recent(db: AsyncSession, n: int, ids: Optional[List[str]] = None) -> Dict[str, List]:
+    out: Dict[str, List] = {}
+    for cid, pid, score in (await db.execute(_recent_stmt(n, ids))).all():
+        out.setdefault(cid, []).append((pid, score))
+    return out
+
+async def warm_recent_picks() -> None:
+    """Naplní ring buffer z DB (štart, zvolenie za lídra, zmena v DB mimo tohto procesu)."""
+    global _recent_warm, _recent_synced_id
+    try:
+        async with AsyncSessionLocal() as db:
+            hist = await _query_recent(db, COOLDOWN_RING)
+        _recent_picks.clear()
+        for cid, items in hist.items():
+            for pid, score in reversed(items):
+                _recent_push(cid, pid, score)
+        # najnovší pick v DB je najnovší aj pre svoj coin (rn = 1), takže je v hist
+        _recent_synced_id = max((items[0][0] for items in hist.values()), default=0)
+        _recent_warm = True
+        logging.info("cooldown ring warmed: %d coins", len(_recent_picks))
+    except Exception as e:
+        logging.warning("cooldown ring warm failed: %s", e)
+
 async def _persist_signal(picks: List[Dict]) -> None:
-    db: Session = SessionLocal()
+    global _recent_synced_id
     try:
-        s = Signal()
-        db.add(s); db.flush()
-        for p in picks:
-            db.add(SignalPick(signal_id=s.id, coin_id=p["id"], symbol=p["symbol"], score=float(p["score"])))
-        db.commit()
+        async with AsyncSessionLocal() as db:
+            s = Signal()
+            db.add(s); await db.flush()
+            rows = [SignalPick(signal_id=s.id, coin_id=p["id"], symbol=p["symbol"], score=float(p["score"])) for p in picks]
+            db.add_all(rows)
+            await db.commit()
+        for sp in rows:
+            _recent_push(sp.coin_id, sp.id, sp.score)
+        # naše id nadväzujú na synced -> medzi nimi nezapisoval nikto iný
+        pids = sorted(sp.id for sp in rows)
+        if pids and pids[0] == _recent_synced_id + 1 and pids[-1] - pids[0] == len(pids) - 1:
+            _recent_synced_id = pids[-1]
     except Exception as e:
         logging.warning("persist signal failed: %s", e)
-    finally:
-        db.close()
+
+async def _recent_scores(ids: List[str], n: int) -> Dict[str, List[float]]:
+    """Posledných n skóre pre ids (najnovšie prvé) – z ring bufferu (po kontrole max(id) v DB), inak jeden DB dotaz."""
+    if _recent_warm and n <= COOLDOWN_RING:
+        try:
+            async with AsyncSessionLocal() as db:
+                top = (await db.execute(select(func.max(SignalPick.id)))).scalar() or 0
+            if top != _recent_synced_id:
+                await warm_recent_picks()
+        except Exception as e:
+            logging.warning("cooldown ring sync check failed, using ring: %s", e)
+        return {cid: [sc for _, sc in reversed(_recent_picks[cid])][:n] for cid in ids if cid in _recent_picks}
+    async with AsyncSessionLocal() as db:
+        return {cid: [sc for _, sc in items] for cid, items in (await _query_recent(db, n, ids)).items()}
 
 async def _cooldown_filter(rows: List[Dict]) -> List[Dict]:
     n = _envi("COOLDOWN_BEHS", 0)
     if n <= 0:
         return rows
-    db: Session = SessionLocal()
     try:
+        hist = await _recent_scores([r["id"] for r in rows], n)
         out: List[Dict] = []
         for r in rows:
             # pozri posledné n signálov pre coin
-            q = db.query(SignalPick).filter(SignalPick.coin_id == r["id"]).order_by(SignalPick.id.desc()).limit(n)
-            last = list(q)
-            if len(last) < n:
+            scores = hist.get(r["id"], [])
+            if len(scores) < n:
                 out.append(r); continue
             # ak bol v každom z posledných n a skóre klesá -> preskoč tento beh
-            scores = [lp.score for lp in last]
             if all(isinstance(x, float) for x in scores) and r.get("score") is not None:
                 if r["score"] < scores[0] and scores == sorted(scores, reverse=True):
                     # posledné skóre klesajúce: preskoč
@@ -106,11 +174,8 @@ async def _cooldown_filter(rows: List[Dict]) -> List[Dict]:
         return out
     except Exception:
         return rows
-    finally:
-        db.close()
 
 async def _build_and_store_signal(rows: List[Dict], regime: int) -> None:
-    global LAST_SIGNAL
     regime_text = "risk-on" if regime == 1 else "risk-off"
 
     atr_pct_max = _envf("ATR_PCT_MAX", 0.08)
@@ -152,8 +217,8 @@ async def _build_and_store_signal(rows: List[Dict], regime: int) -> None:
 
     # e-maily
     if regime == 0:
-        _safe_send_email("Krypto Broker – RISK-OFF",
-                         "<h3>Režim trhu: RISK-OFF ⚠️</h3><p>Odporúčanie: presun do stablecoinov (manuálne).</p>")
+        await _notify("Krypto Broker – RISK-OFF",
+                      "<h3>Režim trhu: RISK-OFF ⚠️</h3><p>Odporúčanie: presun do stablecoinov (manuálne).</p>")
     else:
         rows_html = "".join([
             f"<tr><td>{p['symbol']}</td><td>{p['name']}</td>"
@@ -165,10 +230,10 @@ async def _build_and_store_signal(rows: List[Dict], regime: int) -> None:
         table = ("<table border='1' cellpadding='6' cellspacing='0'>"
                  "<tr><th>Symbol</th><th>Názov</th><th>Cena</th><th>Skóre</th>"
                  "<th>Váha</th><th>24h</th><th>ATR%</th></tr>" + rows_html + "</table>")
-        _safe_send_email(f"Krypto Broker – TOP {top_k} – návrh nákupu",
-                         f"<h3>TOP {top_k} – návrh nákupu</h3><p>Režim: {regime_text}</p>{table}")
+        await _notify(f"Krypto Broker – TOP {top_k} – návrh nákupu",
+                      f"<h3>TOP {top_k} – návrh nákupu</h3><p>Režim: {regime_text}</p>{table}")
 
-    LAST_SIGNAL = SignalPack(
+    pack = SignalPack(
         created_at=datetime.utcnow().isoformat() + "Z",
         regime=regime_text,
         picks=[Pick(
@@ -180,6 +245,11 @@ async def _build_and_store_signal(rows: List[Dict], regime: int) -> None:
         ) for p in picks],
         note=("risk-off upozornenie poslalo iba varovanie" if regime == 0 else ""),
     )
+    # posledný signál pre všetky workery (a po reštarte)
+    try:
+        await results.store.publish("signal", asdict(pack))
+    except Exception as e:
+        logging.warning("publish signal failed: %s", e)
 
     # ulož históriu pre cooldown/backtest
     try:
@@ -189,21 +259,28 @@ async def _build_and_store_signal(rows: List[Dict], regime: int) -> None:
 
 async def _select_and_score(use_fresh_markets: bool, coinbase_only: bool) -> None:
     logging.info("scan start (fresh_markets=%s, coinbase_only=%s)", use_fresh_markets, coinbase_only)
-    ttl = 1 if use_fresh_markets else 1440
-    markets = await get_markets_top200_cached("usd", ttl_minutes=ttl)
-    reg = await regime_flag()
+    # coinbase symboly bežia súbežne so snapshotom (markets + režim, tie tiež naraz)
+    cb_task = asyncio.ensure_future(get_coinbase_usd_symbols_cached(ttl_minutes=1440)) if coinbase_only else None
+    # nová generácia snapshotu; dips/wildcards potom čítajú z nej
+    try:
+        snap = await snapshot.refresh(fresh_markets=use_fresh_markets)
+    except BaseException:
+        if cb_task: cb_task.cancel()
+        raise
+    markets = list(snap.markets)
+    reg = snap.regime
+
+    # coinbase filter
+    cb_symbols: Set[str] = set()
+    if cb_task is not None:
+        try: cb_symbols = await cb_task
+        except Exception: cb_symbols = set()
 
     if not markets:
         logging.warning("markets empty; skipping selection")
         await _build_and_store_signal([], reg)
         return
 
-    # coinbase filter
-    cb_symbols: Set[str] = set()
-    if coinbase_only:
-        try: cb_symbols = await get_coinbase_usd_symbols_cached(ttl_minutes=1440)
-        except Exception: cb_symbols = set()
-
     min_vol = _envf("MIN_24H_VOLUME_USD", 10_000_000)
     rows: List[Dict] = []
     for m in markets:
@@ -225,13 +302,15 @@ async def _select_and_score(use_fresh_markets: bool, coinbase_only: bool) -> Non
     rows.sort(key=lambda x: x["vol24"], reverse=True)
     pre = rows[:min(len(rows), preselect)]
     ids = [r["id"] for r in pre]
-    charts = await fetch_many_hourly(ids, days=10)
 
+    # grafy tečú do enrichmentu hneď, ako ktorý dobehne (nečakáme na celý gather)
     enriched: List[Dict] = []
     vol_by_id = {r["id"]: r["vol24"] for r in pre}
-    for cid, data in charts.items():
+    async for cid, data in snapshot.stream_charts(ids, days=10):
         row = _enrich_from_prices(cid, data.get("prices", []), vol24=vol_by_id.get(cid, 1.0))
         if row: enriched.append(row)
+    order = {cid: i for i, cid in enumerate(ids)}
+    enriched.sort(key=lambda r: order[r["id"]])
 
     await _build_and_store_signal(enriched, reg)
     logging.info("scan done; enriched=%d", len(enriched))
@@ -252,78 +331,94 @@ async def job_evening_rescore() -> None:
 # ---------- WATCHLIST (vylepšený) ----------
 async def job_watch_open_positions() -> None:
     try:
-        db: Session = SessionLocal()
-        rows: List[Trade] = db.query(Trade).filter(Trade.sold_eur.is_(None)).all()
-        open_ids = list({t.coin_id for t in rows if t.coin_id})
-        if not open_ids:
-            return
-        prices = await get_simple_prices(open_ids, vs="usd")
-
-        drop = _envf("ALERT_DROP_PCT", 0.08)
-        heads_up = _envf("ALERT_HEADS_UP_PCT", 0.05)
-        cooldown_h = _envi("ALERT_COOLDOWN_HOURS", 12)
-        p_lock = _envf("PROFIT_LOCK_PCT", 0.15)
-        stale_days = _envi("STALE_DAYS", 7)
-
-        now = datetime.utcnow()
-        changed = False
-
-        for t in rows:
-            cur = prices.get(t.coin_id)
-            if cur is None:
-                continue
-            t.last_price_usd = cur
-            if t.high_water_usd is None:
-                t.high_water_usd = float(t.buy_price_usd or cur)
-            if cur > float(t.high_water_usd or 0.0):
-                t.high_water_usd = cur
-
-            # heads-up / action
-            hw = float(t.high_water_usd or cur)
-            drawdown = (cur / hw) - 1.0 if hw else 0.0
-
-            def can_send(ts):
-                return ts is None or (now - ts) >= timedelta(hours=cooldown_h)
-
-            if drawdown <= -heads_up and can_send(t.last_heads_up_at):
-                _safe_send_email(
-                    f"ℹ️ Heads-up {t.symbol}: -{abs(drawdown)*100:.2f}% od maxima",
-                    f"<p>Aktuálna: {cur:.6f} USD · High-water: {hw:.6f} USD</p>"
-                )
-                t.last_heads_up_at = now; changed = True
-
-            if drawdown <= -drop and can_send(t.last_alert_at):
-                _safe_send_email(
-                    f"⚠️ Action {t.symbol}: -{abs(drawdown)*100:.2f}% od maxima",
-                    f"<p>Aktuálna: {cur:.6f} USD · High-water: {hw:.6f} USD<br/>Zváž manuálny predaj / posun do stablecoinov.</p>"
-                )
-                t.last_alert_at = now; changed = True
-
-            # profit-lock ping (ak zisk výrazný)
-            if t.buy_price_usd:
-                gain = (cur / t.buy_price_usd) - 1.0
-                if gain >= p_lock and can_send(t.last_profit_ping_at):
-                    _safe_send_email(
-                        f"✅ Profit {t.symbol}: +{gain*100:.2f}%",
-                        f"<p>Navrhujem posunúť stop-loss (trailing, napr. podľa ATR) alebo vybrať časť zisku.</p>"
-                    )
-                    t.last_profit_ping_at = now; changed = True
-
-            # stale ping (dlho nič)
-            if (now - t.invested_at) >= timedelta(days=stale_days) and can_send(t.last_stale_ping_at):
-                _safe_send_email(
-                    f"⏳ Stále otvorené: {t.symbol}",
-                    f"<p>Pozícia otvorená {t.invested_at.isoformat()}Z – zváž uvoľnenie kapitálu.</p>"
-                )
-                t.last_stale_ping_at = now; changed = True
-
-        if changed:
-            db.commit()
+        async with AsyncSessionLocal() as db:
+            rows: List[Trade] = list((await db.execute(select(Trade).where(Trade.sold_eur.is_(None)))).scalars())
+            # uvoľni spojenie do poolu, kým čakáme na ceny (objekty ostávajú v session)
+            await db.commit()
+            open_ids = list({t.coin_id for t in rows if t.coin_id})
+            if not open_ids:
+                return
+            prices = await get_simple_prices(open_ids, vs="usd")
+
+            drop = _envf("ALERT_DROP_PCT", 0.08)
+            heads_up = _envf("ALERT_HEADS_UP_PCT", 0.05)
+            cooldown_h = _envi("ALERT_COOLDOWN_HOURS", 12)
+            p_lock = _envf("PROFIT_LOCK_PCT", 0.15)
+            stale_days = _envi("STALE_DAYS", 7)
+
+            now = datetime.utcnow()
+            changed = False
+            alerts: List[tuple] = []  # (subject, html) -> outbox v tej istej transakcii ako last_*_at
+
+            for t in rows:
+                cur = prices.get(t.coin_id)
+                if cur is None:
+                    continue
+                t.last_price_usd = cur
+                if t.high_water_usd is None:
+                    t.high_water_usd = float(t.buy_price_usd or cur)
+                if cur > float(t.high_water_usd or 0.0):
+                    t.high_water_usd = cur
+
+                # heads-up / action
+                hw = float(t.high_water_usd or cur)
+                drawdown = (cur / hw) - 1.0 if hw else 0.0
+
+                def can_send(ts):
+                    return ts is None or (now - ts) >= timedelta(hours=cooldown_h)
+
+                if drawdown <= -heads_up and can_send(t.last_heads_up_at):
+                    alerts.append((
+                        f"ℹ️ Heads-up {t.symbol}: -{abs(drawdown)*100:.2f}% od maxima",
+                        f"<p>Aktuálna: {cur:.6f} USD · High-water: {hw:.6f} USD</p>"
+                    ))
+                    t.last_heads_up_at = now; changed = True
+
+                if drawdown <= -drop and can_send(t.last_alert_at):
+                    alerts.append((
+                        f"⚠️ Action {t.symbol}: -{abs(drawdown)*100:.2f}% od maxima",
+                        f"<p>Aktuálna: {cur:.6f} USD · High-water: {hw:.6f} USD<br/>Zváž manuálny predaj / posun do stablecoinov.</p>"
+                    ))
+                    t.last_alert_at = now; changed = True
+
+                # profit-lock ping (ak zisk výrazný)
+                if t.buy_price_usd:
+                    gain = (cur / t.buy_price_usd) - 1.0
+                    if gain >= p_lock and can_send(t.last_profit_ping_at):
+                        alerts.append((
+                            f"✅ Profit {t.symbol}: +{gain*100:.2f}%",
+                            f"<p>Navrhujem posunúť stop-loss (trailing, napr. podľa ATR) alebo vybrať časť zisku.</p>"
+                        ))
+                        t.last_profit_ping_at = now; changed = True
+
+                # stale ping (dlho nič)
+                if (now - t.invested_at) >= timedelta(days=stale_days) and can_send(t.last_stale_ping_at):
+                    alerts.append((
+                        f"⏳ Stále otvorené: {t.symbol}",
+                        f"<p>Pozícia otvorená {t.invested_at.isoformat()}Z – zváž uvoľnenie kapitálu.</p>"
+                    ))
+                    t.last_stale_ping_at = now; changed = True
+
+            if alerts and os.getenv("EMAIL_DIGEST", "0") == "1":
+                outbox.add(db, f"Krypto Broker – {len(alerts)} upozornení k pozíciám",
+                           "".join(f"<h3>{subj}</h3>{body}" for subj, body in alerts))
+            else:
+                for subj, body in alerts:
+                    outbox.add(db, subj, body)
+            if changed:
+                await db.commit()
+                outbox.wake()
     except Exception as e:
         logging.exception("watchlist error: %s", e)
-    finally:
-        try: db.close()
-        except: pass
+
+async def job_news_poll() -> None:
+    """Stiahne nové RSS položky do news indexu (wildcards ho iba čítajú)."""
+    try:
+        snap = await snapshot.get()
+        n = await news.poll(list(snap.markets))
+        logging.info("news poll: %d new entries, %d coins in index", n, len(news.index))
+    except Exception as e:
+        logging.exception("news poll error: %s", e)
 
 # ---------- SCHEDULER ----------
 def create_scheduler() -> AsyncIOScheduler:
@@ -340,4 +435,14 @@ def create_scheduler() -> AsyncIOScheduler:
                            id="job_evening", replace_existing=True, max_instances=1, coalesce=True)
         _scheduler.add_job(job_watch_open_positions, CronTrigger(minute=5),
                            id="job_watch", replace_existing=True, max_instances=1, coalesce=True)
+        _scheduler.add_job(job_news_poll, IntervalTrigger(minutes=_envf("NEWS_POLL_MIN", 5.0)),
+                           id="job_news", replace_existing=True, max_instances=1, coalesce=True,
+                           next_run_time=datetime.now(_scheduler.timezone))
     return _scheduler
+
+def activate(sch: AsyncIOScheduler) -> None:
+    """Spustí joby po zvolení za lídra; news poll hneď (inak by ho resume preskočil ako zmeškaný)."""
+    sch.resume()
+    job = sch.get_job("job_news")
+    if job is not None:
+        job.modify(next_run_time=datetime.now(sch.timezone))
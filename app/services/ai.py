@@ -1,5 +1,10 @@
 import os
-from typing import List, Dict
+import json
+import asyncio
+import logging
+from typing import List, Dict, Optional
+
+from . import verdict_cache
 
 OPENAI_KEY = os.getenv("OPENAI_API_KEY", "").strip()
 OPENAI_MODEL = os.getenv("OPENAI_MODEL", "gpt-4o-mini")
@@ -36,50 +41,125 @@ def _free_rule_eval(item: Dict, regime: str) -> Dict:
     rationale = f"7d momentum {mom7:+.1%}, ATR {atrp:.1%}, vol24 ${vol:,.0f}, news_hits {hits}"
     return {"approve": approve, "horizon_days": horiz, "rationale": rationale}
 
-def _with_openai(items: List[Dict], regime: str) -> List[Dict]:
-    """Voliteľná LLM verzia. Ak čokoľvek zlyhá, prepne sa na free pravidlá."""
+AI_MODE = os.getenv("AI_MODE", "concurrent").strip().lower()   # concurrent | batch
+AI_CONCURRENCY = int(_envf("AI_CONCURRENCY", 4))
+AI_TIMEOUT = _envf("AI_TIMEOUT", 20.0)          # s na jedno volanie (batch: na celý request)
+
+_SYSTEM = "You are a cautious crypto trading assistant. Decide approve or veto based only on the metrics."
+_RULES = "Rules: prefer positive 7d momentum, reasonable ATR (<0.15), decent volume; shorter horizon if volatility is high."
+
+def _metrics_line(it: Dict) -> str:
+    return (
+        f"Metrics for {it['symbol']} ({it['name']}): "
+        f"price={it.get('price',0):.6f} USD, vol24={it.get('vol24',0):.0f}, "
+        f"mom_3h={it.get('mom_3h',0):+.3f}, mom_24h={it.get('mom_24h',0):+.3f}, mom_7d={it.get('mom_7d',0):+.3f}, "
+        f"atr_pct={it.get('atr_pct',0):.3f}, news_hits={it.get('news_hits',0)}, news_score={it.get('news_score',0):.2f}."
+    )
+
+def _verdict(parsed: Dict) -> Dict:
+    return {
+        "approve": bool(parsed.get("approve", False)),
+        "horizon_days": float(parsed.get("horizon_days", 2.0)),
+        "rationale": str(parsed.get("rationale", ""))[:180],
+        "source": "llm",  # iba tieto idú do verdict cache
+    }
+
+def _client():
+    from openai import AsyncOpenAI
+    return AsyncOpenAI(api_key=OPENAI_KEY, base_url=os.getenv("OPENAI_BASE_URL") or None)
+
+async def _ask_one(client, it: Dict, regime: str, sem: asyncio.Semaphore) -> Dict:
+    """Jedno volanie s deadlinom; timeout/chyba/nevalidný JSON -> free pravidlá pre túto položku."""
+    content = (
+        f"{_SYSTEM}\n"
+        "Return strict JSON: {\"approve\":true|false, \"horizon_days\": number, \"rationale\":\"<=40 words\"}.\n"
+        f"Market regime: {regime}.\n"
+        f"{_metrics_line(it)} {_RULES}"
+    )
     try:
-        from openai import OpenAI
-        client = OpenAI(api_key=OPENAI_KEY)
-        out: List[Dict] = []
-        for it in items:
-            content = (
-                "You are a cautious crypto trading assistant. Decide approve or veto based only on the metrics.\n"
-                "Return strict JSON: {\"approve\":true|false, \"horizon_days\": number, \"rationale\":\"<=40 words\"}.\n"
-                f"Market regime: {regime}.\n"
-                f"Metrics for {it['symbol']} ({it['name']}): "
-                f"price={it.get('price',0):.6f} USD, vol24={it.get('vol24',0):.0f}, "
-                f"mom_3h={it.get('mom_3h',0):+.3f}, mom_24h={it.get('mom_24h',0):+.3f}, mom_7d={it.get('mom_7d',0):+.3f}, "
-                f"atr_pct={it.get('atr_pct',0):.3f}, news_hits={it.get('news_hits',0)}, news_score={it.get('news_score',0):.2f}. "
-                "Rules: prefer positive 7d momentum, reasonable ATR (<0.15), decent volume; shorter horizon if volatility is high."
-            )
-            resp = client.chat.completions.create(
+        async with sem:
+            resp = await asyncio.wait_for(client.chat.completions.create(
                 model=OPENAI_MODEL,
                 messages=[{"role": "user", "content": content}],
                 temperature=0.2,
                 max_tokens=120,
                 response_format={"type": "json_object"},
-            )
-            try:
-                import json
-                parsed = json.loads(resp.choices[0].message.content)
-                out.append({
-                    "approve": bool(parsed.get("approve", False)),
-                    "horizon_days": float(parsed.get("horizon_days", 2.0)),
-                    "rationale": str(parsed.get("rationale", ""))[:180],
-                })
-            except Exception:
-                out.append(_free_rule_eval(it, regime))
-        return out
-    except Exception:
+            ), AI_TIMEOUT)
+        return _verdict(json.loads(resp.choices[0].message.content))
+    except Exception as e:
+        logging.info("ai verdict %s -> free rules: %s", it.get("symbol"), e or type(e).__name__)
+        return _free_rule_eval(it, regime)
+
+async def _with_openai_concurrent(items: List[Dict], regime: str) -> List[Dict]:
+    """Jedno volanie na kandidáta, max AI_CONCURRENCY naraz."""
+    sem = asyncio.Semaphore(max(1, AI_CONCURRENCY))
+    try:
+        client = _client()
+    except Exception as e:
+        logging.warning("openai client failed, using free rules: %s", e)
         return [_free_rule_eval(it, regime) for it in items]
+    async with client:
+        return list(await asyncio.gather(*(_ask_one(client, it, regime, sem) for it in items)))
 
-def evaluate_wildcards(items: List[Dict], regime: str) -> List[Dict]:
-    """Doplní k položkám AI verdikt + horizon; už bez chýbného 'return v cykle'."""
+async def _with_openai_batch(items: List[Dict], regime: str) -> List[Dict]:
+    """Všetci kandidáti v jednom requeste; chýbajúci/nevalidný verdikt -> free pravidlá."""
+    lines = "\n".join(f"- {_metrics_line(it)}" for it in items)
+    content = (
+        f"{_SYSTEM}\n"
+        "Return strict JSON: {\"verdicts\": [{\"symbol\":\"<symbol>\", \"approve\":true|false, "
+        "\"horizon_days\": number, \"rationale\":\"<=40 words\"}, ...]} with exactly one verdict per symbol.\n"
+        f"Market regime: {regime}.\n"
+        f"{lines}\n{_RULES}"
+    )
+    by_sym: Dict[str, Dict] = {}
+    try:
+        async with _client() as client:
+            resp = await asyncio.wait_for(client.chat.completions.create(
+                model=OPENAI_MODEL,
+                messages=[{"role": "user", "content": content}],
+                temperature=0.2,
+                max_tokens=60 + 100 * len(items),
+                response_format={"type": "json_object"},
+            ), AI_TIMEOUT)
+        for v in json.loads(resp.choices[0].message.content).get("verdicts", []):
+            try:
+                by_sym[str(v["symbol"]).upper()] = _verdict(v)
+            except (KeyError, TypeError, ValueError):
+                continue
+    except Exception as e:
+        logging.info("ai batch -> free rules: %s", e or type(e).__name__)
+    return [by_sym.get(str(it["symbol"]).upper()) or _free_rule_eval(it, regime) for it in items]
+
+async def _with_llm(items: List[Dict], regime: str) -> List[Dict]:
+    if AI_MODE == "batch":
+        return await _with_openai_batch(items, regime)
+    return await _with_openai_concurrent(items, regime)
+
+async def _with_llm_cached(items: List[Dict], regime: str) -> List[Dict]:
+    """Model sa pýta iba na položky, ktoré nie sú vo verdict cache (AI_CACHE=1)."""
+    if os.getenv("AI_CACHE", "1") != "1":
+        return await _with_llm(items, regime)
+    cache = verdict_cache.cache
+    await cache.ensure_loaded()
+    keys = [verdict_cache.key_of(it, regime, OPENAI_MODEL) for it in items]
+    evals: List[Optional[Dict]] = [cache.get(k) for k in keys]
+    todo = [i for i, ev in enumerate(evals) if ev is None]
+    if todo:
+        fresh = await _with_llm([items[i] for i in todo], regime)
+        for i, ev in zip(todo, fresh):
+            evals[i] = ev
+        await cache.store([(keys[i], ev) for i, ev in zip(todo, fresh) if ev.get("source") == "llm"])
+    return evals  # type: ignore[return-value]
+
+async def evaluate_wildcards(items: List[Dict], regime: str) -> List[Dict]:
+    """Doplní k položkám AI verdikt + horizon; LLM voliteľne (batch alebo súbežne), inak free pravidlá."""
     if not items:
         return []
     use_llm = bool(OPENAI_KEY) and os.getenv("AI_WILDCARDS", "1") == "1"
-    evals = _with_openai(items, regime) if use_llm else [_free_rule_eval(it, regime) for it in items]
+    if not use_llm:
+        evals = [_free_rule_eval(it, regime) for it in items]
+    else:
+        evals = await _with_llm_cached(items, regime)
 
     out: List[Dict] = []
     for it, ev in zip(items, evals):
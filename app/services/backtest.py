@@ -0,0 +1,317 @@
+"""
+Backtest signálneho pipeline (_build_and_store_signal) nad uloženou hodinovou históriou.
+
+V každom čase rozhodnutia sa z okna posledných `window` hodín spočítajú features
+(vektorovo pre všetky coiny a časy naraz), aplikujú sa rovnaké filtre ako v skene
+(ATR_PCT_MAX, EMA_FILTER, RSI_MAX), min-max scoring s váhami W1..W6, top PICK_TOP
+a softmax váhy; výnos portfólia = vážený forward return za `horizon` hodín.
+
+Mriežka konfigurácií beží v ProcessPoolExecutor; features a forward returns sú
+v shared memory (read-only), workery si ich iba namapujú.
+
+Rozdiely oproti živému skenu: história nemá vol24 (stĺpec je konštantný, takže
+W5 neovplyvní poradie), nereplikuje sa predvýber top-80 podľa objemu ani cooldown.
+Sken pri INCREMENTAL_INDICATORS=1 (default) berie EMA50/100, RSI a ATR
+z indicator_state, teda zo stavu neseného cez celú doterajšiu históriu coinu;
+backtest ich počíta iba z okna `window` hodín (ako sken pri
+INCREMENTAL_INDICATORS=0 nad 10-dňovým grafom). RSI/ATR a EMA50 sa po 240 h
+prakticky zhodujú, EMA100 ešte nesie ~1 % váhy štartu okna – pri ladení
+EMA_FILTER=100 preto rátaj s malým posunom alebo zväčši --window.
+
+História je iba to, čo drží price store: kompakcia zahadzuje body staršie ako
+PRICE_STORE_RETENTION_DAYS (default 30 dní). Prvých `window` hodín slúži iba na
+features a posledných `horizon` hodín nemá forward return, takže pri 30 dňoch,
+window=240 a horizon=24 ostane ~19 dní rozhodnutí. Na dlhší backtest nastav
+PRICE_STORE_RETENTION_DAYS vyššie na procese, ktorý store plní (živý sken), a
+nechaj históriu narásť – starší úsek sa dodatočne nedoplní.
+
+    python -m app.services.backtest --atr-max 0.05 0.08 0.12 --ema-filter 0 50 100 \\
+        --rsi-max 0 70 80 --pick-top 5 10 --random-weights 500 --workers 4
+"""
+import os
+import json
+import time
+import argparse
+import warnings
+import itertools
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+from multiprocessing import shared_memory
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from . import pricestore
+from .batch_indicators import batch_features
+from .scorer import DEFAULT_WEIGHTS, FEATURES, WEIGHT_KEYS, weight_matrix
+
+HOUR_MS = pricestore.HOUR_MS
+
+# ---------- história ----------
+def load_history(ids: Optional[Sequence[str]] = None) -> Tuple[List[str], np.ndarray, np.ndarray]:
+    """Price store -> (ids, hodinové ts, matica (N, H)) na spoločnej hodinovej mriežke."""
+    ids = list(ids) if ids is not None else pricestore.list_ids()
+    series = {cid: np.asarray(pricestore.read_closed(cid)) for cid in ids}
+    series = {k: v for k, v in series.items() if len(v)}
+    if not series:
+        return [], np.empty(0), np.empty((0, 0))
+    h0 = min(int(v[0, 0] // HOUR_MS) for v in series.values())
+    h1 = max(int(v[-1, 0] // HOUR_MS) for v in series.values())
+    P = np.full((len(series), h1 - h0 + 1), np.nan)
+    for i, v in enumerate(series.values()):
+        P[i, (v[:, 0] // HOUR_MS).astype(np.int64) - h0] = v[:, 1]
+    return list(series), (np.arange(h0, h1 + 1) * HOUR_MS).astype(np.float64), P
+
+def _ffill_rows(x: np.ndarray) -> np.ndarray:
+    """Diery vo vnútri série doplní posledným close; úvodné NaN ostávajú."""
+    idx = np.where(np.isnan(x), 0, np.arange(x.shape[1]))
+    np.maximum.accumulate(idx, axis=1, out=idx)
+    return x[np.arange(x.shape[0])[:, None], idx]
+
+def window_features(
+    P: np.ndarray,
+    t_idx: np.ndarray,
+    window: int,
+    keys: Sequence[str],
+    ema_periods: Sequence[int] = (50, 100),
+    chunk_rows: int = 20_000,
+) -> Dict[str, np.ndarray]:
+    """
+    batch_features pre okná P[:, t-window+1 : t+1] všetkých t v t_idx naraz.
+    Vráti {key: (T * N,)} v poradí riadkov t-major (reshape na (T, N)).
+    """
+    N = P.shape[0]
+    T = len(t_idx)
+    cols = {k: np.empty(T * N) for k in keys}
+    flat = np.empty((T * N, window))
+    for j, t in enumerate(t_idx):
+        flat[j * N:(j + 1) * N] = P[:, t - window + 1:t + 1]
+    # okno musí končiť platným close (posledná hodina), inak coin v tom čase vynecháme
+    flat = _ffill_rows(flat)
+    for a in range(0, T * N, chunk_rows):
+        F = batch_features(flat[a:a + chunk_rows], ema_periods=ema_periods)
+        for k in cols:
+            cols[k][a:a + chunk_rows] = F[k]
+    return cols
+
+@dataclass
+class Panel:
+    """Features (T, N, 6) v poradí scorer.FEATURES + filtre a forward returns (T, N)."""
+    X: np.ndarray
+    ema50: np.ndarray
+    ema100: np.ndarray
+    rsi: np.ndarray
+    valid: np.ndarray
+    fwd: np.ndarray
+    times: np.ndarray
+
+    def arrays(self) -> Dict[str, np.ndarray]:
+        return {k: getattr(self, k) for k in ("X", "ema50", "ema100", "rsi", "valid", "fwd")}
+
+def build_panel(
+    P: np.ndarray,
+    ts: np.ndarray,
+    window: int = 240,
+    step: int = 24,
+    horizon: int = 24,
+    min_points: int = 200,
+    chunk_rows: int = 20_000,
+) -> Panel:
+    """Features pre všetky časy rozhodnutia naraz (okná sa poskladajú do jednej matice)."""
+    N, H = P.shape
+    t_idx = np.arange(window - 1, H - horizon, step)
+    T = len(t_idx)
+    cols = window_features(
+        P, t_idx, window, ("mom_3h", "mom_24h", "mom_7d", "atr_pct", "ema_above_50", "ema_above_100", "rsi", "n"),
+        ema_periods=(50, 100), chunk_rows=chunk_rows,
+    )
+    shape = (T, N)
+    X = np.zeros((T, N, len(FEATURES)))
+    for j, k in enumerate(FEATURES):
+        if k == "trend_flag":
+            X[..., j] = (cols["mom_7d"] > 0).reshape(shape)
+        elif k == "vol24":
+            X[..., j] = 1.0
+        else:
+            X[..., j] = cols[k].reshape(shape)
+    now = P[:, t_idx].T
+    later = P[:, t_idx + horizon].T
+    with np.errstate(divide="ignore", invalid="ignore"):
+        fwd = later / now - 1.0
+    valid = (cols["n"].reshape(shape) >= min_points) & np.isfinite(now) & np.isfinite(fwd) & (now > 0)
+    return Panel(
+        X=X, ema50=cols["ema_above_50"].reshape(shape).astype(np.int8),
+        ema100=cols["ema_above_100"].reshape(shape).astype(np.int8),
+        rsi=cols["rsi"].reshape(shape), valid=valid, fwd=np.where(valid, fwd, 0.0), times=ts[t_idx],
+    )
+
+# ---------- vyhodnotenie ----------
+def evaluate(
+    arrs: Dict[str, np.ndarray],
+    atr_max: float,
+    ema_filter: int,
+    rsi_max: float,
+    W: np.ndarray,
+    pick_tops: Sequence[int],
+) -> List[Dict]:
+    """Jedna kombinácia filtrov × K váh × pick_tops -> metriky pre každú konfiguráciu."""
+    X = arrs["X"]; fwd = arrs["fwd"]
+    t_i = FEATURES.index("trend_flag")
+    mask = arrs["valid"] & (X[..., FEATURES.index("atr_pct")] <= atr_max)
+    if ema_filter == 50:
+        mask &= arrs["ema50"] == 1
+    elif ema_filter == 100:
+        mask &= arrs["ema100"] == 1
+    if rsi_max > 0:
+        mask &= arrs["rsi"] <= rsi_max
+
+    # min-max normalizácia iba cez coiny, ktoré prešli filtrom (ako compute_scores)
+    Xm = np.where(mask[..., None], X, np.nan)
+    with warnings.catch_warnings(), np.errstate(divide="ignore", invalid="ignore"):
+        warnings.simplefilter("ignore", RuntimeWarning)  # časy, kde filter neprešiel nikto
+        lo = np.nanmin(Xm, axis=1, keepdims=True)
+        span = np.nanmax(Xm, axis=1, keepdims=True) - lo
+        A = np.where(span > 0, (X - lo) / span, 0.5)
+    A[..., t_i] = X[..., t_i]
+    A = np.where(mask[..., None], A, 0.0)
+
+    S = A @ W.T                                   # (T, N, K)
+    S = np.where(mask[..., None], S, -np.inf)
+    R = np.broadcast_to(fwd[..., None], S.shape)
+    N = S.shape[1]
+    out: List[Dict] = []
+    for pt in pick_tops:
+        k = max(1, min(pt, N))
+        idx = np.argpartition(-S, k - 1, axis=1)[:, :k, :] if k < N else np.broadcast_to(np.arange(N)[None, :, None], S.shape)
+        sel = np.take_along_axis(S, idx, axis=1)
+        ret = np.take_along_axis(R, idx, axis=1)
+        ok = np.isfinite(sel)
+        top = np.where(ok, sel, -np.inf).max(axis=1, keepdims=True)
+        e = np.where(ok, np.exp(np.where(ok, sel - top, 0.0)), 0.0)
+        tot = e.sum(axis=1, keepdims=True)
+        w = np.divide(e, tot, out=np.zeros_like(e), where=tot > 0)
+        port = (w * ret).sum(axis=1)              # (T, K)
+        has = ok.any(axis=1)
+        n = has.sum(axis=0)
+        nn = np.maximum(n, 1)
+        mean = np.where(has, port, 0.0).sum(axis=0) / nn
+        var = np.where(has, (port - mean) ** 2, 0.0).sum(axis=0) / nn
+        hit = np.where(has, port > 0, False).sum(axis=0) / nn
+        total = np.prod(np.where(has, 1.0 + port, 1.0), axis=0) - 1.0
+        for j in range(W.shape[0]):
+            out.append({
+                "atr_pct_max": atr_max, "ema_filter": ema_filter, "rsi_max": rsi_max, "pick_top": pt,
+                **{key: float(-W[j, c] if key == "w6" else W[j, c]) for c, key in enumerate(WEIGHT_KEYS)},
+                "n": int(n[j]), "mean": float(mean[j]), "std": float(np.sqrt(var[j])),
+                "hit_rate": float(hit[j]), "total": float(total[j]),
+            })
+    return out
+
+# ---------- shared memory + process pool ----------
+_SHARED: Dict[str, np.ndarray] = {}
+_HANDLES: List[shared_memory.SharedMemory] = []
+
+def _share(arrs: Dict[str, np.ndarray]) -> Tuple[Dict[str, Tuple[str, Tuple[int, ...], str]], List[shared_memory.SharedMemory]]:
+    meta: Dict[str, Tuple[str, Tuple[int, ...], str]] = {}
+    handles: List[shared_memory.SharedMemory] = []
+    for k, a in arrs.items():
+        a = np.ascontiguousarray(a)
+        shm = shared_memory.SharedMemory(create=True, size=max(a.nbytes, 1))
+        np.ndarray(a.shape, dtype=a.dtype, buffer=shm.buf)[...] = a
+        meta[k] = (shm.name, a.shape, a.dtype.str)
+        handles.append(shm)
+    return meta, handles
+
+def _attach(meta: Dict[str, Tuple[str, Tuple[int, ...], str]]) -> None:
+    for k, (name, shape, dtype) in meta.items():
+        shm = shared_memory.SharedMemory(name=name)
+        a = np.ndarray(shape, dtype=np.dtype(dtype), buffer=shm.buf)
+        a.flags.writeable = False
+        _SHARED[k] = a
+        _HANDLES.append(shm)
+
+def _work(task: Tuple[float, int, float, np.ndarray, Sequence[int]]) -> List[Dict]:
+    atr_max, ema_filter, rsi_max, W, pick_tops = task
+    return evaluate(_SHARED, atr_max, ema_filter, rsi_max, W, pick_tops)
+
+def run_grid(
+    panel: Panel,
+    atr_max: Sequence[float],
+    ema_filter: Sequence[int],
+    rsi_max: Sequence[float],
+    weights: Sequence[Dict[str, float]],
+    pick_top: Sequence[int],
+    workers: Optional[int] = None,
+    weights_per_task: int = 256,
+) -> List[Dict]:
+    """Celá mriežka; úlohy = (filtre × dávka váh), každá dávka jedným násobením matíc."""
+    W = weight_matrix(weights)
+    tasks = [
+        (a, e, r, W[i:i + weights_per_task], list(pick_top))
+        for a, e, r in itertools.product(atr_max, ema_filter, rsi_max)
+        for i in range(0, len(W), weights_per_task)
+    ]
+    if workers == 1 or len(tasks) == 1:
+        arrs = panel.arrays()
+        return [row for t in tasks for row in evaluate(arrs, *t)]
+    meta, handles = _share(panel.arrays())
+    try:
+        with ProcessPoolExecutor(max_workers=workers, initializer=_attach, initargs=(meta,)) as ex:
+            return [row for part in ex.map(_work, tasks) for row in part]
+    finally:
+        for h in handles:
+            h.close(); h.unlink()
+
+def _random_weights(k: int, seed: int) -> List[Dict[str, float]]:
+    rng = np.random.default_rng(seed)
+    return [dict(zip(WEIGHT_KEYS, map(float, w))) for w in rng.dirichlet(np.ones(len(WEIGHT_KEYS)), size=k)]
+
+def main() -> None:
+    ap = argparse.ArgumentParser(
+        description="Backtest signálov nad price store",
+        epilog=f"História je obmedzená retenciou price store (PRICE_STORE_RETENTION_DAYS, teraz "
+               f"{pricestore.RETENTION_MS // pricestore.DAY_MS} dní); rozhodnutia pokryjú iba "
+               f"retenciu mínus window mínus horizon.",
+    )
+    ap.add_argument("--ids", nargs="*", default=None)
+    ap.add_argument("--window", type=int, default=240, help="hodiny histórie pre features (ubúdajú z retencie)")
+    ap.add_argument("--step", type=int, default=24, help="hodiny medzi rozhodnutiami")
+    ap.add_argument("--horizon", type=int, default=24, help="forward return v hodinách")
+    ap.add_argument("--atr-max", type=float, nargs="+", default=[float(os.getenv("ATR_PCT_MAX", "0.08"))])
+    ap.add_argument("--ema-filter", type=int, nargs="+", default=[int(os.getenv("EMA_FILTER", "0"))])
+    ap.add_argument("--rsi-max", type=float, nargs="+", default=[float(os.getenv("RSI_MAX", "80"))])
+    ap.add_argument("--pick-top", type=int, nargs="+", default=[int(os.getenv("PICK_TOP", "10"))])
+    ap.add_argument("--random-weights", type=int, default=0, help="pridaj K náhodných váh (súčet 1)")
+    ap.add_argument("--weights-file", default=None, help="JSON zoznam {w1..w6}")
+    ap.add_argument("--seed", type=int, default=0)
+    ap.add_argument("--workers", type=int, default=None)
+    ap.add_argument("--top", type=int, default=10)
+    ap.add_argument("--out", default=None)
+    args = ap.parse_args()
+
+    weights = [{k: float(os.getenv(k.upper(), str(v))) for k, v in DEFAULT_WEIGHTS.items()}]
+    if args.weights_file:
+        with open(args.weights_file, "r", encoding="utf-8") as f:
+            weights += json.load(f)
+    if args.random_weights:
+        weights += _random_weights(args.random_weights, args.seed)
+
+    t0 = time.perf_counter()
+    ids, ts, P = load_history(args.ids)
+    if not ids:
+        raise SystemExit(f"price store {pricestore.ROOT} je prázdny")
+    panel = build_panel(P, ts, window=args.window, step=args.step, horizon=args.horizon)
+    t1 = time.perf_counter()
+    res = run_grid(panel, args.atr_max, args.ema_filter, args.rsi_max, weights, args.pick_top, workers=args.workers)
+    t2 = time.perf_counter()
+    res.sort(key=lambda r: r["total"], reverse=True)
+    print(f"coins={len(ids)} decisions={len(panel.times)} configs={len(res)} "
+          f"features={t1 - t0:.2f}s grid={t2 - t1:.2f}s")
+    for r in res[:args.top]:
+        print(json.dumps(r))
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            json.dump(res, f)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,135 @@
+"""
+Vektorizované indikátory nad maticou coiny × hodiny (NumPy).
+
+Riadok = jeden coin, stĺpec = čas; kratšie histórie sú zarovnané doprava
+(posledný stĺpec je najnovší close) a zľava doplnené NaN. Rekurzie (EMA,
+Wilder RSI/ATR) bežia jedným priechodom cez čas naraz pre všetky coiny a
+numericky zodpovedajú funkciám v indicators.py pre každý riadok zvlášť.
+"""
+from typing import Dict, Iterable, Mapping, Optional, Sequence
+
+import numpy as np
+
+DEFAULT_MOM_LAGS: Mapping[str, int] = {"mom_3h": 4, "mom_24h": 24, "mom_7d": 24 * 7}
+
+def to_matrix(series: Sequence[Sequence[float]], length: Optional[int] = None) -> np.ndarray:
+    """Zoznam sérií (close) -> (N, T) matica zarovnaná doprava, NaN vľavo."""
+    if length is None:
+        length = max((len(s) for s in series), default=0)
+    out = np.full((len(series), length), np.nan, dtype=np.float64)
+    for i, s in enumerate(series):
+        s = s[-length:] if length else s[:0]
+        if len(s):
+            out[i, length - len(s):] = s
+    return out
+
+def lengths(x: np.ndarray) -> np.ndarray:
+    """Počet platných bodov v každom riadku."""
+    return np.count_nonzero(~np.isnan(x), axis=1)
+
+def _starts(x: np.ndarray) -> np.ndarray:
+    return x.shape[1] - lengths(x)
+
+def ema_matrix(x: np.ndarray, period: int) -> np.ndarray:
+    if period <= 1:
+        return x.copy()
+    k = 2.0 / (period + 1.0)
+    out = np.full_like(x, np.nan)
+    prev = np.full(x.shape[0], np.nan)
+    for t in range(x.shape[1]):
+        col = x[:, t]
+        prev = np.where(np.isnan(prev), col, col * k + prev * (1.0 - k))
+        out[:, t] = prev
+    return out
+
+def rsi_matrix(x: np.ndarray, period: int = 14) -> np.ndarray:
+    n, T = x.shape
+    out = np.where(np.isnan(x), np.nan, 50.0)
+    if T < 2:
+        return out
+    start = _starts(x)
+    d = np.diff(x, axis=1)
+    gain = np.where(d > 0, d, 0.0)
+    loss = np.where(d < 0, -d, 0.0)
+    avg_g = np.zeros(n); avg_l = np.zeros(n)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        for t in range(1, T):
+            r = t - start
+            g = gain[:, t - 1]; l = loss[:, t - 1]
+            warm = (r >= 1) & (r <= period)
+            avg_g = np.where(warm, avg_g + g, avg_g)
+            avg_l = np.where(warm, avg_l + l, avg_l)
+            first = r == period
+            avg_g = np.where(first, avg_g / period, avg_g)
+            avg_l = np.where(first, avg_l / period, avg_l)
+            rec = r > period
+            if not rec.any():
+                continue
+            avg_g = np.where(rec, (avg_g * (period - 1) + g) / period, avg_g)
+            avg_l = np.where(rec, (avg_l * (period - 1) + l) / period, avg_l)
+            val = np.where(avg_l == 0, 100.0, 100.0 - (100.0 / (1.0 + avg_g / avg_l)))
+            out[:, t] = np.where(rec, val, out[:, t])
+    return out
+
+def atr_matrix(x: np.ndarray, period: int = 14) -> np.ndarray:
+    """Proxy ATR z close-to-close (Wilder), rovnako ako atr_from_closes."""
+    n, T = x.shape
+    out = np.full_like(x, np.nan)
+    if T == 0:
+        return out
+    start = _starts(x)
+    size = T - start
+    tr = np.abs(np.diff(x, axis=1))
+    acc = np.zeros(n)
+    prev = np.zeros(n)
+    for t in range(1, T):
+        r = t - start
+        v = tr[:, t - 1]
+        warm = (r >= 1) & (r <= period)
+        acc = np.where(warm, acc + v, acc)
+        prev = np.where(r == period, acc / period, prev)
+        rec = r > period
+        if rec.any():
+            prev = np.where(rec, (prev * (period - 1) + v) / period, prev)
+            out[:, t] = np.where(rec, prev, out[:, t])
+    # začiatok série: priemer (krátke série) alebo prvá Wilder hodnota
+    with np.errstate(divide="ignore", invalid="ignore"):
+        head = np.where(size < period, acc / size, acc / period)
+    rel = np.arange(T)[None, :] - start[:, None]
+    fill = (rel >= 0) & (rel <= period)
+    return np.where(fill, head[:, None], out)
+
+def momentum(x: np.ndarray, lag: int) -> np.ndarray:
+    """close / closes[-lag] - 1 pre každý riadok (0, ak je séria krátka alebo prev == 0)."""
+    n, T = x.shape
+    if T < lag or lag <= 0:
+        return np.zeros(n)
+    close = x[:, -1]; prev = x[:, T - lag]
+    ok = (lengths(x) > lag) & (prev != 0)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        return np.where(ok, close / prev - 1.0, 0.0)
+
+def batch_features(
+    x: np.ndarray,
+    ema_periods: Iterable[int] = (10, 50, 100),
+    rsi_period: int = 14,
+    atr_period: int = 14,
+    mom_lags: Mapping[str, int] = DEFAULT_MOM_LAGS,
+) -> Dict[str, np.ndarray]:
+    """
+    Posledné hodnoty indikátorov pre všetky coiny naraz:
+    price, mom_*, atr_pct, ema{n}, ema_above_{n}, rsi, n (počet bodov).
+    """
+    close = x[:, -1] if x.shape[1] else np.full(x.shape[0], np.nan)
+    out: Dict[str, np.ndarray] = {"price": close, "n": lengths(x)}
+    for name, lag in mom_lags.items():
+        out[name] = momentum(x, lag)
+    atr_last = atr_matrix(x, atr_period)[:, -1] if x.shape[1] else close
+    with np.errstate(divide="ignore", invalid="ignore"):
+        out["atr_pct"] = np.where(close != 0, atr_last / close, 0.0)
+    for p in ema_periods:
+        e = ema_matrix(x, p)[:, -1] if x.shape[1] else close
+        out[f"ema{p}"] = e
+        out[f"ema_above_{p}"] = (close > e).astype(np.int8)
+    out["rsi"] = rsi_matrix(x, rsi_period)[:, -1] if x.shape[1] else close
+    return out
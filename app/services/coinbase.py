@@ -1,7 +1,8 @@
 import time
-import httpx
 from typing import Set, Dict, Any, Optional
 
+from .http import get_client
+
 # Jednoduchá in-memory cache na 24h
 _cache: Dict[str, Any] = {"ts": 0.0, "symbols": None}
 
@@ -17,15 +18,14 @@ async def get_coinbase_usd_symbols_cached(ttl_minutes: int = 1440) -> Set[str]:
     url = "https://api.exchange.coinbase.com/products"
     symbols: Set[str] = set()
     try:
-        async with httpx.AsyncClient(timeout=60) as c:
-            r = await c.get(url)
-            r.raise_for_status()
-            data = r.json()
-            for prod in data:
-                base = (prod.get("base_currency") or "").upper()
-                quote = (prod.get("quote_currency") or "").upper()
-                if base and quote in {"USD", "USDC"}:
-                    symbols.add(base)
+        r = await get_client("coinbase").get(url)
+        r.raise_for_status()
+        data = r.json()
+        for prod in data:
+            base = (prod.get("base_currency") or "").upper()
+            quote = (prod.get("quote_currency") or "").upper()
+            if base and quote in {"USD", "USDC"}:
+                symbols.add(base)
     except Exception:
         # pri chybe necháme prázdny set -> žiadny filter
         symbols = set()
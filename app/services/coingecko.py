@@ -1,12 +1,17 @@
 import os
 import time
 import random
+import logging
 import asyncio
-from typing import Dict, List, Optional
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, List, Optional, Tuple, TypeVar
 from urllib.parse import urlparse, parse_qsl, urlencode, urlunparse
 
 import httpx
 
+from .http import get_client
+from .ratelimit import AdaptiveRateLimiter
+from . import pricestore
+
 PLAN: str = os.getenv("COINGECKO_PLAN", "public").lower().strip()  # "public" | "demo" | "pro"
 KEY: str = os.getenv("COINGECKO_KEY", "").strip()
 
@@ -24,10 +29,45 @@ if KEY:
     elif PLAN == "pro":
         _HEADERS["x-cg-pro-api-key"] = KEY
 
-DEFAULT_CONCURRENCY: int = int(os.getenv("CG_CONCURRENCY", "1"))
-DEFAULT_SLEEP: float = float(os.getenv("CG_SLEEP", "2.2"))
+DEFAULT_CONCURRENCY: int = int(os.getenv("CG_CONCURRENCY", "4"))
+
+# Rozpočet volaní/min podľa plánu (public je nestabilný ~5–15/min)
+_PLAN_RATE_PER_MIN: Dict[str, float] = {"public": 10.0, "demo": 30.0, "pro": 500.0}
+RATE_PER_MIN: float = float(os.getenv("CG_RATE_PER_MIN", "") or _PLAN_RATE_PER_MIN.get(PLAN, 10.0))
+
+# Jeden zdieľaný limiter pre markets, grafy, simple/price aj BTC daily
+limiter = AdaptiveRateLimiter(
+    rate_per_min=RATE_PER_MIN,
+    burst=float(os.getenv("CG_BURST", "") or max(1.0, RATE_PER_MIN / 10.0)),
+    throttle_cooldown=float(os.getenv("CG_THROTTLE_COOLDOWN", "15")),
+)
+
+_markets_cache: Dict[str, Any] = {"ts": 0.0, "data": None, "last_error": None, "last_attempt": 0.0}
+MARKETS_REFRESH_MIN: float = float(os.getenv("MARKETS_REFRESH_MIN", "10"))
+_refresher: Optional["asyncio.Task"] = None
+
+T = TypeVar("T")
+
+# Single-flight: súbežní volajúci s rovnakým kľúčom čakajú na jeden request
+_inflight: Dict[str, "asyncio.Future"] = {}
+
+def _forget(key: str, fut: "asyncio.Future") -> None:
+    if _inflight.get(key) is fut:
+        del _inflight[key]
+    if not fut.cancelled():
+        fut.exception()  # nech sa chyba nehlási ako "never retrieved"
 
-_markets_cache: Dict[str, Optional[float] | Optional[List[Dict]]] = {"ts": 0.0, "data": None}
+def _flight(key: str, factory: Callable[[], Awaitable[T]]) -> "asyncio.Future[T]":
+    fut = _inflight.get(key)
+    if fut is None:
+        fut = asyncio.ensure_future(factory())
+        _inflight[key] = fut
+        fut.add_done_callback(lambda f: _forget(key, f))
+    return fut
+
+async def _single_flight(key: str, factory: Callable[[], Awaitable[T]]) -> T:
+    # shield: zrušenie jedného volajúceho nezruší request ostatným
+    return await asyncio.shield(_flight(key, factory))
 
 def _with_key(url: str) -> str:
     if not KEY:
@@ -40,21 +80,34 @@ def _with_key(url: str) -> str:
         q["x_cg_pro_api_key"] = KEY
     return urlunparse((u.scheme, u.netloc, u.path, u.params, urlencode(q), u.fragment))
 
-async def _get_json(url: str, tries: int = 7, base_sleep: float = 2.0) -> Dict:
+def _client() -> httpx.AsyncClient:
+    return get_client("coingecko", headers=_HEADERS)
+
+async def _get_json(url: str, tries: int = 4, base_sleep: float = 1.0) -> Dict:
+    """
+    GET s limiterom. 429 rieši limiter (Retry-After / AIMD), 5xx a sieťové chyby
+    krátky exponenciálny backoff, ostatné 4xx sa neopakujú.
+    """
     last_exc: Optional[Exception] = None
     for attempt in range(tries):
+        await limiter.acquire()
         try:
-            async with httpx.AsyncClient(timeout=60, headers=_HEADERS) as c:
-                u = _with_key(url)
-                r = await c.get(u)
-                if r.status_code in (429,) or 500 <= r.status_code < 600:
-                    raise httpx.HTTPStatusError(f"status {r.status_code}", request=r.request, response=r)
-                r.raise_for_status()
-                return r.json()
-        except Exception as e:
+            r = await _client().get(_with_key(url))
+        except httpx.HTTPError as e:
             last_exc = e
-            sleep = base_sleep * (2 ** attempt) + random.uniform(0, 0.6)
-            await asyncio.sleep(sleep)
+            await asyncio.sleep(base_sleep * (2 ** attempt) + random.uniform(0, 0.3))
+            continue
+        if r.status_code == 429:
+            limiter.on_throttle(r.headers)
+            last_exc = httpx.HTTPStatusError(f"status {r.status_code}", request=r.request, response=r)
+            continue
+        if 500 <= r.status_code < 600:
+            last_exc = httpx.HTTPStatusError(f"status {r.status_code}", request=r.request, response=r)
+            await asyncio.sleep(base_sleep * (2 ** attempt) + random.uniform(0, 0.3))
+            continue
+        r.raise_for_status()
+        limiter.on_success(r.headers)
+        return r.json()
     raise last_exc  # type: ignore[misc]
 
 def _dedupe_keep_order(items: List[Dict], key: str = "id") -> List[Dict]:
@@ -76,7 +129,7 @@ async def _get_markets(per_page: int, page: int = 1, vs: str = "usd") -> List[Di
         f"{BASE}/coins/markets?vs_currency={vs}&order=market_cap_desc"
         f"&per_page={per_page}&page={page}&price_change_percentage=24h"
     )
-    return await _get_json(url)  # type: ignore[return-value]
+    return await _single_flight(f"markets:{vs}:{per_page}:{page}", lambda: _get_json(url))  # type: ignore[return-value]
 
 async def get_markets_top200_slow(vs: str = "usd") -> List[Dict]:
     try:
@@ -88,7 +141,6 @@ async def get_markets_top200_slow(vs: str = "usd") -> List[Dict]:
     for p in (1, 2):
         try:
             out.extend(await _get_markets(100, p, vs))
-            await asyncio.sleep(1.2)
         except Exception:
             ok = False; break
     if ok and out:
@@ -99,56 +151,155 @@ async def get_markets_top200_slow(vs: str = "usd") -> List[Dict]:
             out.extend(await _get_markets(50, p, vs))
         except Exception:
             pass
-        await asyncio.sleep(1.5)
     out = _dedupe_keep_order(out)
     if not out:
         raise httpx.HTTPStatusError("status 429", request=None, response=None)  # type: ignore[arg-type]
     return out[:200]
 
-async def get_markets_top200_cached(vs: str = "usd", ttl_minutes: int = 720) -> List[Dict]:
-    now = time.time()
-    if _markets_cache["data"] and now - float(_markets_cache["ts"] or 0) < ttl_minutes * 60:
-        return _markets_cache["data"] or []  # type: ignore[return-value]
+async def _refresh_markets(vs: str) -> List[Dict]:
+    _markets_cache["last_attempt"] = time.time()
     try:
         data = await get_markets_top200_slow(vs)
-        _markets_cache["data"] = data
-        _markets_cache["ts"] = now
+    except Exception as e:
+        _markets_cache["last_error"] = str(e) or type(e).__name__
+        raise
+    _markets_cache["data"] = data
+    _markets_cache["ts"] = time.time()
+    _markets_cache["last_error"] = None
+    return data
+
+def _revalidate_markets(vs: str) -> "asyncio.Future[List[Dict]]":
+    return _flight(f"top200:{vs}", lambda: _refresh_markets(vs))
+
+async def get_markets_top200_cached(vs: str = "usd", ttl_minutes: int = 720, stale_ok: bool = True) -> List[Dict]:
+    """
+    Stale-while-revalidate: čerstvé dáta vráti hneď; staré vráti tiež hneď
+    a obnovu spustí na pozadí (stale_ok=False na ňu počká). Bez dát čaká vždy.
+    """
+    data = _markets_cache["data"]
+    if data and time.time() - float(_markets_cache["ts"] or 0) < ttl_minutes * 60:
+        return data
+    if data and stale_ok:
+        _revalidate_markets(vs)
         return data
+    try:
+        return await asyncio.shield(_revalidate_markets(vs))
     except Exception:
-        return _markets_cache["data"] or []  # type: ignore[return-value]
+        return _markets_cache["data"] or []
+
+async def _markets_refresher(vs: str) -> None:
+    while True:
+        try:
+            await asyncio.shield(_revalidate_markets(vs))
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logging.warning("markets refresh failed: %s", e)
+        await asyncio.sleep(MARKETS_REFRESH_MIN * 60)
+
+def start_markets_refresher(vs: str = "usd") -> None:
+    """Background task, ktorý drží TOP200 cache teplú (každých MARKETS_REFRESH_MIN min)."""
+    global _refresher
+    if _refresher is None or _refresher.done():
+        _refresher = asyncio.ensure_future(_markets_refresher(vs))
+
+def refresher_running() -> bool:
+    return _refresher is not None and not _refresher.done()
+
+async def stop_markets_refresher() -> None:
+    global _refresher
+    if _refresher is not None:
+        _refresher.cancel()
+        try:
+            await _refresher
+        except (asyncio.CancelledError, Exception):
+            pass
+        _refresher = None
+
+def markets_cache_state(vs: str = "usd") -> Dict[str, Any]:
+    """Vek a stav snapshotu TOP200 (pre diagnostiku)."""
+    ts = float(_markets_cache["ts"] or 0)
+    return {
+        "size": len(_markets_cache["data"] or []),
+        "age_s": round(time.time() - ts, 1) if ts else None,
+        "refreshed_at": ts or None,
+        "refreshing": f"top200:{vs}" in _inflight,
+        "last_attempt": _markets_cache["last_attempt"] or None,
+        "last_error": _markets_cache["last_error"],
+        "refresher_running": refresher_running(),
+        "refresh_every_min": MARKETS_REFRESH_MIN,
+    }
 
 # ---------- Historické ceny ----------
 async def get_market_chart(coin_id: str, days: int = 10) -> Dict:
     d = _clamp_days(days)
     url = f"{BASE}/coins/{coin_id}/market_chart?vs_currency=usd&days={d}"
-    return await _get_json(url)  # type: ignore[return-value]
+    return await _single_flight(f"chart:{coin_id}:{d}", lambda: _get_json(url))  # type: ignore[return-value]
 
 async def get_btc_daily(days: int = 365) -> Dict:
-    d = _clamp_days(days)
-    url = f"{BASE}/coins/bitcoin/market_chart?vs_currency=usd&days={d}"
-    return await _get_json(url)  # type: ignore[return-value]
+    return await get_market_chart("bitcoin", days=days)
 
-async def fetch_many_hourly(
+async def get_hourly_incremental(coin_id: str, days: int = 10) -> Dict:
+    # jeden beh na coin naraz – inak by súbežné merge zapísali rovnaký úsek dvakrát
+    return await _single_flight(f"hourly:{coin_id}:{days}", lambda: _hourly_incremental(coin_id, days))
+
+async def _hourly_incremental(coin_id: str, days: int) -> Dict:
+    """
+    Hodinové ceny cez lokálny store: dotiahne iba úsek od posledného uloženého bodu
+    (alebo nič, ak sú dáta čerstvé). Pri chybe upstreamu vráti uložené dáta.
+    """
+    if not pricestore.ENABLED:
+        return await get_market_chart(coin_id, days=days)
+    stored = pricestore.read(coin_id)
+    need = pricestore.delta_days(stored, days)
+    if need is None:
+        return {"prices": pricestore.window(stored, days)}
+    try:
+        data = await get_market_chart(coin_id, days=need)
+    except Exception:
+        if len(stored):
+            return {"prices": pricestore.window(stored, days)}
+        raise
+    try:
+        pricestore.merge(coin_id, data.get("prices", []))
+        return {"prices": pricestore.window(pricestore.read(coin_id), days)}
+    except OSError as e:
+        logging.warning("price store write %s failed: %s", coin_id, e)
+        return data
+
+async def iter_many_hourly(
     ids: List[str],
     days: int = 10,
     concurrency: Optional[int] = None,
-    sleep_between: Optional[float] = None,
-) -> Dict[str, Dict]:
+) -> AsyncIterator[Tuple[str, Dict]]:
+    """Ako fetch_many_hourly, ale (id, graf) vracia hneď, ako ktorý dobehne."""
+    # tempo určuje zdieľaný limiter; semafor len obmedzuje súbežné spojenia
     if concurrency is None:
         concurrency = DEFAULT_CONCURRENCY
-    if sleep_between is None:
-        sleep_between = DEFAULT_SLEEP
     sem = asyncio.Semaphore(concurrency)
-    results: Dict[str, Dict] = {}
-    async def _one(cid: str) -> None:
+    async def _one(cid: str) -> Tuple[str, Dict]:
         async with sem:
             try:
-                results[cid] = await get_market_chart(cid, days=days)
+                return cid, await get_hourly_incremental(cid, days=days)
             except Exception:
-                results[cid] = {"prices": []}
-            await asyncio.sleep(float(sleep_between))
-    await asyncio.gather(*[_one(cid) for cid in ids])
-    return results
+                return cid, {"prices": []}
+    tasks = [asyncio.ensure_future(_one(cid)) for cid in ids]
+    try:
+        for fut in asyncio.as_completed(tasks):
+            yield await fut
+    finally:
+        for t in tasks:
+            t.cancel()
+
+async def fetch_many_hourly(
+    ids: List[str],
+    days: int = 10,
+    concurrency: Optional[int] = None,
+) -> Dict[str, Dict]:
+    results: Dict[str, Dict] = {}
+    async for cid, data in iter_many_hourly(ids, days=days, concurrency=concurrency):
+        results[cid] = data
+    return {cid: results[cid] for cid in ids if cid in results}
 
 # ---------- Jednoduché ceny pre watchlist ----------
 async def get_simple_prices(ids: List[str], vs: str = "usd") -> Dict[str, float]:
@@ -172,7 +323,6 @@ async def get_simple_prices(ids: List[str], vs: str = "usd") -> Dict[str, float]
         except Exception:
             # preskoč chunk
             pass
-        await asyncio.sleep(0.3)
     return out
 
 # ---------- Diagnostika ----------
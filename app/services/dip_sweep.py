@@ -0,0 +1,250 @@
+"""
+Walk-forward sweep parametrov dips.pick_dips nad uloženou hodinovou históriou.
+
+Features (mom_3h/24h/7d, ATR%, EMA10, RSI) sa spočítajú vektorovo raz pre všetky
+časy rozhodnutia a coiny; každá konfigurácia je potom iba maska + skóre + top
+`count` nad tými istými poľami. Pre každý pick sa z budúcich hodinových close
+zistí, či trh najprv dosiahol tp1_usd (hit), sl_usd (stop), alebo ani jedno do
+horizontu (timeout, výnos = close na konci horizontu).
+
+Walk-forward: na `train` rozhodnutiach sa vyberie najlepšia konfigurácia podľa
+`objective`, vyhodnotí sa na nasledujúcich `test` rozhodnutiach (s medzerou,
+aby sa výsledky tréningu neprekrývali s testom) a okno sa posunie o `test`.
+
+Rozdiely oproti živému pick_dips: história nemá objemy (min_vol24 sa nesweepuje),
+predvýber najhorších za 24h ide podľa mom_24h namiesto price_change_24h z markets.
+Price store drží iba coin_id, takže _is_stable vidí bez --markets len id (zachytí
+"usd" v id, nie STABLE_SYMBOLS ani "stable" v mene – napr. tether, dai). S
+--markets <json z /coins/markets> sa stablecoiny filtrujú rovnako ako naživo.
+
+História je obmedzená retenciou price store (PRICE_STORE_RETENTION_DAYS, default
+30 dní, pozri backtest.py). Pri defaultoch (window=240, step=12, horizont 48 h)
+ostane ~36 rozhodnutí, teda iba 2 foldy train=20 / test=5. Pre viac foldov
+zvýš retenciu na procese, ktorý store plní, alebo zmenši --window / --train.
+
+    python -m app.services.dip_sweep --train 20 --test 5 --min-7d-drop -0.25 -0.35 -0.45 \\
+        --tp1-mult 1.0 1.5 2.0 --sl-min 0.05 0.10
+"""
+import json
+import math
+import time
+import inspect
+import argparse
+import itertools
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Sequence
+
+import numpy as np
+
+from . import pricestore
+from .backtest import _ffill_rows, load_history, window_features
+from .dips import _is_stable, pick_dips
+
+# predvolené hodnoty berieme priamo zo signatúry pick_dips
+DEFAULTS: Dict = {
+    k: p.default for k, p in inspect.signature(pick_dips).parameters.items()
+    if p.kind is inspect.Parameter.KEYWORD_ONLY
+}
+SWEEP_KEYS = (
+    "min_7d_drop", "max_atr_pct", "preselect",
+    "bounce_mom3h", "bounce_ema", "bounce_rsi",
+    "w_drop", "w_bounce", "w_atr",
+    "sl_min", "tp1_mult", "tp1_min", "short_horizon_atr",
+)
+SHORT_H, LONG_H = 12, 48   # horizon_days 0.5 / 2.0 z pick_dips
+MIN_POINTS = 24 * 7 + 2    # ako _metrics_from_prices
+
+@dataclass
+class DipPanel:
+    """Features (T, N), rank podľa 24h poklesu a relatívna budúca cesta (T, N, LONG_H)."""
+    price: np.ndarray
+    mom_3h: np.ndarray
+    mom_7d: np.ndarray
+    atr_pct: np.ndarray
+    ema10: np.ndarray
+    rsi: np.ndarray
+    rank24: np.ndarray
+    valid: np.ndarray
+    path: np.ndarray
+    times: np.ndarray
+
+def build_dip_panel(
+    ids: Sequence[str],
+    P: np.ndarray,
+    ts: np.ndarray,
+    window: int = 240,
+    step: int = 12,
+    chunk_rows: int = 20_000,
+    meta: Optional[Dict[str, Dict]] = None,
+) -> DipPanel:
+    """meta: coin_id -> záznam z /coins/markets (symbol, name) pre _is_stable; inak iba id."""
+    N, H = P.shape
+    t_idx = np.arange(window - 1, H - LONG_H, step)
+    T = len(t_idx)
+    cols = window_features(
+        P, t_idx, window, ("mom_3h", "mom_24h", "mom_7d", "atr_pct", "ema10", "rsi", "n"),
+        ema_periods=(10,), chunk_rows=chunk_rows,
+    )
+    f = {k: v.reshape(T, N) for k, v in cols.items()}
+    now = P[:, t_idx].T
+    meta = meta or {}
+    stable = np.array([_is_stable({**meta.get(cid, {}), "id": cid}) for cid in ids], dtype=bool)
+    valid = (f["n"] >= MIN_POINTS) & np.isfinite(now) & (now > 0) & ~stable[None, :]
+
+    # poradie podľa 24h zmeny medzi platnými coinmi (0 = najväčší prepad)
+    key = np.where(valid, f["mom_24h"], np.inf)
+    rank24 = np.empty((T, N), dtype=np.int64)
+    np.put_along_axis(rank24, np.argsort(key, axis=1, kind="stable"), np.arange(N)[None, :], axis=1)
+
+    Pf = _ffill_rows(P)
+    ahead = t_idx[:, None] + np.arange(1, LONG_H + 1)[None, :]        # (T, LONG_H)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        path = Pf[:, ahead].transpose(1, 0, 2) / now[..., None]          # (T, N, LONG_H)
+    return DipPanel(
+        price=np.where(valid, now, 0.0), mom_3h=f["mom_3h"], mom_7d=f["mom_7d"], atr_pct=f["atr_pct"],
+        ema10=f["ema10"], rsi=f["rsi"], rank24=rank24, valid=valid, path=path, times=ts[t_idx],
+    )
+
+def evaluate(pn: DipPanel, cfg: Dict, rows: slice, count: int = 2) -> Dict:
+    """Jedna konfigurácia nad časmi `rows` -> počty hit/stop/timeout a súčet výnosov."""
+    c = {**DEFAULTS, **cfg}
+    m3 = pn.mom_3h[rows]; m7 = pn.mom_7d[rows]; atr = pn.atr_pct[rows]
+    mask = pn.valid[rows] & (pn.rank24[rows] < c["preselect"]) & (m7 <= c["min_7d_drop"]) & (atr <= c["max_atr_pct"])
+    bounce = (m3 > c["bounce_mom3h"]) | (pn.rsi[rows] > c["bounce_rsi"])
+    if c["bounce_ema"]:
+        bounce |= pn.price[rows] > pn.ema10[rows]
+    mask &= bounce
+    score = np.abs(np.minimum(m7, -0.01)) * c["w_drop"] + np.maximum(m3, 0.0) * c["w_bounce"] - atr * c["w_atr"]
+    S = np.where(mask, score, -np.inf)
+
+    N = S.shape[1]
+    k = max(1, min(count, N))
+    idx = np.argpartition(-S, k - 1, axis=1)[:, :k] if k < N else np.broadcast_to(np.arange(N), S.shape)
+    ok = np.isfinite(np.take_along_axis(S, idx, axis=1))
+    tt, jj = np.nonzero(ok)
+    ii = idx[tt, jj]
+    a = atr[tt, ii]
+    sl = 1.0 - np.maximum(a, c["sl_min"])
+    tp = 1.0 + np.maximum(c["tp1_mult"] * a, c["tp1_min"])
+    h = np.where(a >= c["short_horizon_atr"], SHORT_H, LONG_H)
+
+    path = pn.path[rows][tt, ii]                                       # (M, LONG_H)
+    inside = np.arange(LONG_H)[None, :] < h[:, None]
+    up = (path >= tp[:, None]) & inside
+    dn = (path <= sl[:, None]) & inside
+    first_up = np.where(up.any(axis=1), up.argmax(axis=1), LONG_H)
+    first_dn = np.where(dn.any(axis=1), dn.argmax(axis=1), LONG_H)
+    hit = first_up < first_dn
+    stop = first_dn < first_up
+    end = path[np.arange(len(h)), h - 1] - 1.0
+    ret = np.where(hit, tp - 1.0, np.where(stop, sl - 1.0, end))
+    return {"trades": int(len(ret)), "hits": int(hit.sum()), "stops": int(stop.sum()), "ret_sum": float(ret.sum())}
+
+def _metrics(r: Dict) -> Dict:
+    n = max(r["trades"], 1)
+    return {
+        **r,
+        "hit_rate": r["hits"] / n, "stop_rate": r["stops"] / n,
+        "timeouts": r["trades"] - r["hits"] - r["stops"], "expectancy": r["ret_sum"] / n,
+    }
+
+def _merge(a: Dict, b: Dict) -> Dict:
+    return {k: a.get(k, 0) + b[k] for k in ("trades", "hits", "stops", "ret_sum")}
+
+def grid_configs(grid: Dict[str, Sequence]) -> List[Dict]:
+    keys = [k for k in SWEEP_KEYS if k in grid]
+    return [dict(zip(keys, vals)) for vals in itertools.product(*(grid[k] for k in keys))]
+
+def walk_forward(
+    pn: DipPanel,
+    configs: Sequence[Dict],
+    train: int,
+    test: int,
+    count: int = 2,
+    objective: str = "expectancy",
+    min_trades: int = 5,
+    step_h: int = 12,
+) -> Dict:
+    """
+    Rolling train/test cez časy rozhodnutia. Medzera ceil(LONG_H / step_h) rozhodnutí
+    medzi train a test zabráni tomu, aby tréningové obchody siahali do testu.
+    """
+    gap = math.ceil(LONG_H / step_h)
+    T = len(pn.times)
+    folds: List[Dict] = []
+    oos: Dict = {}; base: Dict = {}
+    a = 0
+    while a + train + gap + test <= T:
+        tr = slice(a, a + train)
+        te = slice(a + train + gap, a + train + gap + test)
+        scored = [(_metrics(evaluate(pn, c, tr, count)), c) for c in configs]
+        eligible = [x for x in scored if x[0]["trades"] >= min_trades] or scored
+        best_m, best_c = max(eligible, key=lambda x: (x[0][objective], x[0]["trades"]))
+        test_r = evaluate(pn, best_c, te, count)
+        base_r = evaluate(pn, {}, te, count)
+        oos = _merge(oos, test_r); base = _merge(base, base_r)
+        folds.append({
+            "train_from": int(pn.times[tr.start]), "test_from": int(pn.times[te.start]),
+            "config": best_c, "train": best_m, "test": _metrics(test_r), "default": _metrics(base_r),
+        })
+        a += test
+    empty = {"trades": 0, "hits": 0, "stops": 0, "ret_sum": 0.0}
+    return {"folds": folds, "oos": _metrics(oos or empty), "default_oos": _metrics(base or empty)}
+
+def main() -> None:
+    ap = argparse.ArgumentParser(
+        description="Walk-forward sweep parametrov dips nad price store",
+        epilog=f"História je obmedzená retenciou price store (PRICE_STORE_RETENTION_DAYS, teraz "
+               f"{pricestore.RETENTION_MS // pricestore.DAY_MS} dní); rozhodnutí je ~(retencia - window - "
+               f"{LONG_H} h) / step, foldov ~(rozhodnutia - train - medzera) / test.",
+    )
+    ap.add_argument("--ids", nargs="*", default=None)
+    ap.add_argument("--window", type=int, default=240, help="hodiny histórie pre features (ubúdajú z retencie)")
+    ap.add_argument("--step", type=int, default=12, help="hodiny medzi rozhodnutiami")
+    ap.add_argument("--train", type=int, default=20, help="počet rozhodnutí v tréningu")
+    ap.add_argument("--test", type=int, default=5, help="počet rozhodnutí v teste")
+    ap.add_argument("--count", type=int, default=2)
+    ap.add_argument("--objective", choices=("expectancy", "hit_rate"), default="expectancy")
+    ap.add_argument("--min-trades", type=int, default=5)
+    for k in SWEEP_KEYS:
+        d = DEFAULTS[k]
+        ap.add_argument("--" + k.replace("_", "-"), type=type(d) if not isinstance(d, bool) else int,
+                        nargs="+", default=[d])
+    ap.add_argument("--markets", default=None,
+                    help="JSON z /coins/markets (symbol, name) pre filter stablecoinov; bez neho iba podľa id")
+    ap.add_argument("--out", default=None)
+    args = ap.parse_args()
+
+    grid = {k: getattr(args, k) for k in SWEEP_KEYS}
+    grid["bounce_ema"] = [bool(v) for v in grid["bounce_ema"]]
+    configs = grid_configs(grid)
+
+    t0 = time.perf_counter()
+    ids, ts, P = load_history(args.ids)
+    if not ids:
+        raise SystemExit(f"price store {pricestore.ROOT} je prázdny")
+    meta: Dict[str, Dict] = {}
+    if args.markets:
+        with open(args.markets, "r", encoding="utf-8") as f:
+            meta = {m["id"]: m for m in json.load(f) if m.get("id")}
+    pn = build_dip_panel(ids, P, ts, window=args.window, step=args.step, meta=meta)
+    t1 = time.perf_counter()
+    res = walk_forward(pn, configs, args.train, args.test, args.count, args.objective, args.min_trades, args.step)
+    t2 = time.perf_counter()
+    print(f"coins={len(ids)} decisions={len(pn.times)} configs={len(configs)} folds={len(res['folds'])} "
+          f"features={t1 - t0:.2f}s sweep={t2 - t1:.2f}s")
+    if len(res["folds"]) < 3:
+        print(f"pozor: iba {len(res['folds'])} foldov – história je orezaná na PRICE_STORE_RETENTION_DAYS="
+              f"{pricestore.RETENTION_MS // pricestore.DAY_MS}; zvýš retenciu alebo zmenši --window/--train")
+    for f in res["folds"]:
+        print(json.dumps({"test_from": f["test_from"], "config": f["config"],
+                          "train_hit": round(f["train"]["hit_rate"], 3), "test_hit": round(f["test"]["hit_rate"], 3),
+                          "test_exp": round(f["test"]["expectancy"], 4), "default_exp": round(f["default"]["expectancy"], 4)}))
+    print("oos", json.dumps(res["oos"]))
+    print("default", json.dumps(res["default_oos"]))
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            json.dump(res, f)
+
+if __name__ == "__main__":
+    main()
@@ -2,7 +2,7 @@ from typing import List, Dict, Optional
 import math
 
 # Pomocné indikátory berieme z tvojho modulu
-from .indicators import pct_change, atr_from_closes, ema, rsi
+from .features import extract_features
 
 STABLE_SYMBOLS = {
     "USDT","USDC","DAI","FDUSD","TUSD","USDD","USDP","GUSD","EURS","EURC"
@@ -20,26 +20,13 @@ def _is_stable(m: Dict) -> bool:
         return True
     return False
 
+DIP_FEATURES = ("mom_3h", "mom_24h", "mom_7d", "atr_pct", "ema10", "rsi")
+
 def _metrics_from_prices(closes: List[float]) -> Optional[Dict]:
     if not closes or len(closes) < 24*7+2:
         return None
-    close = float(closes[-1])
-    m3h  = pct_change(close, closes[-4])  if len(closes) > 4      else 0.0
-    m24h = pct_change(close, closes[-24]) if len(closes) > 24     else 0.0
-    m7d  = pct_change(close, closes[-24*7]) if len(closes) > 24*7 else 0.0
-    atr  = atr_from_closes(closes, period=14)
-    atrp = (atr[-1] / close) if close else 0.0
-    e10  = ema(closes, 10)[-1]
-    rsi14 = rsi(closes, 14)[-1]
-    return {
-        "price": close,
-        "mom_3h": float(m3h),
-        "mom_24h": float(m24h),
-        "mom_7d": float(m7d),
-        "atr_pct": float(atrp),
-        "ema10": float(e10),
-        "rsi": float(rsi14),
-    }
+    f = extract_features(closes, DIP_FEATURES)
+    return {k: f[k] for k in ("price",) + DIP_FEATURES}
 
 def pick_dips(
     markets: List[Dict],
@@ -49,11 +36,28 @@ def pick_dips(
     min_7d_drop: float = -0.35,   # <= -35 %
     max_atr_pct: float = 0.20,    # <= 20 %
     min_vol24: float = 5_000_000, # >= 5M USD
+    preselect: int = 40,
+    # potvrdenie odrazu (stačí jedno): mom_3h > bounce_mom3h, close > EMA10, RSI > bounce_rsi
+    bounce_mom3h: float = 0.02,
+    bounce_ema: bool = True,
+    bounce_rsi: float = 35.0,
+    # skóre = |7d prepad| * w_drop + 3h odraz * w_bounce - ATR% * w_atr
+    w_drop: float = 0.6,
+    w_bounce: float = 0.5,
+    w_atr: float = 0.3,
+    # SL/TP ako násobky ATR% s minimom, horizont podľa ATR%
+    sl_min: float = 0.10,
+    tp1_mult: float = 1.5,
+    tp1_min: float = 0.08,
+    tp2_mult: float = 2.5,
+    tp2_min: float = 0.15,
+    short_horizon_atr: float = 0.10,
 ) -> List[Dict]:
     """
     Vyberie 'count' coinov po veľkom prepade s náznakom odrazu.
     markets: výstup z /coins/markets
     charts: {id: {"prices": [[ts, close], ...]}} za ~10 dní (hodinové)
+    Predvolené hodnoty parametrov sú ručne ladené; dip_sweep ich vie preladiť walk-forward.
     """
     # 0) preselect – vezmeme ~40 najhorších za 24h z TOP200 (aby sme nemuseli ťahať grafy pre všetkých)
     losers = []
@@ -67,7 +71,7 @@ def pick_dips(
             continue
         losers.append((pc24, cid, sym, nm, vol24))
     losers.sort(key=lambda x: x[0])  # najväčší prepady najprv
-    losers = losers[:40]
+    losers = losers[:preselect]
 
     # 1) spočítaj metriky z grafov a urob filtráciu
     out: List[Dict] = []
@@ -85,20 +89,20 @@ def pick_dips(
             continue
 
         # potvrdenie odrazu: 3h momentum pozitívne ALEBO close nad EMA10 ALEBO RSI 14 > 35
-        bounce = (met["mom_3h"] > 0.02) or (met["price"] > met["ema10"]) or (met["rsi"] > 35.0)
+        bounce = (met["mom_3h"] > bounce_mom3h) or (bounce_ema and met["price"] > met["ema10"]) or (met["rsi"] > bounce_rsi)
         if not bounce:
             continue
 
         # jednoduchý scoring: preferujeme väčší prepad + čerstvý odraz, penalizuj vysokú ATR
-        score = (abs(min(met["mom_7d"], -0.01)) * 0.6) + (max(met["mom_3h"], 0.0) * 0.5) - (met["atr_pct"] * 0.3)
+        score = (abs(min(met["mom_7d"], -0.01)) * w_drop) + (max(met["mom_3h"], 0.0) * w_bounce) - (met["atr_pct"] * w_atr)
 
         # návrh SL / TP a horizont
         atrp = met["atr_pct"]
         price = met["price"]
-        sl     = price * (1.0 - max(atrp, 0.10))     # min. ~10% SL
-        tp1    = price * (1.0 + max(1.5*atrp, 0.08)) # min. 8% TP1
-        tp2    = price * (1.0 + max(2.5*atrp, 0.15)) # min. 15% TP2
-        horiz  = 0.5 if atrp >= 0.10 else 2.0        # ~12h alebo ~2 dni
+        sl     = price * (1.0 - max(atrp, sl_min))            # min. ~10% SL
+        tp1    = price * (1.0 + max(tp1_mult*atrp, tp1_min))  # min. 8% TP1
+        tp2    = price * (1.0 + max(tp2_mult*atrp, tp2_min))  # min. 15% TP2
+        horiz  = 0.5 if atrp >= short_horizon_atr else 2.0    # ~12h alebo ~2 dni
 
         out.append({
             "id": cid, "symbol": sym, "name": nm,
@@ -0,0 +1,98 @@
+"""
+Jednopriechodová extrakcia posledných hodnôt indikátorov z jednej série close.
+
+Namiesto celých sérií EMA/RSI/ATR (z ktorých sa číta iba [-1]) sa všetky
+rekurzie posúvajú v jednom cykle. Výsledky sú zhodné s indicators.py.
+"""
+from typing import Dict, Iterable, List, Optional
+
+from .indicators import pct_change
+
+# posun od konca pre momentum: closes[-lag]
+MOM_LAGS: Dict[str, int] = {"mom_3h": 4, "mom_24h": 24, "mom_7d": 24 * 7}
+
+ALL_FEATURES = ("mom_3h", "mom_24h", "mom_7d", "atr_pct", "ema10", "ema50", "ema100", "rsi", "spark")
+
+def extract_features(
+    closes: List[float],
+    want: Optional[Iterable[str]] = None,
+    rsi_period: int = 14,
+    atr_period: int = 14,
+    spark_len: int = 50,
+) -> Optional[Dict]:
+    """
+    want: podmnožina ALL_FEATURES (ľubovoľné "emaN"); None = všetky.
+    Vráti {"price", <features>..., "ema_above_N"} alebo None pre prázdnu sériu.
+    """
+    n = len(closes)
+    if n == 0:
+        return None
+    want = set(ALL_FEATURES if want is None else want)
+    close = closes[-1]
+    out: Dict = {"price": float(close)}
+
+    for name, lag in MOM_LAGS.items():
+        if name in want:
+            out[name] = float(pct_change(close, closes[-lag])) if n > lag else 0.0
+    if "spark" in want:
+        out["spark"] = [float(x) for x in closes[-spark_len:]]
+
+    ema_periods = sorted({int(w[3:]) for w in want if w.startswith("ema") and w[3:].isdigit()})
+    do_rsi = "rsi" in want
+    do_atr = "atr_pct" in want
+
+    # EMA: ema_val = v*k + ema_val*(1-k), štart z closes[0]; period <= 1 -> close
+    ema_k = [(p, 2.0 / (p + 1.0)) for p in ema_periods if p > 1]
+    ema_val = [closes[0]] * len(ema_k)
+    # Wilder: prvých `period` krokov sa priemeruje, potom rekurzia
+    g_init: List[float] = []; l_init: List[float] = []; avg_g = avg_l = 0.0
+    tr_init: List[float] = []; atr = 0.0
+
+    prev = closes[0]
+    for i in range(1, n if (ema_k or do_rsi or do_atr) else 1):
+        v = closes[i]
+        for j, (_, k) in enumerate(ema_k):
+            ema_val[j] = v * k + ema_val[j] * (1.0 - k)
+        diff = v - prev
+        prev = v
+        if do_rsi:
+            g = max(diff, 0.0); l = max(-diff, 0.0)
+            if i <= rsi_period:
+                g_init.append(g); l_init.append(l)
+                if i == rsi_period:
+                    avg_g = sum(g_init) / rsi_period
+                    avg_l = sum(l_init) / rsi_period
+            else:
+                avg_g = (avg_g * (rsi_period - 1) + g) / rsi_period
+                avg_l = (avg_l * (rsi_period - 1) + l) / rsi_period
+        if do_atr:
+            tr = abs(diff)
+            if i <= atr_period:
+                tr_init.append(tr)
+                if i == atr_period:
+                    atr = sum(tr_init) / atr_period
+            else:
+                atr = (atr * (atr_period - 1) + tr) / atr_period
+
+    emas = dict(zip((p for p, _ in ema_k), ema_val))
+    for p in ema_periods:
+        e = float(emas.get(p, close))
+        out[f"ema{p}"] = e
+        out[f"ema_above_{p}"] = 1 if close > e else 0
+
+    if do_rsi:
+        if n < rsi_period + 2:
+            out["rsi"] = 50.0  # neutrál, kým nie je prvá Wilder hodnota
+        elif avg_l == 0:
+            out["rsi"] = 100.0
+        else:
+            out["rsi"] = float(100.0 - (100.0 / (1.0 + avg_g / avg_l)))
+    if do_atr:
+        if n < atr_period:
+            a = sum([0.0] + tr_init) / n
+        elif n == atr_period:
+            a = sum(tr_init) / atr_period
+        else:
+            a = atr
+        out["atr_pct"] = float(a / close) if close else 0.0
+    return out
@@ -0,0 +1,62 @@
+import os
+import logging
+from typing import Dict, Optional
+
+import httpx
+
+# Zdieľané dlhožijúce klienty – jeden na upstream (coingecko, coinbase, ...).
+# Keep-alive pool šetrí TCP/TLS handshake pri každom volaní.
+_clients: Dict[str, httpx.AsyncClient] = {}
+
+def _envf(name: str, default: float) -> float:
+    try: return float(os.getenv(name, str(default)))
+    except: return float(default)
+
+def _envi(name: str, default: int) -> int:
+    try: return int(os.getenv(name, str(default)))
+    except: return int(default)
+
+def _http2_enabled() -> bool:
+    if os.getenv("HTTP2", "0") != "1":
+        return False
+    try:
+        import h2  # noqa: F401
+        return True
+    except ImportError:
+        logging.warning("HTTP2=1, ale chýba balík h2 (pip install httpx[http2]); ostávam pri HTTP/1.1")
+        return False
+
+def _limits() -> httpx.Limits:
+    return httpx.Limits(
+        max_connections=_envi("HTTP_MAX_CONNECTIONS", 20),
+        max_keepalive_connections=_envi("HTTP_MAX_KEEPALIVE", 10),
+        keepalive_expiry=_envf("HTTP_KEEPALIVE_EXPIRY", 30.0),
+    )
+
+def _timeout() -> httpx.Timeout:
+    return httpx.Timeout(_envf("HTTP_TIMEOUT", 60.0), connect=_envf("HTTP_CONNECT_TIMEOUT", 10.0))
+
+def get_client(name: str, headers: Optional[Dict[str, str]] = None) -> httpx.AsyncClient:
+    """
+    Vráti zdieľaného klienta pre daný upstream (lazy vytvorenie).
+    Hlavičky sa nastavia iba pri vytvorení – volajúci ich posiela vždy rovnaké.
+    """
+    c = _clients.get(name)
+    if c is None or c.is_closed:
+        c = httpx.AsyncClient(
+            headers=headers,
+            limits=_limits(),
+            timeout=_timeout(),
+            http2=_http2_enabled(),
+        )
+        _clients[name] = c
+    return c
+
+async def close_clients() -> None:
+    """Zavrie všetky klienty (volá sa pri shutdown aplikácie)."""
+    for name in list(_clients):
+        c = _clients.pop(name)
+        try:
+            await c.aclose()
+        except Exception as e:
+            logging.warning("http client %s close failed: %s", name, e)
@@ -0,0 +1,223 @@
+"""
+Inkrementálny stav indikátorov (EMA, Wilder RSI, ATR) – O(1) na nový hodinový close.
+
+Stav sa ukladá vedľa cien v price store (state.json) a ďalší sken ho posunie iba
+o nové uzavreté sviečky. Posledný "živý" bod sa len prirátava cez peek (stav
+nemení). Pri diere v dátach alebo zmenenej konfigurácii sa stav prepočíta
+z celej série. Po prvom behu teda hodnoty nesú dlhšiu históriu než okno 10 dní.
+"""
+import copy
+import logging
+from typing import Dict, Iterable, List, Optional
+
+from . import pricestore
+
+GAP_MS = int(2.5 * pricestore.HOUR_MS)
+
+class EmaState:
+    def __init__(self, period: int, value: Optional[float] = None) -> None:
+        self.period = period
+        self.k = 2.0 / (period + 1.0)
+        self.value = value
+
+    def update(self, v: float) -> None:
+        if self.value is None or self.period <= 1:
+            self.value = v
+        else:
+            self.value = v * self.k + self.value * (1.0 - self.k)
+
+    def to_dict(self) -> Dict:
+        return {"period": self.period, "value": self.value}
+
+    @classmethod
+    def from_dict(cls, d: Dict) -> "EmaState":
+        return cls(int(d["period"]), d.get("value"))
+
+class RsiState:
+    """Wilder RSI; prvých `period` zmien sa priemeruje, potom rekurzia."""
+
+    def __init__(self, period: int = 14) -> None:
+        self.period = period
+        self.n = 0
+        self.prev: Optional[float] = None
+        self.g_init: List[float] = []
+        self.l_init: List[float] = []
+        self.avg_g = 0.0
+        self.avg_l = 0.0
+
+    def update(self, v: float) -> None:
+        if self.n > 0:
+            diff = v - self.prev  # type: ignore[operator]
+            g = max(diff, 0.0); l = max(-diff, 0.0)
+            p = self.period
+            if self.n <= p:
+                self.g_init.append(g); self.l_init.append(l)
+                if self.n == p:
+                    self.avg_g = sum(self.g_init) / p
+                    self.avg_l = sum(self.l_init) / p
+            else:
+                self.avg_g = (self.avg_g * (p - 1) + g) / p
+                self.avg_l = (self.avg_l * (p - 1) + l) / p
+        self.prev = v
+        self.n += 1
+
+    def value(self) -> float:
+        if self.n < self.period + 2:
+            return 50.0
+        if self.avg_l == 0:
+            return 100.0
+        return 100.0 - (100.0 / (1.0 + self.avg_g / self.avg_l))
+
+    def to_dict(self) -> Dict:
+        return {k: getattr(self, k) for k in ("period", "n", "prev", "g_init", "l_init", "avg_g", "avg_l")}
+
+    @classmethod
+    def from_dict(cls, d: Dict) -> "RsiState":
+        s = cls(int(d["period"]))
+        for k in ("n", "prev", "g_init", "l_init", "avg_g", "avg_l"):
+            setattr(s, k, d[k])
+        return s
+
+class AtrState:
+    """Proxy ATR z close-to-close (Wilder), zhodne s atr_from_closes."""
+
+    def __init__(self, period: int = 14) -> None:
+        self.period = period
+        self.n = 0
+        self.prev: Optional[float] = None
+        self.tr_init: List[float] = []
+        self.atr = 0.0
+
+    def update(self, v: float) -> None:
+        if self.n > 0:
+            tr = abs(v - self.prev)  # type: ignore[operator]
+            p = self.period
+            if self.n <= p:
+                self.tr_init.append(tr)
+                if self.n == p:
+                    self.atr = sum(self.tr_init) / p
+            else:
+                self.atr = (self.atr * (p - 1) + tr) / p
+        self.prev = v
+        self.n += 1
+
+    def value(self) -> float:
+        if self.n == 0:
+            return 0.0
+        if self.n < self.period:
+            return sum([0.0] + self.tr_init) / self.n
+        if self.n == self.period:
+            return sum(self.tr_init) / self.period
+        return self.atr
+
+    def to_dict(self) -> Dict:
+        return {k: getattr(self, k) for k in ("period", "n", "prev", "tr_init", "atr")}
+
+    @classmethod
+    def from_dict(cls, d: Dict) -> "AtrState":
+        s = cls(int(d["period"]))
+        for k in ("n", "prev", "tr_init", "atr"):
+            setattr(s, k, d[k])
+        return s
+
+class IndicatorState:
+    """Balík stavov pre jeden coin + timestamp poslednej spracovanej sviečky."""
+
+    def __init__(self, ema_periods: Iterable[int] = (50, 100), rsi_period: int = 14, atr_period: int = 14) -> None:
+        self.last_ts: Optional[float] = None
+        self.emas = {p: EmaState(p) for p in sorted(set(ema_periods))}
+        self.rsi = RsiState(rsi_period)
+        self.atr = AtrState(atr_period)
+
+    def config(self) -> Dict:
+        return {"ema": sorted(self.emas), "rsi": self.rsi.period, "atr": self.atr.period}
+
+    def update(self, ts: float, close: float) -> None:
+        for e in self.emas.values():
+            e.update(close)
+        self.rsi.update(close)
+        self.atr.update(close)
+        self.last_ts = ts
+
+    def features(self, close: float) -> Dict:
+        """Hodnoty po pridaní `close` (živý bod) bez zmeny stavu."""
+        tmp = copy.deepcopy(self)
+        for e in tmp.emas.values():
+            e.update(close)
+        tmp.rsi.update(close)
+        tmp.atr.update(close)
+        out: Dict = {}
+        for p, e in tmp.emas.items():
+            out[f"ema{p}"] = float(e.value)  # type: ignore[arg-type]
+            out[f"ema_above_{p}"] = 1 if close > e.value else 0  # type: ignore[operator]
+        out["rsi"] = float(tmp.rsi.value())
+        out["atr_pct"] = float(tmp.atr.value() / close) if close else 0.0
+        return out
+
+    def to_dict(self) -> Dict:
+        return {
+            "config": self.config(), "last_ts": self.last_ts,
+            "ema": [e.to_dict() for e in self.emas.values()],
+            "rsi": self.rsi.to_dict(), "atr": self.atr.to_dict(),
+        }
+
+    @classmethod
+    def from_dict(cls, d: Dict) -> "IndicatorState":
+        s = cls(d["config"]["ema"], d["config"]["rsi"], d["config"]["atr"])
+        s.last_ts = d.get("last_ts")
+        s.emas = {int(e["period"]): EmaState.from_dict(e) for e in d["ema"]}
+        s.rsi = RsiState.from_dict(d["rsi"])
+        s.atr = AtrState.from_dict(d["atr"])
+        return s
+
+def _has_gap(points: List[List[float]], after_ts: float) -> bool:
+    prev = after_ts
+    for ts, _ in points:
+        if ts - prev > GAP_MS:
+            return True
+        prev = ts
+    return False
+
+def advance_features(
+    cid: str,
+    prices: List[List[float]],
+    ema_periods: Iterable[int] = (50, 100),
+    rsi_period: int = 14,
+    atr_period: int = 14,
+) -> Optional[Dict]:
+    """
+    EMA/RSI/ATR features pre coin z uloženého stavu posunutého o nové sviečky.
+    prices: [[ts, close], ...], posledný bod je živý (neuzavretý).
+    None = store je vypnutý alebo séria je prázdna (volajúci prepočíta sám).
+    """
+    if not pricestore.ENABLED or len(prices) < 2:
+        return None
+    closed, live = prices[:-1], prices[-1]
+    fresh = IndicatorState(ema_periods, rsi_period, atr_period)
+
+    state: Optional[IndicatorState] = None
+    raw = pricestore.load_state(cid)
+    if raw:
+        try:
+            state = IndicatorState.from_dict(raw)
+        except (KeyError, TypeError, ValueError):
+            state = None
+    new = closed
+    if state is not None and state.config() == fresh.config() and state.last_ts is not None:
+        new = [p for p in closed if p[0] > state.last_ts]
+        # stav je mimo okna alebo v dátach je diera -> plný prepočet
+        if closed[0][0] > state.last_ts or _has_gap(new, state.last_ts):
+            state = None; new = closed
+    else:
+        state = None
+    if state is None:
+        state = fresh
+
+    for ts, close in new:
+        state.update(ts, close)
+    if new:
+        try:
+            pricestore.save_state(cid, state.to_dict())
+        except OSError as e:
+            logging.warning("indicator state save %s failed: %s", cid, e)
+    return state.features(live[1])
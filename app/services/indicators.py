@@ -28,7 +28,7 @@ def rsi(values: List[float], period: int = 14) -> List[float]:
         losses.append(max(-diff, 0.0))
     avg_gain = sum(gains[1:period+1]) / period
     avg_loss = sum(losses[1:period+1]) / period
-    out = [50.0 for _ in range(period)]  # naplň začiatok
+    out = [50.0] * (period + 1)  # naplň začiatok (prvé hodnoty neutrál)
     for i in range(period+1, len(values)):
         avg_gain = (avg_gain * (period - 1) + gains[i]) / period
         avg_loss = (avg_loss * (period - 1) + losses[i]) / period
@@ -38,9 +38,6 @@ def rsi(values: List[float], period: int = 14) -> List[float]:
             rs = avg_gain / avg_loss
         rsi_val = 100.0 - (100.0 / (1.0 + rs))
         out.append(rsi_val)
-    # dorovnaj dĺžku (prvé hodnoty neutrál)
-    while len(out) < len(values):
-        out.insert(0, 50.0)
     return out
 
 def atr_from_closes(values: List[float], period: int = 14) -> List[float]:
@@ -58,12 +55,10 @@ def atr_from_closes(values: List[float], period: int = 14) -> List[float]:
         atr = [sum(tr)/max(1,len(tr)) for _ in tr]
     else:
         first = sum(tr[1:period+1]) / period
-        atr = [first]
+        atr = [first] * min(len(values), period + 1)
         for i in range(period+1, len(tr)):
             prev = atr[-1]
             atr.append((prev*(period-1) + tr[i]) / period)
-        while len(atr) < len(values):
-            atr.insert(0, atr[0])
     # zlaď dĺžku
     while len(atr) < len(values):
         atr.append(atr[-1])
@@ -0,0 +1,170 @@
+"""
+Voľba lídra medzi procesmi (uvicorn workery / nody) cez Postgres advisory lock.
+
+Scheduler joby (scany, watch, news poll), refresher TOP200 a e-mail worker beží
+iba v procese, ktorý drží session-level `pg_try_advisory_lock(LEADER_LOCK_KEY)`
+na vlastnom spojení (mimo poolu, AUTOCOMMIT – žiadna visiaca transakcia).
+Ostatné procesy obsluhujú iba API a každých LEADER_RETRY_S skúšajú lock získať.
+
+Lease: líder každých LEADER_RENEW_S overí spojenie (SELECT 1 s timeoutom); keď
+zlyhá, okamžite sa vzdá (on_demoted) a spojenie zahodí. Server pustí lock
+sám, keď spojenie zanikne – pri páde procesu hneď, pri výpadku siete po TCP
+keepalive (nastavený na lock spojení na ~LEADER_RENEW_S * 2.5), teda neskôr,
+než sa starý líder stihne vzdať. Pri inej DB než Postgres (SQLite, dev) je
+proces vždy líder; LEADER_ELECTION=0 voľbu vypne aj na Postgrese.
+"""
+import os
+import asyncio
+import logging
+from typing import Awaitable, Callable, Dict, Optional
+
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncConnection, create_async_engine
+from sqlalchemy.pool import NullPool
+
+from ..db import ASYNC_DATABASE_URL
+
+def _envf(name: str, default: float) -> float:
+    try: return float(os.getenv(name, str(default)))
+    except: return float(default)
+
+_DEFAULT_LOCK_KEY = 0x6b62726f6b6572  # "kbroker"
+
+def _lock_key(name: str, default: int) -> int:
+    """bigint kľúč bez float (ten by veľké hodnoty zaokrúhlil); "0x...", aj "0123". Zlá hodnota -> default."""
+    raw = os.getenv(name, "").strip()
+    if not raw:
+        return default
+    for base in (0, 10):  # base 0 odmietne úvodné nuly v desiatkovom zápise
+        try:
+            v = int(raw, base)
+        except ValueError:
+            continue
+        if -2**63 <= v < 2**63:
+            return v
+        break
+    logging.warning("%s=%r is not a signed 64-bit integer, using default %d", name, raw, default)
+    return default
+
+LEADER_LOCK_KEY = _lock_key("LEADER_LOCK_KEY", _DEFAULT_LOCK_KEY)
+LEADER_RENEW_S = _envf("LEADER_RENEW_S", 10.0)
+LEADER_RETRY_S = _envf("LEADER_RETRY_S", 5.0)
+ENABLED = ASYNC_DATABASE_URL.startswith("postgresql") and os.getenv("LEADER_ELECTION", "1") == "1"
+
+Callback = Callable[[], Awaitable[None]]
+
+class LeaderElector:
+    def __init__(self, on_elected: Callback, on_demoted: Callback,
+                 key: int = LEADER_LOCK_KEY, renew_s: float = LEADER_RENEW_S, retry_s: float = LEADER_RETRY_S) -> None:
+        self.on_elected = on_elected
+        self.on_demoted = on_demoted
+        self.key = key
+        self.renew_s = renew_s
+        self.retry_s = retry_s
+        self.is_leader = False
+        self.elections = 0
+        self.last_error: Optional[str] = None
+        self._conn: Optional[AsyncConnection] = None
+        self._task: Optional[asyncio.Task] = None
+        self._engine = None
+
+    # ---------- lock ----------
+    async def _acquire(self) -> bool:
+        if self._engine is None:
+            # vlastné spojenie mimo zdieľaného poolu; drží sa, kým sme líder
+            self._engine = create_async_engine(ASYNC_DATABASE_URL, poolclass=NullPool)
+        conn = await self._engine.connect()
+        try:
+            conn = await conn.execution_options(isolation_level="AUTOCOMMIT")
+            ka = max(1, int(self.renew_s))
+            await conn.execute(text(f"SET tcp_keepalives_idle = {ka}"))
+            await conn.execute(text(f"SET tcp_keepalives_interval = {max(1, ka // 2)}"))
+            await conn.execute(text("SET tcp_keepalives_count = 3"))
+            got = (await conn.execute(text("SELECT pg_try_advisory_lock(:k)"), {"k": self.key})).scalar()
+        except Exception:
+            await conn.close()
+            raise
+        if not got:
+            await conn.close()
+            return False
+        self._conn = conn
+        return True
+
+    async def _renew(self) -> bool:
+        try:
+            await asyncio.wait_for(self._conn.execute(text("SELECT 1")), self.renew_s)
+            return True
+        except Exception as e:
+            self.last_error = f"renew: {e}"
+            return False
+
+    async def _release(self, unlock: bool) -> None:
+        conn, self._conn = self._conn, None
+        if conn is None:
+            return
+        try:
+            if unlock:
+                await asyncio.wait_for(conn.execute(text("SELECT pg_advisory_unlock(:k)"), {"k": self.key}), self.renew_s)
+            await conn.close()
+        except Exception:
+            try: await conn.invalidate()
+            except Exception: pass
+
+    # ---------- stav ----------
+    async def _elect(self) -> None:
+        self.is_leader = True
+        self.elections += 1
+        logging.info("leader: elected (lock %d)", self.key)
+        await self.on_elected()
+
+    async def _demote(self) -> None:
+        if not self.is_leader:
+            return
+        self.is_leader = False
+        logging.warning("leader: stepping down")
+        try: await self.on_demoted()
+        except Exception as e:
+            logging.warning("leader: on_demoted failed: %s", e)
+
+    async def _run(self) -> None:
+        while True:
+            if not self.is_leader:
+                try:
+                    if await self._acquire():
+                        await self._elect()
+                        continue
+                except Exception as e:
+                    self.last_error = f"acquire: {e}"
+                    logging.warning("leader: lock attempt failed: %s", e)
+                await asyncio.sleep(self.retry_s)
+            else:
+                await asyncio.sleep(self.renew_s)
+                if not await self._renew():
+                    await self._demote()
+                    await self._release(unlock=False)
+
+    async def start(self) -> None:
+        if not ENABLED:
+            await self._elect()
+            return
+        if self._task is None or self._task.done():
+            self._task = asyncio.ensure_future(self._run())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try: await self._task
+            except (asyncio.CancelledError, Exception): pass
+            self._task = None
+        await self._demote()
+        # explicitný unlock -> follower prevezme hneď, nie až po keepalive
+        await self._release(unlock=True)
+        if self._engine is not None:
+            await self._engine.dispose()
+            self._engine = None
+
+    def state(self) -> Dict:
+        return {
+            "enabled": ENABLED, "leader": self.is_leader, "pid": os.getpid(), "lock_key": self.key,
+            "elections": self.elections, "renew_s": self.renew_s, "last_error": self.last_error,
+        }
@@ -1,9 +1,20 @@
+import os
+import json
 import time
 import math
-from typing import Dict, List, Tuple
+import asyncio
+import heapq
+import hashlib
+import logging
+import datetime as dt
+from typing import Dict, List, Optional, Set, Tuple
 from datetime import datetime, timezone
 import feedparser
 import re
+from sqlalchemy import delete, select
+
+from .http import get_client
+from ..db import AsyncSessionLocal, NewsEntry
 
 # Viac RSS zdrojov (bez kľúčov)
 FEEDS = [
@@ -20,6 +31,16 @@ FEEDS = [
     "https://www.theblock.co/rss",               # The Block
 ]
 
+def _envf(name: str, default: float) -> float:
+    try: return float(os.getenv(name, str(default)))
+    except: return float(default)
+
+RSS_TIMEOUT = _envf("RSS_TIMEOUT", 10.0)   # s na jeden feed
+_HEADERS = {"User-Agent": "crypto-broker/1.0 (+rss)"}
+
+# podmienený GET: url -> {"etag", "modified", "entries"}; pri 304 sa použijú uložené entries
+_feed_cache: Dict[str, Dict] = {}
+
 _word = re.compile(r"[A-Za-z0-9\-_.]+")
 _cashtag = re.compile(r"\$[A-Za-z]{2,10}")  # napr. $SOL, $BTC
 
@@ -44,75 +65,302 @@ def _published(entry) -> float:
 def _tokenize_lower(s: str) -> List[str]:
     return [w.lower() for w in _word.findall(s.lower())]
 
-def fetch_candidates_from_rss(
-    markets: List[Dict],
-    hours_back: int = 36,
-    max_candidates: int = 12,
-) -> List[Dict]:
+class Matcher:
     """
-    markets: výstup z CoinGecko /coins/markets (TOP200), slúži na mapovanie názvov/symbolov.
-    Výstup: [{id, symbol, name, news_hits, news_score}]
+    Predkompilovaný index symbolov a mien z markets.
+    Jeden text sa páruje jedným prechodom cez jeho tokeny (hash lookup),
+    viacslovné mená ("bitcoin cash") cez index podľa prvého tokenu.
     """
-    # mapy na rýchle párovanie
-    by_symbol: Dict[str, Tuple[str, str]] = {}   # SYMBOL -> (id, name)
-    by_name: Dict[str, Tuple[str, str]] = {}     # "solana" -> (id, "Solana")
-    for m in markets:
-        cid = m.get("id")
-        sym = (m.get("symbol") or "").upper()
-        name = (m.get("name") or "").strip()
-        if not cid or not sym or not name:
-            continue
-        by_symbol[sym] = (cid, name)
-        by_name[name.lower()] = (cid, name)
 
-    hits: Dict[str, Dict] = {}  # id -> agg
-    cutoff_h = float(hours_back)
+    def __init__(self, markets: List[Dict]) -> None:
+        self.by_symbol: Dict[str, Tuple[str, str, str]] = {}   # "SOL" -> (id, "SOL", "Solana")
+        self.by_name: Dict[str, Tuple[str, str, str]] = {}     # "solana" -> (id, "SOL", "Solana")
+        for m in markets:
+            cid = m.get("id")
+            sym = (m.get("symbol") or "").upper()
+            name = (m.get("name") or "").strip()
+            if not cid or not sym or not name:
+                continue
+            self.by_symbol[sym] = (cid, sym, name)
+            self.by_name[name.lower()] = (cid, sym, name)
+        self.sym_tok: Dict[str, Tuple[str, str, str]] = {s.lower(): v for s, v in self.by_symbol.items()}
+        # mená: celé slovo, dĺžka > 3 kvôli bežným slovám
+        self.name_tok: Dict[str, Tuple[str, str, str]] = {}
+        self.phrases: Dict[str, List[Tuple[Tuple[str, ...], Tuple[str, str, str]]]] = {}
+        for key, v in self.by_name.items():
+            if len(key) <= 3:
+                continue
+            parts = tuple(_tokenize_lower(key))
+            if len(parts) == 1:
+                self.name_tok[parts[0]] = v
+            elif parts:
+                self.phrases.setdefault(parts[0], []).append((parts, v))
+
+    def match(self, text: str) -> Tuple[List[Tuple[str, str, str]], Set[str]]:
+        """text -> ([(id, symbol, name), ...], cashtagy); coin max. raz za každý spôsob zhody."""
+        tags = {t[1:].upper() for t in _cashtag.findall(text)}  # {$SOL, $BTC} -> {"SOL", "BTC"}
+        toks = _tokenize_lower(text)
+
+        # 1) match cashtagov
+        matched = [self.by_symbol[t] for t in tags if t in self.by_symbol]
+        # 2) symbol ako celé slovo, 3) meno (jedno slovo alebo fráza)
+        by_sym: Dict[str, Tuple[str, str, str]] = {}
+        by_nm: Dict[str, Tuple[str, str, str]] = {}
+        n = len(toks)
+        for i, t in enumerate(toks):
+            v = self.sym_tok.get(t)
+            if v is not None:
+                by_sym[v[0]] = v
+            v = self.name_tok.get(t)
+            if v is not None:
+                by_nm[v[0]] = v
+            for parts, v in self.phrases.get(t, ()):
+                if tuple(toks[i:i + len(parts)]) == parts:
+                    by_nm[v[0]] = v
+        matched.extend(by_sym.values())
+        matched.extend(by_nm.values())
+        return matched, tags
+
+_MATCHER: Tuple[int, Optional[Matcher]] = (0, None)
+
+def get_matcher(markets: List[Dict]) -> Matcher:
+    """Index je nacachovaný a prestaví sa iba pri zmene univerza (id/symbol/meno)."""
+    global _MATCHER
+    fp = hash(tuple((m.get("id"), m.get("symbol"), m.get("name")) for m in markets))
+    key, mt = _MATCHER
+    if mt is None or key != fp:
+        mt = Matcher(markets)
+        _MATCHER = (fp, mt)
+    return mt
+
+async def _fetch_feed(url: str, timeout: float) -> List:
+    """
+    Jeden feed cez zdieľaného klienta s If-None-Match / If-Modified-Since.
+    304 -> uložené entries bez parsovania; parsovanie beží v threade (neblokuje loop).
+    Pri chybe vráti posledné známe entries (RSS niekedy zlyhá — ideme ďalej).
+    """
+    cached = _feed_cache.get(url)
+    try:
+        if not url.startswith(("http://", "https://")):
+            feed = await asyncio.to_thread(feedparser.parse, url)  # lokálny súbor
+            return list(feed.entries)
+        headers: Dict[str, str] = {}
+        if cached and cached.get("etag"):
+            headers["If-None-Match"] = cached["etag"]
+        if cached and cached.get("modified"):
+            headers["If-Modified-Since"] = cached["modified"]
+        r = await asyncio.wait_for(get_client("rss", _HEADERS).get(url, headers=headers, follow_redirects=True), timeout)
+        if r.status_code == 304 and cached:
+            return cached["entries"]
+        r.raise_for_status()
+        feed = await asyncio.to_thread(feedparser.parse, r.content, response_headers=dict(r.headers))
+        entries = list(feed.entries)
+        _feed_cache[url] = {"etag": r.headers.get("etag"), "modified": r.headers.get("last-modified"), "entries": entries}
+        return entries
+    except Exception as e:
+        logging.debug("rss %s failed: %s", url, e)
+        return cached["entries"] if cached else []
+
+async def fetch_feeds(feeds: Optional[List[str]] = None, timeout: Optional[float] = None) -> List[List]:
+    """Všetky feedy naraz; každý má vlastný timeout, pomalý feed nezdrží ostatné."""
+    urls = FEEDS if feeds is None else feeds
+    t = RSS_TIMEOUT if timeout is None else timeout
+    return list(await asyncio.gather(*(_fetch_feed(u, t) for u in urls)))
+
+# ---------- inkrementálny ingest ----------
+# Každá položka (guid/link) sa tokenizuje a páruje iba raz; zhody sa uložia do DB
+# (news_entries) a do pamäte. Skóre sa počíta z uložených zhôd, čerstvosť až pri dotaze.
+NEWS_RETENTION_H = _envf("NEWS_RETENTION_H", 72.0)
+
+NEWS_WINDOW_H = _envf("NEWS_WINDOW_H", 36.0)
+NEWS_TAU_H = 12.0  # freshness = exp(-age / 12h)
+
+_entries: Dict[str, Tuple[float, List[Tuple[str, str, str, bool]]]] = {}  # key -> (published_ts, zhody)
+_loaded = False
+_ingest_lock = asyncio.Lock()
+
+class NewsIndex:
+    """
+    Živý index coin_id -> news_score / news_hits za posledných `window_h` hodín.
+    Čerstvostná časť sa drží vzhľadom na spoločný referenčný čas a rozpad
+    exp(-(now - ref) / tau) sa dopočíta až pri čítaní; položky mimo okna
+    odchádzajú z haldy podľa času publikácie. Skóre je zhodné so score_candidates.
+    """
 
-    for url in FEEDS:
-        try:
-            feed = feedparser.parse(url)
-            for e in feed.entries:
+    def __init__(self, window_h: float = NEWS_WINDOW_H, tau_h: float = NEWS_TAU_H) -> None:
+        self.window_s = window_h * 3600.0
+        self.tau_s = tau_h * 3600.0
+        self.ref = _now_ts()
+        self.coins: Dict[str, Dict] = {}   # id -> {symbol, name, fresh (k ref), bonus, hits}
+        self._heap: List[Tuple[float, str, bool]] = []
+
+    def add(self, ts: float, matched: List[Tuple[str, str, str, bool]], now: Optional[float] = None) -> None:
+        now = _now_ts() if now is None else now
+        ts = min(ts, now)  # položky "z budúcnosti" majú vek 0
+        if not matched or now - ts > self.window_s:
+            return
+        # expirácia + posun ref aj bez top(): inak halda rastie a exp((ts - ref) / tau) pretečie
+        self._advance(now)
+        w = math.exp((ts - self.ref) / self.tau_s)
+        for cid, sym, nm, tagged in matched:
+            c = self.coins.get(cid)
+            if c is None:
+                c = self.coins[cid] = {"symbol": sym, "name": nm, "fresh": 0.0, "bonus": 0.0, "hits": 0}
+            c["fresh"] += w
+            c["bonus"] += 0.5 if tagged else 0.0
+            c["hits"] += 1
+            heapq.heappush(self._heap, (ts, cid, tagged))
+
+    def _advance(self, now: float) -> None:
+        cutoff = now - self.window_s
+        while self._heap and self._heap[0][0] < cutoff:
+            ts, cid, tagged = heapq.heappop(self._heap)
+            c = self.coins[cid]
+            c["hits"] -= 1
+            if c["hits"] <= 0:
+                del self.coins[cid]
+                continue
+            c["fresh"] -= math.exp((ts - self.ref) / self.tau_s)
+            c["bonus"] -= 0.5 if tagged else 0.0
+        # posun referencie, nech exp((ts - ref) / tau) ostáva malé
+        if now - self.ref > self.tau_s:
+            f = math.exp(-(now - self.ref) / self.tau_s)
+            for c in self.coins.values():
+                c["fresh"] *= f
+            self.ref = now
+
+    def top(self, n: int = 12, now: Optional[float] = None) -> List[Dict]:
+        """Top-n coinov ako score_candidates: [{id, symbol, name, news_hits, news_score}]."""
+        now = _now_ts() if now is None else now
+        self._advance(now)
+        f = math.exp(-(now - self.ref) / self.tau_s)
+        best = heapq.nlargest(n, ((c["fresh"] * f + c["bonus"], c["hits"], cid) for cid, c in self.coins.items()))
+        return [
+            {"id": cid, "symbol": self.coins[cid]["symbol"], "name": self.coins[cid]["name"],
+             "news_hits": hits, "news_score": score}
+            for score, hits, cid in best
+        ]
+
+    def __len__(self) -> int:
+        return len(self.coins)
+
+index = NewsIndex()
+LAST_POLL: Optional[float] = None
+
+def _entry_key(entry) -> str:
+    raw = getattr(entry, "id", None) or getattr(entry, "link", None) or _text_of(entry)
+    return hashlib.sha1(str(raw).encode("utf-8", "replace")).hexdigest()
+
+def _to_dt(ts: float) -> dt.datetime:
+    return dt.datetime.fromtimestamp(ts, timezone.utc).replace(tzinfo=None)
+
+async def _load_seen() -> Dict[str, Tuple[float, List]]:
+    cutoff = _to_dt(_now_ts() - NEWS_RETENTION_H * 3600)
+    async with AsyncSessionLocal() as db:
+        rows = (await db.execute(select(NewsEntry).where(NewsEntry.published_at >= cutoff))).scalars().all()
+    return {
+        r.key: (r.published_at.replace(tzinfo=timezone.utc).timestamp(), [tuple(m) for m in json.loads(r.matches or "[]")])
+        for r in rows
+    }
+
+async def _save_seen(new: List[Tuple[str, float, List]]) -> None:
+    async with AsyncSessionLocal() as db:
+        # iný proces (worker) mohol tie isté položky uložiť medzitým
+        have = set((await db.execute(select(NewsEntry.key).where(NewsEntry.key.in_([n[0] for n in new])))).scalars())
+        db.add_all([
+            NewsEntry(key=key, published_at=_to_dt(ts), matches=json.dumps(matches))
+            for key, ts, matches in new if key not in have
+        ])
+        await db.execute(delete(NewsEntry).where(NewsEntry.published_at < _to_dt(_now_ts() - NEWS_RETENTION_H * 3600)))
+        await db.commit()
+
+def _prune_memory() -> None:
+    cutoff = _now_ts() - NEWS_RETENTION_H * 3600
+    for key in [k for k, (ts, _) in _entries.items() if ts < cutoff]:
+        del _entries[key]
+
+async def ingest(markets: List[Dict]) -> int:
+    """Stiahne feedy a spracuje iba nové položky. Vráti počet nových."""
+    global _loaded
+    async with _ingest_lock:
+        if not _loaded:
+            try:
+                loaded = await _load_seen()
+                _entries.update(loaded)
+                for ts, rec in loaded.values():
+                    index.add(ts, rec)
+            except Exception as e:
+                logging.warning("news store load failed, using memory only: %s", e)
+            _loaded = True
+
+        matcher = get_matcher(markets)
+        new: List[Tuple[str, float, List]] = []
+        for entries in await fetch_feeds():
+            for e in entries:
+                key = _entry_key(e)
+                if key in _entries:
+                    continue
                 ts = _published(e)
-                age_h = _age_hours(ts)
-                if age_h > cutoff_h:
+                if _age_hours(ts) > NEWS_RETENTION_H:
                     continue
+                matched, tags = matcher.match(_text_of(e))
+                rec = [(cid, sym, nm, sym in tags) for cid, sym, nm in matched]
+                _entries[key] = (ts, rec)
+                index.add(ts, rec)
+                new.append((key, ts, rec))
+        _prune_memory()
+        if new:
+            try:
+                await _save_seen(new)
+            except Exception as e:
+                logging.warning("news store save failed: %s", e)
+        return len(new)
+
+async def poll(markets: List[Dict]) -> int:
+    """Jeden beh pollera (scheduler job): ingest nových položiek do store aj indexu."""
+    global LAST_POLL
+    n = await ingest(markets)
+    LAST_POLL = _now_ts()
+    index._advance(LAST_POLL)  # index číta iba /news/top a wildcards – expiruj aj bez nich
+    return n
 
-                text = _text_of(e)
-                toks = set(_tokenize_lower(text))
-                tags = {t[1:].upper() for t in _cashtag.findall(text)}  # {$SOL, $BTC} -> {"SOL", "BTC"}
-
-                matched: List[Tuple[str, str, str]] = []
-
-                # 1) match cashtagov
-                for sym in tags:
-                    if sym in by_symbol:
-                        cid, nm = by_symbol[sym]
-                        matched.append((cid, sym, nm))
-
-                # 2) match podľa symbolu ako celého slova (lowercase v toks)
-                for sym, (cid, nm) in by_symbol.items():
-                    if sym.lower() in toks:
-                        matched.append((cid, sym, nm))
-
-                # 3) match podľa mena (celé slovo; dĺžka > 3 kvôli bežným slovám)
-                for nm_key, (cid, nm) in by_name.items():
-                    if len(nm_key) > 3 and nm_key in toks:
-                        matched.append((cid, by_symbol.get(nm.upper(), (sym,))[0] if nm.upper() in by_symbol else nm[:6].upper(), nm))
-
-                # skóre: čerstvosť (exponenciálne), bonus za priamy cashtag
-                freshness = math.exp(-age_h / 12.0)  # ~ polčas 8–12h
-                base = 1.0 * freshness
-                for cid, sym, nm in matched:
-                    if cid not in hits:
-                        hits[cid] = {"id": cid, "symbol": sym, "name": nm, "news_hits": 0, "news_score": 0.0}
-                    hits[cid]["news_hits"] += 1
-                    # +0.5 bonus ak bol cashtag (silnejšia relevancia)
-                    bonus = 0.5 if sym in tags else 0.0
-                    hits[cid]["news_score"] += base + bonus
-        except Exception:
-            # RSS niekedy zlyhá — ticho ignorujeme a ideme ďalej
+def top(n: int = 12) -> List[Dict]:
+    """Top-n z živého indexu (bez siete a parsovania)."""
+    return index.top(n)
+
+def index_state() -> Dict:
+    return {"last_poll": LAST_POLL, "coins": len(index), "entries": len(_entries), "window_h": NEWS_WINDOW_H}
+
+def score_candidates(hours_back: int = 36, max_candidates: int = 12) -> List[Dict]:
+    """news_hits / news_score z uložených zhôd; čerstvosť exp(-age/12) sa počíta teraz."""
+    now = _now_ts()
+    cutoff_h = float(hours_back)
+    hits: Dict[str, Dict] = {}  # id -> agg
+    for ts, matched in _entries.values():
+        age_h = max(0.0, (now - ts) / 3600.0)
+        if age_h > cutoff_h:
             continue
+        # skóre: čerstvosť (exponenciálne), bonus za priamy cashtag
+        base = math.exp(-age_h / NEWS_TAU_H)  # ~ polčas 8–12h
+        for cid, sym, nm, tagged in matched:
+            if cid not in hits:
+                hits[cid] = {"id": cid, "symbol": sym, "name": nm, "news_hits": 0, "news_score": 0.0}
+            hits[cid]["news_hits"] += 1
+            # +0.5 bonus ak bol cashtag (silnejšia relevancia)
+            hits[cid]["news_score"] += base + (0.5 if tagged else 0.0)
 
     out = [v for v in hits.values() if v["news_hits"] >= 1]
     out.sort(key=lambda x: (x["news_score"], x["news_hits"]), reverse=True)
     return out[:max_candidates]
+
+async def fetch_candidates_from_rss(
+    markets: List[Dict],
+    hours_back: int = 36,
+    max_candidates: int = 12,
+) -> List[Dict]:
+    """
+    markets: výstup z CoinGecko /coins/markets (TOP200), slúži na mapovanie názvov/symbolov.
+    Výstup: [{id, symbol, name, news_hits, news_score}]
+    """
+    await ingest(markets)
+    return score_candidates(hours_back, max_candidates)
@@ -1,24 +1,98 @@
-import smtplib, os
+import smtplib, os, time
 from email.mime.text import MIMEText
 from email.utils import formataddr
+from typing import Dict, Optional
 
-def send_email(subject: str, html: str) -> None:
-    host = os.getenv("EMAIL_HOST")
-    port = int(os.getenv("EMAIL_PORT", "587"))
-    user = os.getenv("EMAIL_USER")
-    pwd  = os.getenv("EMAIL_PASS")
-    to   = os.getenv("EMAIL_TO")
-
-    if not all([host, port, user, pwd, to]):
+def _config() -> Dict:
+    cfg = {
+        "host": os.getenv("EMAIL_HOST"),
+        "port": int(os.getenv("EMAIL_PORT", "587")),
+        "user": os.getenv("EMAIL_USER"),
+        "pwd": os.getenv("EMAIL_PASS"),
+        "to": os.getenv("EMAIL_TO"),
+        "starttls": os.getenv("EMAIL_STARTTLS", "1") == "1",
+    }
+    if not all([cfg["host"], cfg["port"], cfg["user"], cfg["pwd"], cfg["to"]]):
         raise RuntimeError("Chýbajú EMAIL_* premenné v prostredí.")
+    return cfg
+
+def configured() -> bool:
+    try: _config(); return True
+    except RuntimeError: return False
 
+def _message(cfg: Dict, subject: str, html: str) -> str:
     msg = MIMEText(html, "html", "utf-8")
-    msg["From"] = formataddr(("Krypto Broker", user))
-    msg["To"] = to
+    msg["From"] = formataddr(("Krypto Broker", cfg["user"]))
+    msg["To"] = cfg["to"]
     msg["Subject"] = subject
+    return msg.as_string()
 
-    s = smtplib.SMTP(host, port)
-    s.starttls()
-    s.login(user, pwd)
-    s.sendmail(user, [to], msg.as_string())
+def _connect(cfg: Dict) -> smtplib.SMTP:
+    s = smtplib.SMTP(cfg["host"], cfg["port"], timeout=30)
+    if cfg["starttls"]:
+        s.starttls()
+    s.login(cfg["user"], cfg["pwd"])
+    return s
+
+def send_email(subject: str, html: str) -> None:
+    cfg = _config()
+    s = _connect(cfg)
+    s.sendmail(cfg["user"], [cfg["to"]], _message(cfg, subject, html))
     s.quit()
+
+class SmtpSession:
+    """
+    Jedno SMTP spojenie (STARTTLS + login) pre viac správ. Po `idle_s` bez
+    posielania sa pred ďalšou správou overí NOOP-om; ak ho server medzitým
+    zavrel, pripojí sa znova. Blokujúce – volať z threadu.
+    """
+    def __init__(self, idle_s: float = 60.0) -> None:
+        self.idle_s = idle_s
+        self._smtp: Optional[smtplib.SMTP] = None
+        self._cfg: Optional[Dict] = None
+        self._last = 0.0
+        self.connects = 0
+
+    def _alive(self) -> bool:
+        if self._smtp is None:
+            return False
+        if time.monotonic() - self._last < self.idle_s:
+            return True
+        try:
+            return self._smtp.noop()[0] == 250
+        except (smtplib.SMTPException, OSError):
+            return False
+
+    def _open(self) -> None:
+        self.close()
+        self._cfg = _config()
+        self._smtp = _connect(self._cfg)
+        self.connects += 1
+
+    def send(self, subject: str, html: str) -> None:
+        if not self._alive():
+            self._open()
+        try:
+            self._smtp.sendmail(self._cfg["user"], [self._cfg["to"]], _message(self._cfg, subject, html))
+        except (smtplib.SMTPServerDisconnected, ConnectionError):
+            # server zavrel spojenie bez NOOP-u (timeout, reštart) -> jeden nový pokus.
+            # Iné SMTPException (tiež OSError!) – odmietnutý príjemca, DATA 5xx – idú volajúcemu,
+            # opakované poslanie by mohlo doručiť duplikát.
+            self._open()
+            self._smtp.sendmail(self._cfg["user"], [self._cfg["to"]], _message(self._cfg, subject, html))
+        self._last = time.monotonic()
+
+    @property
+    def is_open(self) -> bool:
+        return self._smtp is not None
+
+    def idle_for(self) -> float:
+        return time.monotonic() - self._last if self._smtp is not None else 0.0
+
+    def close(self) -> None:
+        if self._smtp is not None:
+            try: self._smtp.quit()
+            except Exception:
+                try: self._smtp.close()
+                except Exception: pass
+            self._smtp = None
@@ -0,0 +1,163 @@
+"""
+Notifikačný outbox: e-maily sa zapíšu do DB (email_outbox) a background worker
+ich posiela cez jedno udržiavané SMTP spojenie (notifier.SmtpSession v threade).
+
+`add(db, ...)` zapíše správu v tej istej transakcii ako zmenu, ktorá ju
+spôsobila (napr. last_alert_at vo watch jobe) – po commite stačí `wake()`.
+Worker si dávku najprv "prenajme" (posunie next_attempt_at o EMAIL_LEASE_S,
+na Postgrese FOR UPDATE SKIP LOCKED), takže ani viac procesov, ani pád
+uprostred posielania správu nezdvojí/nestratí. Chyby sa opakujú s backoffom,
+po EMAIL_MAX_ATTEMPTS pokusoch ostane správa v tabuľke s last_error. Odoslané
+správy sa mažú po EMAIL_RETENTION_H (pri ďalšej odoslanej dávke).
+"""
+import os
+import asyncio
+import logging
+import datetime as dt
+from typing import Dict, List, Optional, Tuple
+
+from sqlalchemy import delete, func, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from .notifier import SmtpSession, configured
+from ..db import AsyncSessionLocal, EmailOutbox
+
+def _envf(name: str, default: float) -> float:
+    try: return float(os.getenv(name, str(default)))
+    except: return float(default)
+
+EMAIL_BATCH = int(_envf("EMAIL_BATCH", 50))
+EMAIL_POLL_S = _envf("EMAIL_POLL_S", 30.0)        # poistka, inak worker budí wake()
+EMAIL_IDLE_S = _envf("EMAIL_IDLE_S", 60.0)        # po tejto pauze sa spojenie overí NOOP-om
+EMAIL_KEEP_S = _envf("EMAIL_KEEP_S", 300.0)       # po tejto pauze sa spojenie zavrie
+EMAIL_LEASE_S = _envf("EMAIL_LEASE_S", 300.0)
+EMAIL_MAX_ATTEMPTS = int(_envf("EMAIL_MAX_ATTEMPTS", 5))
+EMAIL_RETENTION_H = _envf("EMAIL_RETENTION_H", 168.0)
+
+_worker: Optional[asyncio.Task] = None
+_wake: Optional[asyncio.Event] = None
+_stopping = False
+_session = SmtpSession(EMAIL_IDLE_S)
+_stats: Dict = {"sent": 0, "failed": 0, "last_error": None}
+
+def add(db: AsyncSession, subject: str, html: str) -> None:
+    """Pridá správu do session volajúceho; odošle sa po jeho commite (+ wake())."""
+    if not configured():
+        logging.warning("email not configured, dropping: %s", subject)
+        return
+    db.add(EmailOutbox(subject=subject[:300], html=html))
+
+def wake() -> None:
+    if _wake is not None:
+        _wake.set()
+
+async def enqueue(subject: str, html: str) -> None:
+    async with AsyncSessionLocal() as db:
+        add(db, subject, html)
+        await db.commit()
+    wake()
+
+def _backoff(attempts: int) -> dt.timedelta:
+    return dt.timedelta(seconds=min(60.0 * 2 ** (attempts - 1), 3600.0))
+
+def _send_batch(msgs: List[Tuple[int, str, str]]) -> Tuple[List[int], Optional[Tuple[int, str]]]:
+    """Pošle správy cez zdieľanú session (v threade). Zastaví sa na prvej chybe."""
+    sent: List[int] = []
+    for mid, subject, html in msgs:
+        try:
+            _session.send(subject, html)
+        except Exception as e:
+            _session.close()
+            return sent, (mid, f"{type(e).__name__}: {e}"[:300])
+        sent.append(mid)
+    return sent, None
+
+async def drain() -> int:
+    """Jedna dávka: prenájom čakajúcich správ, odoslanie, zápis výsledku. Vráti veľkosť dávky (0 pri chybe)."""
+    now = dt.datetime.utcnow()
+    async with AsyncSessionLocal() as db:
+        rows = (await db.execute(
+            select(EmailOutbox)
+            .where(EmailOutbox.sent_at.is_(None), EmailOutbox.next_attempt_at <= now,
+                   EmailOutbox.attempts < EMAIL_MAX_ATTEMPTS)
+            .order_by(EmailOutbox.id).limit(EMAIL_BATCH)
+            .with_for_update(skip_locked=True)
+        )).scalars().all()
+        if not rows:
+            return 0
+        for r in rows:
+            r.next_attempt_at = now + dt.timedelta(seconds=EMAIL_LEASE_S)
+        await db.commit()
+
+        sent, failed = await asyncio.to_thread(_send_batch, [(r.id, r.subject, r.html) for r in rows])
+        done = dt.datetime.utcnow()
+        by_id = {r.id: r for r in rows}
+        for mid in sent:
+            by_id[mid].sent_at = done
+        if failed is not None:
+            r = by_id[failed[0]]
+            r.attempts += 1
+            r.last_error = failed[1]
+            r.next_attempt_at = done + _backoff(r.attempts)
+            _stats["failed"] += 1; _stats["last_error"] = failed[1]
+            logging.warning("email send failed (%d/%d): %s", r.attempts, EMAIL_MAX_ATTEMPTS, failed[1])
+        # neodoslané za chybou: uvoľni prenájom, skúsia sa v ďalšej dávke
+        for r in rows[len(sent) + (failed is not None):]:
+            r.next_attempt_at = now
+        if sent:
+            await db.execute(delete(EmailOutbox).where(
+                EmailOutbox.sent_at < done - dt.timedelta(hours=EMAIL_RETENTION_H)))
+        await db.commit()
+    _stats["sent"] += len(sent)
+    return len(rows) if failed is None else 0
+
+async def _run() -> None:
+    try:
+        while not _stopping:
+            try:
+                n = await drain()
+            except Exception as e:
+                logging.warning("email outbox error: %s", e)
+                n = 0
+            if n >= EMAIL_BATCH:
+                continue  # plná dávka -> pravdepodobne čaká ďalšia
+            if _session.idle_for() > EMAIL_KEEP_S:
+                await asyncio.to_thread(_session.close)
+            try:
+                await asyncio.wait_for(_wake.wait(), EMAIL_POLL_S)
+            except asyncio.TimeoutError:
+                pass
+            _wake.clear()
+    finally:
+        await asyncio.to_thread(_session.close)
+
+def start_worker() -> None:
+    global _worker, _wake, _stopping
+    if _worker is None or _worker.done():
+        _stopping = False
+        _wake = asyncio.Event()
+        _worker = asyncio.ensure_future(_run())
+
+async def stop_worker(timeout: float = 10.0) -> None:
+    """Nechá dobehnúť rozposielanú dávku (inak by sa po EMAIL_LEASE_S poslala znova), potom cancel."""
+    global _worker, _stopping
+    if _worker is not None:
+        _stopping = True
+        wake()
+        try:
+            await asyncio.wait_for(_worker, timeout)
+        except (asyncio.CancelledError, asyncio.TimeoutError, Exception):
+            pass
+        _worker = None
+
+async def state() -> Dict:
+    async with AsyncSessionLocal() as db:
+        pending, given_up = (await db.execute(select(
+            func.count().filter(EmailOutbox.sent_at.is_(None), EmailOutbox.attempts < EMAIL_MAX_ATTEMPTS),
+            func.count().filter(EmailOutbox.sent_at.is_(None), EmailOutbox.attempts >= EMAIL_MAX_ATTEMPTS),
+        ))).one()
+    return {
+        "pending": pending, "given_up": given_up, **_stats,
+        "smtp_connects": _session.connects, "smtp_open": _session.is_open,
+        "worker_running": _worker is not None and not _worker.done(),
+    }
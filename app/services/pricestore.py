@@ -0,0 +1,163 @@
+import os
+import re
+import json
+import math
+import time
+import logging
+from typing import Dict, List, Optional
+
+import numpy as np
+
+# Lokálny stĺpcový store hodinových cien: <root>/<coin_id>/seg-NNNNNN.npy
+# Každý segment je (n, 2) float64 [ts_ms, close], segmenty sú iba append-only.
+# head.npy drží posledný (neuzavretý, "živý") bod – ten sa pri ďalšom merge prepíše.
+ROOT: str = os.getenv("PRICE_STORE_DIR", ".cache/prices")
+ENABLED: bool = os.getenv("PRICE_STORE", "1") == "1"
+
+HOUR_MS = 3600_000
+DAY_MS = 24 * HOUR_MS
+MIN_STEP_MS = HOUR_MS // 2          # bližšie body (posun časovej mriežky) ignorujeme
+FRESH_MS = int(float(os.getenv("PRICE_STORE_FRESH_MIN", "15")) * 60_000)
+MAX_SEGMENTS = int(os.getenv("PRICE_STORE_MAX_SEGMENTS", "32"))
+RETENTION_MS = int(float(os.getenv("PRICE_STORE_RETENTION_DAYS", "30")) * DAY_MS)
+
+_EMPTY = np.empty((0, 2), dtype=np.float64)
+_safe = re.compile(r"[^A-Za-z0-9._-]")
+
+def _dir(cid: str) -> str:
+    return os.path.join(ROOT, _safe.sub("_", cid))
+
+def _segments(d: str) -> List[str]:
+    try:
+        names = os.listdir(d)
+    except FileNotFoundError:
+        return []
+    return sorted(n for n in names if n.startswith("seg-") and n.endswith(".npy"))
+
+def _save_atomic(path: str, arr: np.ndarray) -> None:
+    tmp = f"{path}.tmp{os.getpid()}"
+    with open(tmp, "wb") as f:
+        np.save(f, np.ascontiguousarray(arr, dtype=np.float64))
+    os.replace(tmp, path)
+
+def _load(path: str) -> np.ndarray:
+    try:
+        a = np.load(path, mmap_mode="r")
+    except (FileNotFoundError, ValueError):
+        return _EMPTY
+    return a if a.ndim == 2 and a.shape[1] == 2 else _EMPTY
+
+def list_ids() -> List[str]:
+    """Coiny, pre ktoré je v store nejaká história."""
+    try:
+        return sorted(n for n in os.listdir(ROOT) if _segments(os.path.join(ROOT, n)))
+    except FileNotFoundError:
+        return []
+
+def read_closed(cid: str) -> np.ndarray:
+    """Uzavreté hodinové body (bez živého head bodu)."""
+    d = _dir(cid)
+    parts = [_load(os.path.join(d, n)) for n in _segments(d)]
+    parts = [p for p in parts if len(p)]
+    if not parts:
+        return _EMPTY
+    if len(parts) == 1:
+        return np.asarray(parts[0])
+    arr = np.concatenate(parts)
+    # počas kompakcie môžu byť na disku staré aj zlúčené segmenty naraz
+    ts = arr[:, 0]
+    if len(ts) > 1 and not np.all(ts[1:] > ts[:-1]):
+        prev_max = np.maximum.accumulate(np.concatenate([[-np.inf], ts[:-1]]))
+        arr = arr[ts > prev_max]
+    return arr
+
+def read(cid: str) -> np.ndarray:
+    """Celá uložená séria (segmenty + head)."""
+    closed = read_closed(cid)
+    head = _load(os.path.join(_dir(cid), "head.npy"))
+    if len(head) and (not len(closed) or head[-1, 0] > closed[-1, 0]):
+        return np.concatenate([closed, np.asarray(head)])
+    return closed
+
+def window(arr: np.ndarray, days: int, now_ms: Optional[float] = None) -> List[List[float]]:
+    """Body za posledných `days` dní vo formáte CoinGecko [[ts, close], ...]."""
+    if not len(arr):
+        return []
+    now_ms = now_ms if now_ms is not None else time.time() * 1000
+    return arr[arr[:, 0] >= now_ms - days * DAY_MS].tolist()
+
+def delta_days(arr: np.ndarray, days: int, now_ms: Optional[float] = None) -> Optional[int]:
+    """
+    Koľko dní treba dotiahnuť: None = dáta sú čerstvé, inak počet dní pre market_chart.
+    Pod 2 dni CoinGecko vracia 5-min body, preto minimum 2 (hodinová granularita).
+    """
+    now_ms = now_ms if now_ms is not None else time.time() * 1000
+    if not len(arr) or arr[0, 0] > now_ms - days * DAY_MS + 2 * HOUR_MS:
+        return days  # málo histórie -> plný fetch
+    if now_ms - arr[-1, 0] < FRESH_MS:
+        return None
+    # posledný uzavretý bod je ~hodinu pred head bodom
+    gap_days = (now_ms - arr[-1, 0] + HOUR_MS) / DAY_MS
+    if gap_days >= days:
+        return days
+    return min(days, max(2, math.ceil(gap_days)))
+
+def merge(cid: str, prices: List[List[float]]) -> None:
+    """Pripojí nové uzavreté body ako nový segment a prepíše head."""
+    if not prices:
+        return
+    arr = np.asarray(prices, dtype=np.float64)
+    if arr.ndim != 2 or arr.shape[1] != 2:
+        return
+    arr = arr[np.argsort(arr[:, 0], kind="stable")]
+    d = _dir(cid)
+    os.makedirs(d, exist_ok=True)
+
+    segs = _segments(d)
+    last = read_closed(cid)
+    last_ts = last[-1, 0] if len(last) else -math.inf
+
+    closed = arr[:-1]
+    new = closed[closed[:, 0] >= last_ts + MIN_STEP_MS]
+    if len(new):
+        # odstráň body bližšie ako MIN_STEP_MS k predchádzajúcemu
+        keep = np.concatenate([[True], np.diff(new[:, 0]) >= MIN_STEP_MS])
+        new = new[keep]
+        seq = int(segs[-1][4:10]) + 1 if segs else 1
+        _save_atomic(os.path.join(d, f"seg-{seq:06d}.npy"), new)
+        segs.append(f"seg-{seq:06d}.npy")
+    _save_atomic(os.path.join(d, "head.npy"), arr[-1:])
+
+    if len(segs) > MAX_SEGMENTS:
+        _compact(cid, segs)
+
+def _compact(cid: str, segs: List[str]) -> None:
+    """Zlúči segmenty do jedného a zahodí body staršie ako retencia."""
+    d = _dir(cid)
+    arr = np.array(read_closed(cid))
+    if len(arr):
+        arr = arr[arr[:, 0] >= arr[-1, 0] - RETENTION_MS]
+    seq = int(segs[-1][4:10]) + 1
+    _save_atomic(os.path.join(d, f"seg-{seq:06d}.npy"), arr)
+    for n in segs:
+        try:
+            os.remove(os.path.join(d, n))
+        except OSError as e:
+            logging.warning("price store compact %s: %s", cid, e)
+
+def load_state(cid: str) -> Optional[Dict]:
+    """Uložený stav indikátorov pre coin (state.json) alebo None."""
+    try:
+        with open(os.path.join(_dir(cid), "state.json"), "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (FileNotFoundError, ValueError):
+        return None
+
+def save_state(cid: str, state: Dict) -> None:
+    d = _dir(cid)
+    os.makedirs(d, exist_ok=True)
+    path = os.path.join(d, "state.json")
+    tmp = f"{path}.tmp{os.getpid()}"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(state, f)
+    os.replace(tmp, path)
@@ -0,0 +1,118 @@
+import time
+import asyncio
+from email.utils import parsedate_to_datetime
+from typing import Dict, Mapping, Optional
+
+class AdaptiveRateLimiter:
+    """
+    Token bucket so zdieľaným rozpočtom pre všetkých volajúcich.
+    AIMD: pri 429 sa rýchlosť zníži na polovicu (multiplicative decrease),
+    každý úspešný request ju zvýši o malý krok späť k stropu (additive increase).
+    Retry-After a x-ratelimit-* hlavičky pozastavia všetkých volajúcich naraz.
+    """
+
+    def __init__(
+        self,
+        rate_per_min: float,
+        burst: float = 1.0,
+        min_rate_per_min: Optional[float] = None,
+        throttle_cooldown: float = 15.0,
+        increase_frac: float = 0.05,
+    ) -> None:
+        self.max_rate = max(rate_per_min, 0.1) / 60.0
+        self.min_rate = (min_rate_per_min if min_rate_per_min else rate_per_min / 8.0) / 60.0
+        self.rate = self.max_rate
+        self.capacity = max(burst, 1.0)
+        self.tokens = self.capacity
+        self.throttle_cooldown = throttle_cooldown
+        self.increase = self.max_rate * increase_frac
+        self.blocked_until = 0.0
+        self.updated = time.monotonic()
+        self.throttled = 0
+        self.calls = 0
+        self._lock = asyncio.Lock()
+
+    def _refill(self, now: float) -> None:
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    async def acquire(self) -> None:
+        # zámok drží poradie (FIFO) – kto čaká prvý, ide prvý
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                if now < self.blocked_until:
+                    await asyncio.sleep(self.blocked_until - now)
+                    continue
+                self._refill(now)
+                if self.tokens >= 1.0:
+                    self.tokens -= 1.0
+                    self.calls += 1
+                    return
+                await asyncio.sleep((1.0 - self.tokens) / self.rate)
+
+    def _block_for(self, seconds: float) -> None:
+        if seconds > 0:
+            self.blocked_until = max(self.blocked_until, time.monotonic() + seconds)
+
+    def on_success(self, headers: Optional[Mapping[str, str]] = None) -> None:
+        self.rate = min(self.max_rate, self.rate + self.increase)
+        if headers is None:
+            return
+        remaining = _header_float(headers, "x-ratelimit-remaining")
+        if remaining is not None and remaining <= 0:
+            self.tokens = 0.0
+            reset = _reset_seconds(headers)
+            self._block_for(reset if reset is not None else self.throttle_cooldown)
+
+    def on_throttle(self, headers: Optional[Mapping[str, str]] = None) -> None:
+        self.throttled += 1
+        self.rate = max(self.min_rate, self.rate / 2.0)
+        self.tokens = 0.0
+        wait = None
+        if headers is not None:
+            # Retry-After: 0 je platná hodnota (hneď), nie chýbajúca hlavička
+            wait = retry_after_seconds(headers)
+            if wait is None:
+                wait = _reset_seconds(headers)
+        self._block_for(wait if wait is not None else self.throttle_cooldown)
+
+    def state(self) -> Dict[str, float]:
+        return {
+            "rate_per_min": round(self.rate * 60.0, 2),
+            "max_rate_per_min": round(self.max_rate * 60.0, 2),
+            "blocked_for_s": round(max(0.0, self.blocked_until - time.monotonic()), 2),
+            "calls": self.calls,
+            "throttled": self.throttled,
+        }
+
+def _header_float(headers: Mapping[str, str], name: str) -> Optional[float]:
+    v = headers.get(name)
+    if v is None:
+        return None
+    try:
+        return float(v)
+    except ValueError:
+        return None
+
+def _reset_seconds(headers: Mapping[str, str]) -> Optional[float]:
+    v = _header_float(headers, "x-ratelimit-reset")
+    if v is None:
+        return None
+    if v > 1e9:  # epoch sekundy
+        return max(0.0, v - time.time())
+    return max(0.0, v)
+
+def retry_after_seconds(headers: Mapping[str, str]) -> Optional[float]:
+    """Retry-After v sekundách alebo ako HTTP dátum."""
+    v = headers.get("retry-after")
+    if not v:
+        return None
+    try:
+        return max(0.0, float(v))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(v).timestamp() - time.time())
+    except Exception:
+        return None
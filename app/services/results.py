@@ -0,0 +1,132 @@
+"""
+Posledné výsledky behov (signal, dips, wildcards) uložené v DB (tabuľka results)
+s verziou, aby ich videli všetky workery/nody a prežili reštart.
+
+Čítanie ide cez in-process cache: najviac raz za RESULTS_CHECK_S sa pre daný
+názov prečíta iba `version`; payload sa načíta a dekóduje len keď sa verzia
+zmenila (publish z iného procesu). Pri štarte `preload()` natiahne všetko,
+takže /signal po deployi hneď vráti posledný dobrý výsledok. Keď DB nie je
+dostupná, vráti sa posledná známa hodnota z cache.
+"""
+import os
+import json
+import time
+import logging
+import datetime as dt
+from typing import Any, Dict, Optional, Tuple
+
+from sqlalchemy import select, update
+from sqlalchemy.exc import IntegrityError
+
+from ..db import AsyncSessionLocal, SessionLocal, ResultEntry
+
+def _envf(name: str, default: float) -> float:
+    try: return float(os.getenv(name, str(default)))
+    except: return float(default)
+
+RESULTS_CHECK_S = _envf("RESULTS_CHECK_S", 2.0)
+
+def _json_default(o):
+    # numpy skaláre z dips/scoringu
+    return o.item() if hasattr(o, "item") else str(o)
+
+def _version_q(name: str):
+    return select(ResultEntry.version).where(ResultEntry.name == name)
+
+def _payload_q(name: str):
+    return select(ResultEntry.version, ResultEntry.payload).where(ResultEntry.name == name)
+
+class ResultStore:
+    def __init__(self, check_s: float = RESULTS_CHECK_S) -> None:
+        self.check_s = check_s
+        self._cache: Dict[str, Tuple[int, Any]] = {}   # name -> (version, hodnota)
+        self._checked: Dict[str, float] = {}
+        self.loads = 0
+
+    def _stale(self, name: str) -> bool:
+        return time.monotonic() - self._checked.get(name, float("-inf")) >= self.check_s
+
+    def _version(self, name: str) -> Optional[int]:
+        rec = self._cache.get(name)
+        return rec[0] if rec else None
+
+    def _apply(self, name: str, version: int, payload: str) -> None:
+        self._cache[name] = (version, json.loads(payload))
+        self.loads += 1
+
+    def _value(self, name: str, default: Any) -> Any:
+        rec = self._cache.get(name)
+        return rec[1] if rec else default
+
+    async def get(self, name: str, default: Any = None) -> Any:
+        if self._stale(name):
+            try:
+                async with AsyncSessionLocal() as db:
+                    v = (await db.execute(_version_q(name))).scalar()
+                    if v is not None and v != self._version(name):
+                        self._apply(name, *(await db.execute(_payload_q(name))).one())
+                self._checked[name] = time.monotonic()
+            except Exception as e:
+                logging.warning("result store read %s failed, serving cached: %s", name, e)
+        return self._value(name, default)
+
+    def get_sync(self, name: str, default: Any = None) -> Any:
+        """To isté pre sync endpointy (threadpool)."""
+        if self._stale(name):
+            db = SessionLocal()
+            try:
+                v = db.execute(_version_q(name)).scalar()
+                if v is not None and v != self._version(name):
+                    self._apply(name, *db.execute(_payload_q(name)).one())
+                self._checked[name] = time.monotonic()
+            except Exception as e:
+                logging.warning("result store read %s failed, serving cached: %s", name, e)
+            finally:
+                db.close()
+        return self._value(name, default)
+
+    async def publish(self, name: str, value: Any) -> int:
+        """Uloží novú verziu; vráti jej číslo. Lokálna cache sa aktualizuje hneď."""
+        payload = json.dumps(value, default=_json_default)
+        now = dt.datetime.utcnow()
+        attempts = 2
+        for attempt in range(1, attempts + 1):
+            try:
+                async with AsyncSessionLocal() as db:
+                    v = (await db.execute(
+                        update(ResultEntry).where(ResultEntry.name == name)
+                        .values(version=ResultEntry.version + 1, payload=payload, updated_at=now)
+                        .returning(ResultEntry.version)
+                    )).scalar()
+                    if v is None:
+                        v = 1
+                        db.add(ResultEntry(name=name, version=v, payload=payload, updated_at=now))
+                    await db.commit()
+                break
+            except IntegrityError:
+                # prvý insert súbežne z iného procesu -> ďalší pokus už je update;
+                # po poslednom nič uložené nie je, cache ostáva bez zmeny (volajúci loguje)
+                if attempt == attempts:
+                    raise
+        self._cache[name] = (v, json.loads(payload))
+        self._checked[name] = time.monotonic()
+        return v
+
+    async def preload(self) -> None:
+        """Cold start: natiahne všetky uložené výsledky naraz."""
+        try:
+            async with AsyncSessionLocal() as db:
+                rows = (await db.execute(select(ResultEntry.name, ResultEntry.version, ResultEntry.payload))).all()
+        except Exception as e:
+            logging.warning("result store preload failed: %s", e)
+            return
+        now = time.monotonic()
+        for name, version, payload in rows:
+            self._apply(name, version, payload)
+            self._checked[name] = now
+        logging.info("result store preloaded: %s", ", ".join(f"{n}@v{v}" for n, v, _ in rows) or "empty")
+
+    def state(self) -> Dict:
+        return {"versions": {n: v for n, (v, _) in self._cache.items()}, "loads": self.loads, "check_s": self.check_s}
+
+store = ResultStore()
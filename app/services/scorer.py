@@ -1,35 +1,80 @@
-from typing import List, Dict
+from typing import Dict, List, Mapping, Optional, Sequence
 
-def _rank01(vals: List[float]) -> List[float]:
-    if not vals:
-        return []
-    lo, hi = min(vals), max(vals)
-    if hi - lo == 0:
-        return [0.5 for _ in vals]
-    return [(v - lo) / (hi - lo) for v in vals]
+import numpy as np
+
+# Stĺpce feature matice a váhy, ktoré k nim patria (w6 = penalizácia ATR)
+FEATURES = ("mom_3h", "mom_24h", "mom_7d", "trend_flag", "vol24", "atr_pct")
+WEIGHT_KEYS = ("w1", "w2", "w3", "w4", "w5", "w6")
+DEFAULT_WEIGHTS = {"w1": 0.20, "w2": 0.25, "w3": 0.15, "w4": 0.20, "w5": 0.10, "w6": 0.10}
+_SIGNS = np.array([1.0, 1.0, 1.0, 1.0, 1.0, -1.0])
+
+def feature_matrix(rows: Sequence[Mapping]) -> np.ndarray:
+    """rows -> (N, 6) surová matica v poradí FEATURES."""
+    X = np.empty((len(rows), len(FEATURES)), dtype=np.float64)
+    for j, k in enumerate(FEATURES):
+        if k == "trend_flag":
+            X[:, j] = [1.0 if r.get(k, 0) == 1 else 0.0 for r in rows]
+        else:
+            X[:, j] = [r.get(k, 0.0) for r in rows]
+    return X
+
+def normalize(X: np.ndarray) -> np.ndarray:
+    """Min-max na [0, 1] po stĺpcoch (konštantný stĺpec -> 0.5); trend_flag ostáva 0/1."""
+    if X.shape[0] == 0:
+        return X.copy()
+    lo = X.min(axis=0); span = X.max(axis=0) - lo
+    with np.errstate(divide="ignore", invalid="ignore"):
+        A = np.where(span > 0, (X - lo) / span, 0.5)
+    t = FEATURES.index("trend_flag")
+    A[:, t] = X[:, t]
+    return A
+
+def weight_matrix(weights: Sequence[Mapping[str, float]]) -> np.ndarray:
+    """Zoznam váh {w1..w6} -> (K, 6) so znamienkami (w6 odpočítava ATR)."""
+    W = np.array([[w.get(k, DEFAULT_WEIGHTS[k]) for k in WEIGHT_KEYS] for w in weights], dtype=np.float64)
+    return W.reshape(-1, len(WEIGHT_KEYS)) * _SIGNS
+
+def score_batch(A: np.ndarray, W: np.ndarray) -> np.ndarray:
+    """
+    A: normalizovaná (N, 6) matica, W: (K, 6) z weight_matrix.
+    Vráti (N, K) skóre pre všetky konfigurácie váh jedným násobením matíc.
+    """
+    return A @ W.T
+
+def top_k(scores: np.ndarray, k: int) -> np.ndarray:
+    """
+    Indexy k najlepších podľa skóre (zostupne) cez argpartition.
+    Pre 2-D (N, K) vráti (K, k) – top-k pre každú konfiguráciu.
+    """
+    s = np.asarray(scores)
+    n = s.shape[0]
+    k = max(0, min(k, n))
+    if k == 0:
+        return np.empty((0,) if s.ndim == 1 else (s.shape[1], 0), dtype=np.intp)
+    if s.ndim == 1:
+        idx = np.argpartition(-s, k - 1)[:k] if k < n else np.arange(n)
+        return idx[np.argsort(-s[idx], kind="stable")]
+    part = np.argpartition(-s, k - 1, axis=0)[:k] if k < n else np.tile(np.arange(n)[:, None], (1, s.shape[1]))
+    vals = np.take_along_axis(s, part, axis=0)
+    order = np.argsort(-vals, axis=0, kind="stable")
+    return np.take_along_axis(part, order, axis=0).T
 
-def compute_scores(rows: List[Dict], w: Dict[str, float]) -> List[Dict]:
+def compute_scores(rows: List[Dict], w: Dict[str, float], k: Optional[int] = None) -> List[Dict]:
     """
     rows očakáva kľúče:
       price, vol24, mom_3h, mom_24h, mom_7d, atr_pct, trend_flag, (voliteľne rsi, ema_above)
+    Zapíše "score" do každého riadku a vráti ich zoradené zostupne
+    (s k iba top-k cez čiastočný výber namiesto plného triedenia).
     """
     if not rows:
         return []
-    a_m3 = _rank01([r.get("mom_3h", 0.0) for r in rows])
-    a_m24 = _rank01([r.get("mom_24h", 0.0) for r in rows])
-    a_m7 = _rank01([r.get("mom_7d", 0.0) for r in rows])
-    a_vol = _rank01([r.get("vol24", 0.0) for r in rows])
-    a_atr = _rank01([r.get("atr_pct", 0.0) for r in rows])
-
-    for i, r in enumerate(rows):
-        score = (
-            w.get("w1",0.20)*a_m3[i] +
-            w.get("w2",0.25)*a_m24[i] +
-            w.get("w3",0.15)*a_m7[i] +
-            w.get("w4",0.20)*(1.0 if r.get("trend_flag",0)==1 else 0.0) +
-            w.get("w5",0.10)*a_vol[i] -
-            w.get("w6",0.10)*a_atr[i]
-        )
-        r["score"] = float(score)
+    A = normalize(feature_matrix(rows))
+    c = [w.get(key, DEFAULT_WEIGHTS[key]) for key in WEIGHT_KEYS]
+    # rovnaké poradie operácií ako pôvodný súčet po riadkoch
+    scores = c[0]*A[:, 0] + c[1]*A[:, 1] + c[2]*A[:, 2] + c[3]*A[:, 3] + c[4]*A[:, 4] - c[5]*A[:, 5]
+    for r, s in zip(rows, scores.tolist()):
+        r["score"] = float(s)
+    if k is not None:
+        return [rows[i] for i in top_k(scores, k)]
     rows.sort(key=lambda x: x["score"], reverse=True)
     return rows
@@ -0,0 +1,144 @@
+import os
+import time
+import asyncio
+import logging
+from dataclasses import dataclass, field, replace
+from types import MappingProxyType
+from typing import AsyncIterator, Dict, Iterable, List, Mapping, Optional, Tuple
+
+from .coingecko import get_markets_top200_cached, fetch_many_hourly, iter_many_hourly, refresher_running
+from .regime import regime_flag
+
+# Jeden zdieľaný balík markets + grafy + režim pre signály, dips aj wildcards.
+# Nová generácia (markets + režim) vzniká pri refresh; grafy sa k nej iba dopĺňajú.
+MAX_AGE_MIN: float = float(os.getenv("SNAPSHOT_MAX_AGE_MIN", "30"))
+MARKETS_TTL_COLD_MIN = 10  # bez refreshera (follower): max vek markets ako pred snapshotom
+
+@dataclass(frozen=True)
+class MarketSnapshot:
+    version: int
+    generation: int
+    created_at: float
+    markets: Tuple[Dict, ...]
+    regime: int
+    days: int = 10
+    charts: Mapping[str, Dict] = field(default_factory=lambda: MappingProxyType({}))
+
+    @property
+    def regime_text(self) -> str:
+        return "risk-on" if self.regime == 1 else "risk-off"
+
+    def age_s(self) -> float:
+        return time.time() - self.created_at
+
+    def missing(self, ids: Iterable[str]) -> List[str]:
+        return [cid for cid in ids if cid not in self.charts]
+
+    def info(self) -> Dict:
+        return {
+            "version": self.version, "generation": self.generation,
+            "age_s": round(self.age_s(), 1), "regime": self.regime_text,
+            "markets": len(self.markets), "charts": len(self.charts),
+        }
+
+_current: Optional[MarketSnapshot] = None
+_version = 0
+_lock = asyncio.Lock()
+
+def current() -> Optional[MarketSnapshot]:
+    """Aktuálny snapshot bez čakania (môže byť None alebo starý)."""
+    return _current
+
+def _publish(snap: MarketSnapshot) -> MarketSnapshot:
+    global _current
+    _current = snap
+    return snap
+
+async def _build(fresh_markets: bool, days: int) -> MarketSnapshot:
+    global _version
+    # dlhé TTL + stale iba keď cache drží teplú refresher (beží len u lídra);
+    # inak pôvodných 10 min a na obnovu sa čaká
+    warm = refresher_running()
+    ttl = 1 if fresh_markets else (1440 if warm else MARKETS_TTL_COLD_MIN)
+    # markets a režim (400d BTC) na sebe nezávisia -> naraz
+    markets, reg = await asyncio.gather(
+        get_markets_top200_cached("usd", ttl_minutes=ttl, stale_ok=warm and not fresh_markets),
+        regime_flag(),
+        return_exceptions=True,
+    )
+    if isinstance(markets, BaseException):
+        raise markets
+    if isinstance(reg, BaseException):
+        logging.warning("regime failed, keeping previous: %s", reg)
+        reg = _current.regime if _current else 1
+    _version += 1
+    snap = MarketSnapshot(
+        version=_version, generation=_version, created_at=time.time(),
+        markets=tuple(markets), regime=reg, days=days,
+    )
+    logging.info("snapshot v%d: markets=%d regime=%s", snap.version, len(markets), snap.regime_text)
+    return _publish(snap)
+
+def _is_fresh(snap: Optional[MarketSnapshot], max_age_min: float, days: int) -> bool:
+    return snap is not None and snap.days == days and bool(snap.markets) and snap.age_s() < max_age_min * 60
+
+async def refresh(fresh_markets: bool = False, days: int = 10) -> MarketSnapshot:
+    """Postaví novú generáciu: markets + režim, bez grafov."""
+    async with _lock:
+        return await _build(fresh_markets, days)
+
+async def get(max_age_min: Optional[float] = None, days: int = 10) -> MarketSnapshot:
+    """Vráti snapshot mladší ako max_age_min, inak postaví nový."""
+    max_age = MAX_AGE_MIN if max_age_min is None else max_age_min
+    if not refresher_running():
+        max_age = min(max_age, MARKETS_TTL_COLD_MIN)
+    if _is_fresh(_current, max_age, days):
+        return _current  # type: ignore[return-value]
+    async with _lock:
+        if _is_fresh(_current, max_age, days):
+            return _current  # type: ignore[return-value]
+        return await _build(False, days)
+
+def _merge_charts(snap: MarketSnapshot, fetched: Dict[str, Dict]) -> MarketSnapshot:
+    global _version
+    # medzitým mohol niekto doplniť grafy do tej istej generácie – zlúč do najnovšej
+    base = _current if _current is not None and _current.generation == snap.generation else snap
+    charts = dict(base.charts)
+    # prázdne (zlyhané) grafy neukladáme, nech ich ďalší beh skúsi znova
+    charts.update({k: v for k, v in fetched.items() if v.get("prices")})
+    _version += 1
+    new = replace(base, version=_version, charts=MappingProxyType(charts))
+    if base is _current:
+        _publish(new)
+    return new
+
+async def with_charts(ids: List[str], max_age_min: Optional[float] = None, days: int = 10) -> MarketSnapshot:
+    """Snapshot s grafmi pre `ids`; dotiahne iba tie, ktoré v ňom chýbajú."""
+    snap = await get(max_age_min, days=days)
+    missing = snap.missing(ids)
+    if not missing:
+        return snap
+    return _merge_charts(snap, await fetch_many_hourly(missing, days=days))
+
+async def stream_charts(
+    ids: List[str], max_age_min: Optional[float] = None, days: int = 10,
+) -> AsyncIterator[Tuple[str, Dict]]:
+    """
+    (id, graf) pre `ids`: najprv tie, ktoré už snapshot má, potom chýbajúce
+    v poradí, ako dobehnú. Stiahnuté grafy sa na konci zlúčia do snapshotu.
+    """
+    snap = await get(max_age_min, days=days)
+    missing = set(snap.missing(ids))
+    for cid in ids:
+        if cid not in missing:
+            yield cid, snap.charts[cid]
+    if not missing:
+        return
+    fetched: Dict[str, Dict] = {}
+    try:
+        async for cid, data in iter_many_hourly([cid for cid in ids if cid in missing], days=days):
+            fetched[cid] = data
+            yield cid, data
+    finally:
+        if fetched:
+            _merge_charts(snap, fetched)
@@ -0,0 +1,133 @@
+"""
+Cache LLM verdiktov pre wildcards.
+
+Kľúč = symbol + režim + model + kvantované metriky (mom_3h/24h/7d, ATR%, log vol24,
+news_hits), takže skoro rovnaký coin v ďalšom behe model znova nevolá. TTL + LRU
+v pamäti, voliteľne zápis do DB (ai_verdicts, AI_CACHE_PERSIST=1), odkiaľ sa
+cache po reštarte načíta. Ukladajú sa iba skutočné LLM verdikty, nie free fallback.
+"""
+import os
+import json
+import math
+import time
+import asyncio
+import hashlib
+import logging
+import datetime as dt
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple
+
+from sqlalchemy import delete, select
+
+from ..db import AsyncSessionLocal, AiVerdict
+
+def _envf(name: str, default: float) -> float:
+    try: return float(os.getenv(name, str(default)))
+    except: return float(default)
+
+TTL_MIN = _envf("AI_CACHE_TTL_MIN", 360.0)
+MAX_SIZE = int(_envf("AI_CACHE_SIZE", 2048))
+PERSIST = os.getenv("AI_CACHE_PERSIST", "0") == "1"
+
+# šírka bucketu pre každú metriku
+STEPS: Dict[str, float] = {"mom_3h": 0.01, "mom_24h": 0.02, "mom_7d": 0.05, "atr_pct": 0.01}
+VOL_STEP = 0.25  # log10(vol24)
+
+def _bucket(v: float, step: float) -> int:
+    return int(math.floor(float(v or 0.0) / step))
+
+def key_of(item: Dict, regime: str, model: str) -> str:
+    hits = int(item.get("news_hits", 0) or 0)
+    vol = float(item.get("vol24", 0.0) or 0.0)
+    parts = [
+        str(item.get("symbol", "")).upper(), regime, model,
+        *(str(_bucket(item.get(k, 0.0), s)) for k, s in STEPS.items()),
+        str(_bucket(math.log10(vol), VOL_STEP) if vol > 0 else -1),
+        str(hits.bit_length()),  # 0, 1, 2-3, 4-7, ...
+    ]
+    return hashlib.sha1("|".join(parts).encode()).hexdigest()
+
+class VerdictCache:
+    def __init__(self, ttl_min: float = TTL_MIN, max_size: int = MAX_SIZE, persist: bool = PERSIST) -> None:
+        self.ttl_s = ttl_min * 60.0
+        self.max_size = max_size
+        self.persist = persist
+        self._data: "OrderedDict[str, Tuple[float, Dict]]" = OrderedDict()  # key -> (created_ts, verdikt)
+        self._loaded = not persist
+        self._lock = asyncio.Lock()
+        self.hits = self.misses = self.expired = self.evicted = 0
+
+    def get(self, key: str, now: Optional[float] = None) -> Optional[Dict]:
+        now = time.time() if now is None else now
+        rec = self._data.get(key)
+        if rec is not None and now - rec[0] > self.ttl_s:
+            del self._data[key]
+            self.expired += 1
+            rec = None
+        if rec is None:
+            self.misses += 1
+            return None
+        self._data.move_to_end(key)
+        self.hits += 1
+        return dict(rec[1])
+
+    def put(self, key: str, verdict: Dict, now: Optional[float] = None) -> None:
+        self._data[key] = (time.time() if now is None else now, dict(verdict))
+        self._data.move_to_end(key)
+        while len(self._data) > self.max_size:
+            self._data.popitem(last=False)
+            self.evicted += 1
+
+    def stats(self) -> Dict:
+        total = self.hits + self.misses
+        return {
+            "size": len(self._data), "max_size": self.max_size, "ttl_min": self.ttl_s / 60.0,
+            "persist": self.persist, "hits": self.hits, "misses": self.misses,
+            "hit_rate": self.hits / total if total else None,
+            "expired": self.expired, "evicted": self.evicted,
+        }
+
+    # ---------- perzistencia ----------
+    async def _load(self) -> List[Tuple[str, float, Dict]]:
+        cutoff = dt.datetime.utcnow() - dt.timedelta(seconds=self.ttl_s)
+        async with AsyncSessionLocal() as db:
+            rows = (await db.execute(
+                select(AiVerdict).where(AiVerdict.created_at >= cutoff)
+                .order_by(AiVerdict.created_at.desc()).limit(self.max_size)
+            )).scalars().all()
+        epoch = dt.datetime(1970, 1, 1)
+        return [(r.key, (r.created_at - epoch).total_seconds(), json.loads(r.verdict)) for r in reversed(rows)]
+
+    async def _save(self, recs: List[Tuple[str, float, Dict]]) -> None:
+        async with AsyncSessionLocal() as db:
+            for key, ts, v in recs:
+                await db.merge(AiVerdict(key=key, verdict=json.dumps(v), created_at=dt.datetime.utcfromtimestamp(ts)))
+            cutoff = dt.datetime.utcnow() - dt.timedelta(seconds=self.ttl_s)
+            await db.execute(delete(AiVerdict).where(AiVerdict.created_at < cutoff))
+            await db.commit()
+
+    async def ensure_loaded(self) -> None:
+        if self._loaded:
+            return
+        async with self._lock:
+            if self._loaded:
+                return
+            try:
+                for key, ts, v in await self._load():
+                    self.put(key, v, now=ts)
+            except Exception as e:
+                logging.warning("ai cache load failed, using memory only: %s", e)
+            self._loaded = True
+
+    async def store(self, recs: List[Tuple[str, Dict]]) -> None:
+        """Vloží nové verdikty do pamäte a (ak je zapnutá perzistencia) do DB."""
+        now = time.time()
+        for key, v in recs:
+            self.put(key, v, now=now)
+        if self.persist and recs:
+            try:
+                await self._save([(k, now, v) for k, v in recs])
+            except Exception as e:
+                logging.warning("ai cache save failed: %s", e)
+
+cache = VerdictCache()
@@ -0,0 +1,138 @@
+"""
+Latencia ai.evaluate_wildcards proti lokálnemu OpenAI-kompatibilnému stubu:
+  sequential – synchrónny klient, jedno volanie na kandidáta za sebou (pôvodné správanie)
+  concurrent – AsyncOpenAI, max AI_CONCURRENCY volaní naraz, deadline na volanie
+  batch      – všetci kandidáti v jednom requeste
+  cached     – concurrent s verdict cache; druhý beh s mierne posunutými metrikami
+
+Spustenie z koreňa repa:
+    python -m bench.ai_latency --items 12 --delay-ms 400 --concurrency 4
+
+Stub odpovedá na POST /v1/chat/completions po `--delay-ms` (batch: delay + 10 % na
+položku). --slow N spomalí každé N-té volanie nad AI_TIMEOUT, aby bolo vidno
+fallback na free pravidlá.
+"""
+import os
+import re
+import json
+import time
+import asyncio
+import argparse
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List
+
+_SYM = re.compile(r"Metrics for (\S+) \(")
+
+def start_llm_stub(delay_ms: float, slow_every: int = 0, slow_ms: float = 0.0) -> ThreadingHTTPServer:
+    calls = {"n": 0}
+    lock = threading.Lock()
+
+    class _Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+        disable_nagle_algorithm = True
+
+        def do_POST(self):
+            body = json.loads(self.rfile.read(int(self.headers.get("Content-Length") or 0)) or b"{}")
+            prompt = body["messages"][-1]["content"]
+            syms = _SYM.findall(prompt)
+            with lock:
+                calls["n"] += 1
+                n = calls["n"]
+            delay = delay_ms * (1.0 + 0.1 * (len(syms) - 1))
+            if slow_every and n % slow_every == 0:
+                delay = slow_ms
+            time.sleep(delay / 1000.0)
+            verdicts = [{"symbol": s, "approve": i % 2 == 0, "horizon_days": 2.0, "rationale": "stub"}
+                        for i, s in enumerate(syms)]
+            content = json.dumps({"verdicts": verdicts} if "verdicts" in prompt else verdicts[0])
+            out = json.dumps({
+                "id": f"stub-{n}", "object": "chat.completion", "created": int(time.time()), "model": body.get("model"),
+                "choices": [{"index": 0, "finish_reason": "stop",
+                             "message": {"role": "assistant", "content": content}}],
+                "usage": {"prompt_tokens": 0, "completion_tokens": 0, "total_tokens": 0},
+            }).encode()
+            try:
+                self.send_response(200)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(out)))
+                self.end_headers()
+                self.wfile.write(out)
+            except (BrokenPipeError, ConnectionResetError):
+                pass  # klient to už vzdal (deadline)
+
+        def log_message(self, *args):
+            pass
+
+    class _Server(ThreadingHTTPServer):
+        request_queue_size = 256
+
+    srv = _Server(("127.0.0.1", 0), _Handler)
+    threading.Thread(target=srv.serve_forever, daemon=True).start()
+    return srv
+
+def _items(n: int) -> List[Dict]:
+    return [{"id": f"coin-{i}", "symbol": f"C{i}", "name": f"Coin {i}", "price": 1.0 + i, "vol24": 5e6,
+             "mom_3h": 0.01, "mom_24h": 0.03, "mom_7d": 0.1, "atr_pct": 0.05, "news_hits": 2, "news_score": 1.5}
+            for i in range(n)]
+
+def _sequential(items: List[Dict], regime: str) -> List[Dict]:
+    """Pôvodný tok: synchrónny klient, jedno volanie na kandidáta."""
+    from openai import OpenAI
+    from app.services import ai
+    client = OpenAI(api_key=ai.OPENAI_KEY, base_url=os.environ["OPENAI_BASE_URL"])
+    out = []
+    for it in items:
+        resp = client.chat.completions.create(
+            model=ai.OPENAI_MODEL,
+            messages=[{"role": "user", "content": f"{ai._SYSTEM}\nMarket regime: {regime}.\n{ai._metrics_line(it)}"}],
+            temperature=0.2, max_tokens=120, response_format={"type": "json_object"},
+        )
+        out.append(ai._verdict(json.loads(resp.choices[0].message.content)))
+    return out
+
+def main() -> None:
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--items", type=int, default=12)
+    ap.add_argument("--delay-ms", type=float, default=400.0)
+    ap.add_argument("--concurrency", type=int, default=4)
+    ap.add_argument("--timeout", type=float, default=2.0, help="AI_TIMEOUT v s")
+    ap.add_argument("--slow", type=int, default=0, help="každé N-té volanie trvá 2x timeout")
+    args = ap.parse_args()
+
+    srv = start_llm_stub(args.delay_ms, args.slow, args.timeout * 2000)
+    os.environ["OPENAI_API_KEY"] = "stub"
+    os.environ["OPENAI_BASE_URL"] = f"http://127.0.0.1:{srv.server_address[1]}/v1"
+    from app.services import ai
+    ai.OPENAI_KEY = "stub"
+    ai.AI_CONCURRENCY = args.concurrency
+    ai.AI_TIMEOUT = args.timeout
+    items = _items(args.items)
+    res: Dict[str, Dict] = {}
+    os.environ["AI_CACHE"] = "0"
+    try:
+        t = time.perf_counter()
+        _sequential(items, "risk-on")
+        res["sequential"] = {"wall_ms": (time.perf_counter() - t) * 1000}
+        for mode in ("concurrent", "batch"):
+            ai.AI_MODE = mode
+            t = time.perf_counter()
+            out = asyncio.run(ai.evaluate_wildcards(items, "risk-on"))
+            res[mode] = {
+                "wall_ms": (time.perf_counter() - t) * 1000,
+                "llm_verdicts": sum(1 for x in out if x["ai_rationale"] == "stub"),
+                "free_fallbacks": sum(1 for x in out if x["ai_rationale"] != "stub"),
+            }
+        os.environ["AI_CACHE"] = "1"
+        ai.AI_MODE = "concurrent"
+        asyncio.run(ai.evaluate_wildcards(items, "risk-on"))
+        nudged = [{**it, "mom_3h": it["mom_3h"] + 0.001, "vol24": it["vol24"] * 1.05} for it in items]
+        t = time.perf_counter()
+        asyncio.run(ai.evaluate_wildcards(nudged, "risk-on"))
+        res["cached"] = {"wall_ms": (time.perf_counter() - t) * 1000, **ai.verdict_cache.cache.stats()}
+    finally:
+        srv.shutdown()
+    print(json.dumps(res, indent=2))
+
+if __name__ == "__main__":
+    main()
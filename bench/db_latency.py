@@ -0,0 +1,164 @@
+"""
+Latencia API počas DB práce scanu (SQLite stand-in za Postgres):
+  idle  – iba requesty, bez scanu
+  sync  – scan volá sync SessionLocal priamo v async jobe (pôvodné správanie)
+  async – scan ide cez AsyncSessionLocal (aiosqlite / psycopg async)
+
+Spustenie z koreňa repa:
+    python -m bench.db_latency --picks 300000 --trades 300 --rounds 6
+
+"Scan" = DB časť _select_and_score + watch jobu: cooldown (studený ring buffer ->
+window dotaz nad signal_picks), zápis signálu a načítanie/uloženie otvorených
+obchodov. Ceny pre watch job idú zo syntetickej funkcie, sieť sa nevolá. Súbežne
+sa každých --every-ms volá /ai-cache cez ASGI transport a meria sa p50/p99/max
+a najdlhšie zablokovanie event loopu.
+"""
+import os
+import json
+import time
+import random
+import asyncio
+import logging
+import argparse
+import statistics
+from typing import Dict, List
+
+from bench.run import make_universe  # nastaví DATABASE_URL pre app.db
+import httpx
+from sqlalchemy import delete, insert
+
+from app import scheduler, main as app_main
+from app.db import SessionLocal, async_engine, init_db, Trade, Signal, SignalPick
+from app.services.http import close_clients
+
+def _seed(ids: List[str], picks: int, trades: int, seed: int = 3) -> None:
+    rnd = random.Random(seed)
+    db = SessionLocal()
+    try:
+        for m in (SignalPick, Signal, Trade):
+            db.execute(delete(m))
+        n_sig = max(1, picks // 10)
+        db.execute(insert(Signal), [{"id": i + 1} for i in range(n_sig)])
+        db.execute(insert(SignalPick), [
+            {"signal_id": i // 10 + 1, "coin_id": rnd.choice(ids), "symbol": "X", "score": rnd.random()}
+            for i in range(picks)
+        ])
+        db.execute(insert(Trade), [
+            {"coin_id": ids[i % len(ids)], "symbol": "X", "name": "x", "invested_eur": 10.0,
+             "buy_price_usd": 1.0, "high_water_usd": 1.0}
+            for i in range(trades)
+        ])
+        db.commit()
+    finally:
+        db.close()
+
+# ---------- pôvodné (sync) verzie DB častí ----------
+async def _legacy_cooldown(rows: List[Dict], n: int) -> None:
+    db = SessionLocal()
+    try:
+        db.execute(scheduler._recent_stmt(n, [r["id"] for r in rows])).all()
+    finally:
+        db.close()
+
+async def _legacy_persist(picks: List[Dict]) -> None:
+    db = SessionLocal()
+    try:
+        s = Signal(); db.add(s); db.flush()
+        db.add_all([SignalPick(signal_id=s.id, coin_id=p["id"], symbol=p["symbol"], score=p["score"]) for p in picks])
+        db.commit()
+    finally:
+        db.close()
+
+async def _legacy_watch(prices: Dict[str, float]) -> None:
+    db = SessionLocal()
+    try:
+        rows = db.query(Trade).filter(Trade.sold_eur.is_(None)).all()
+        await asyncio.sleep(0)  # get_simple_prices
+        for t in rows:
+            t.last_price_usd = prices.get(t.coin_id, 1.0)
+        db.commit()
+    finally:
+        db.close()
+
+async def _scan(rows: List[Dict], prices: Dict[str, float], legacy: bool, n: int) -> None:
+    picks = [{**r, "score": 0.5} for r in rows[:10]]
+    if legacy:
+        await _legacy_cooldown(rows, n)
+        await _legacy_persist(picks)
+        await _legacy_watch(prices)
+    else:
+        scheduler._recent_warm = False  # vynúti DB dotaz ako pri studenom ringu
+        await scheduler._cooldown_filter(rows)
+        await scheduler._persist_signal(picks)
+        await scheduler.job_watch_open_positions()
+
+async def _run(mode: str, rows: List[Dict], prices: Dict[str, float], rounds: int, every_ms: float, n: int) -> Dict:
+    lat: List[float] = []
+    stall = 0.0
+    done = False
+
+    async def _ticker():
+        nonlocal stall
+        while not done:
+            t = time.perf_counter()
+            await asyncio.sleep(0.001)
+            stall = max(stall, time.perf_counter() - t - 0.001)
+
+    async def _client(c: httpx.AsyncClient):
+        while not done:
+            t = time.perf_counter()
+            r = await c.get("/ai-cache")
+            lat.append(time.perf_counter() - t)
+            assert r.status_code == 200
+            await asyncio.sleep(every_ms / 1000.0)
+
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app_main.app), base_url="http://bench") as c:
+        tasks = [asyncio.create_task(_ticker()), asyncio.create_task(_client(c))]
+        await asyncio.sleep(0)
+        t0 = time.perf_counter()
+        if mode == "idle":
+            await asyncio.sleep(0.5 * rounds)
+        else:
+            for _ in range(rounds):
+                await _scan(rows, prices, mode == "sync", n)
+        wall = time.perf_counter() - t0
+        done = True
+        await asyncio.gather(*tasks)
+    await close_clients()
+    await async_engine.dispose()
+    lat.sort()
+    return {
+        "requests": len(lat), "scan_wall_ms": wall * 1000,
+        "p50_ms": statistics.median(lat) * 1000, "p99_ms": lat[int(0.99 * (len(lat) - 1))] * 1000,
+        "max_ms": lat[-1] * 1000, "loop_stall_max_ms": stall * 1000,
+    }
+
+def main() -> None:
+    logging.getLogger("httpx").setLevel(logging.WARNING)
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--coins", type=int, default=400)
+    ap.add_argument("--picks", type=int, default=300_000, help="riadkov v signal_picks")
+    ap.add_argument("--trades", type=int, default=300, help="otvorených obchodov")
+    ap.add_argument("--rounds", type=int, default=6)
+    ap.add_argument("--every-ms", type=float, default=5.0)
+    ap.add_argument("--cooldown", type=int, default=3, help="COOLDOWN_BEHS")
+    args = ap.parse_args()
+
+    os.environ["COOLDOWN_BEHS"] = str(args.cooldown)
+    init_db()
+    markets, _ = make_universe(args.coins)
+    ids = [m["id"] for m in markets]
+    _seed(ids, args.picks, args.trades)
+    rows = [{"id": m["id"], "symbol": m["symbol"], "score": 0.5} for m in markets[:120]]
+    prices = {cid: 1.0 + (i % 7) / 100 for i, cid in enumerate(ids)}
+
+    async def _prices(open_ids, vs="usd"):
+        return {cid: prices[cid] for cid in open_ids}
+    scheduler.get_simple_prices = _prices
+
+    res = {mode: asyncio.run(_run(mode, rows, prices, args.rounds, args.every_ms, args.cooldown))
+           for mode in ("idle", "sync", "async")}
+    print(json.dumps(res, indent=2))
+
+if __name__ == "__main__":
+    main()
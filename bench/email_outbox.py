@@ -0,0 +1,164 @@
+"""
+Notifikácie z watch jobu proti lokálnemu SMTP stubu (aiosmtpd-style stand-in):
+  before – send_email priamo v jobe: nové spojenie + login na každú správu, blokuje loop
+  outbox – job zapíše správy do email_outbox, worker ich pošle cez jedno spojenie
+  digest – outbox + EMAIL_DIGEST=1: všetky upozornenia z behu v jednom e-maile
+
+Spustenie z koreňa repa:
+    python -m bench.email_outbox --trades 10 --connect-ms 150 --msg-ms 20
+
+Stub vie EHLO/AUTH/MAIL/RCPT/DATA/NOOP/RSET/QUIT (bez TLS, EMAIL_STARTTLS=0);
+--connect-ms simuluje TCP + TLS + login RTT pri novom spojení, --msg-ms odozvu na
+DATA. Každý obchod je nastavený tak, aby spustil všetky 4 upozornenia.
+"""
+import os
+import json
+import time
+import types
+import asyncio
+import logging
+import argparse
+import threading
+import socketserver
+from datetime import datetime, timedelta
+from typing import Dict, List
+
+from bench.run import make_universe  # nastaví DATABASE_URL pre app.db
+from sqlalchemy import delete, insert
+
+from app import scheduler
+from app.db import SessionLocal, async_engine, init_db, Trade, EmailOutbox
+from app.services import outbox, notifier
+
+def start_smtp_stub(connect_ms: float = 0.0, msg_ms: float = 0.0):
+    stats = {"connections": 0, "messages": 0, "subjects": []}
+    lock = threading.Lock()
+
+    class _Handler(socketserver.StreamRequestHandler):
+        def _say(self, line: str) -> None:
+            self.wfile.write((line + "\r\n").encode()); self.wfile.flush()
+
+        def handle(self):
+            with lock:
+                stats["connections"] += 1
+            time.sleep(connect_ms / 1000.0)
+            self._say("220 stub ESMTP")
+            while True:
+                raw = self.rfile.readline()
+                if not raw:
+                    return
+                cmd = raw.decode(errors="replace").strip()
+                verb = cmd.split(" ", 1)[0].upper()
+                if verb in ("EHLO", "HELO"):
+                    self._say("250-stub"); self._say("250 AUTH PLAIN LOGIN")
+                elif verb == "AUTH":
+                    self._say("235 ok")
+                elif verb == "DATA":
+                    self._say("354 go")
+                    subject = ""
+                    while True:
+                        line = self.rfile.readline().decode(errors="replace")
+                        if line in (".\r\n", ".\n", ""):
+                            break
+                        if line.startswith("Subject:"):
+                            subject = line[8:].strip()
+                    time.sleep(msg_ms / 1000.0)
+                    with lock:
+                        stats["messages"] += 1; stats["subjects"].append(subject)
+                    self._say("250 queued")
+                elif verb == "QUIT":
+                    self._say("221 bye"); return
+                else:
+                    self._say("250 ok")
+
+    class _Server(socketserver.ThreadingTCPServer):
+        daemon_threads = True
+        allow_reuse_address = True
+        request_queue_size = 64
+
+    srv = _Server(("127.0.0.1", 0), _Handler)
+    threading.Thread(target=srv.serve_forever, daemon=True).start()
+    return srv, stats
+
+def _seed(ids: List[str], trades: int) -> None:
+    old = datetime.utcnow() - timedelta(days=10)
+    db = SessionLocal()
+    try:
+        db.execute(delete(Trade)); db.execute(delete(EmailOutbox))
+        # buy 100, max 200, cena 130 -> drawdown -35 % (heads-up + action), zisk +30 %, 10 dní -> stale
+        db.execute(insert(Trade), [
+            {"coin_id": ids[i], "symbol": f"C{i}", "name": ids[i], "invested_eur": 10.0, "invested_at": old,
+             "buy_price_usd": 100.0, "high_water_usd": 200.0}
+            for i in range(trades)
+        ])
+        db.commit()
+    finally:
+        db.close()
+
+async def _run(mode: str, ids: List[str], trades: int, stats: Dict) -> Dict:
+    _seed(ids, trades)
+    stats["connections"] = stats["messages"] = 0
+    os.environ["EMAIL_DIGEST"] = "1" if mode == "digest" else "0"
+    real = scheduler.outbox
+    if mode == "before":
+        # pôvodné správanie: blokujúci send_email priamo v async jobe
+        scheduler.outbox = types.SimpleNamespace(add=lambda db, s, h: notifier.send_email(s, h), wake=lambda: None)
+    else:
+        outbox.start_worker()
+
+    stall = 0.0
+    done = False
+
+    async def _ticker():
+        nonlocal stall
+        while not done:
+            t = time.perf_counter()
+            await asyncio.sleep(0.001)
+            stall = max(stall, time.perf_counter() - t - 0.001)
+
+    tick = asyncio.create_task(_ticker())
+    await asyncio.sleep(0)
+    t0 = time.perf_counter()
+    try:
+        await scheduler.job_watch_open_positions()
+        job = time.perf_counter() - t0
+        want = 1 if mode == "digest" else 4 * trades
+        while stats["messages"] < want and time.perf_counter() - t0 < 60:
+            await asyncio.sleep(0.005)
+        delivered = time.perf_counter() - t0
+    finally:
+        done = True
+        await tick
+        scheduler.outbox = real
+        await outbox.stop_worker()
+        await async_engine.dispose()
+    return {"job_ms": job * 1000, "delivered_ms": delivered * 1000, "messages": stats["messages"],
+            "smtp_connections": stats["connections"], "loop_stall_max_ms": stall * 1000}
+
+def main() -> None:
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--trades", type=int, default=10)
+    ap.add_argument("--connect-ms", type=float, default=150.0)
+    ap.add_argument("--msg-ms", type=float, default=20.0)
+    args = ap.parse_args()
+    logging.getLogger().setLevel(logging.WARNING)
+
+    srv, stats = start_smtp_stub(args.connect_ms, args.msg_ms)
+    os.environ.update({"EMAIL_HOST": "127.0.0.1", "EMAIL_PORT": str(srv.server_address[1]), "EMAIL_USER": "bench@local",
+                       "EMAIL_PASS": "x", "EMAIL_TO": "me@local", "EMAIL_STARTTLS": "0"})
+    init_db()
+    markets, _ = make_universe(args.trades)
+    ids = [m["id"] for m in markets]
+
+    async def _prices(open_ids, vs="usd"):
+        return {cid: 130.0 for cid in open_ids}
+    scheduler.get_simple_prices = _prices
+
+    try:
+        res = {mode: asyncio.run(_run(mode, ids, args.trades, stats)) for mode in ("before", "outbox", "digest")}
+    finally:
+        srv.shutdown()
+    print(json.dumps(res, indent=2))
+
+if __name__ == "__main__":
+    main()
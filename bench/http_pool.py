@@ -0,0 +1,92 @@
+"""
+Latencia na request: nový httpx.AsyncClient pri každom volaní (pôvodné správanie)
+vs. zdieľaný klient s keep-alive poolom (app.services.http.get_client).
+
+Spustenie z koreňa repa:
+    python -m bench.http_pool --n 200
+
+Stub server beží lokálne cez HTTP/1.1 (bez TLS), takže rozdiel ukazuje iba TCP
+setup + réžiu klienta; pri reálnom HTTPS upstreame pribudne ešte TLS handshake.
+"""
+import json
+import time
+import asyncio
+import argparse
+import statistics
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List
+
+import httpx
+
+from app.services.http import get_client, close_clients
+
+_BODY = json.dumps({"prices": [[1700000000000 + i * 3600_000, 1.0 + i * 0.01] for i in range(240)]}).encode()
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # keep-alive
+    disable_nagle_algorithm = True
+
+    def do_GET(self):
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(_BODY)))
+        self.end_headers()
+        self.wfile.write(_BODY)
+
+    def log_message(self, *args):
+        pass
+
+def start_stub() -> ThreadingHTTPServer:
+    srv = ThreadingHTTPServer(("127.0.0.1", 0), _Handler)
+    threading.Thread(target=srv.serve_forever, daemon=True).start()
+    return srv
+
+def _summary(lat: List[float]) -> Dict[str, float]:
+    lat = sorted(lat)
+    return {
+        "n": len(lat),
+        "mean_ms": statistics.fmean(lat) * 1000,
+        "p50_ms": lat[len(lat) // 2] * 1000,
+        "p95_ms": lat[int(len(lat) * 0.95) - 1] * 1000,
+    }
+
+async def _fresh_client(url: str, n: int) -> List[float]:
+    out: List[float] = []
+    for _ in range(n):
+        t0 = time.perf_counter()
+        async with httpx.AsyncClient(timeout=60) as c:
+            r = await c.get(url)
+            r.json()
+        out.append(time.perf_counter() - t0)
+    return out
+
+async def _shared_client(url: str, n: int) -> List[float]:
+    out: List[float] = []
+    c = get_client("bench")
+    for _ in range(n):
+        t0 = time.perf_counter()
+        r = await c.get(url)
+        r.json()
+        out.append(time.perf_counter() - t0)
+    await close_clients()
+    return out
+
+def main() -> None:
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--n", type=int, default=200)
+    args = ap.parse_args()
+
+    srv = start_stub()
+    url = f"http://127.0.0.1:{srv.server_address[1]}/coins/x/market_chart"
+    try:
+        before = asyncio.run(_fresh_client(url, args.n))
+        after = asyncio.run(_shared_client(url, args.n))
+    finally:
+        srv.shutdown()
+
+    res = {"fresh_client": _summary(before), "shared_client": _summary(after)}
+    print(json.dumps(res, indent=2))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,117 @@
+"""
+Kontrola živého news indexu pri samotnom pollovaní (bez /news/top a wildcards):
+poll() beží každých --every-min minút simulovaného času cez --windows okien
+NEWS_WINDOW_H, top() sa nevolá. Halda musí obsahovať presne zhody z posledného
+okna a ref sa musí posúvať. Na konci preskočí čas o --gap-days (dlhý uptime bez
+nových správ) a poll nesmie spadnúť na OverflowError; top() potom musí sedieť
+so score_candidates.
+
+Spustenie z koreňa repa:
+    python -m bench.news_index --windows 6 --every-min 5
+
+Feedy a hodiny sú simulované (news.fetch_feeds / news._now_ts), news store ide
+do dočasnej SQLite. Vypíše JSON; pri zlyhaní skončí s kódom 1.
+"""
+import os
+import sys
+import json
+import time
+import atexit
+import random
+import shutil
+import asyncio
+import argparse
+import tempfile
+import types
+from typing import Dict, List
+
+_tmp = tempfile.mkdtemp(prefix="bench-news-")
+atexit.register(shutil.rmtree, _tmp, True)
+os.environ.setdefault("DATABASE_URL", f"sqlite:///{os.path.join(_tmp, 'bench.db')}")
+
+from app.db import async_engine, init_db
+from app.services import news
+
+def _markets(n: int) -> List[Dict]:
+    return [{"id": f"coin-{i}", "symbol": f"CN{i}", "name": f"Coinname{i}"} for i in range(n)]
+
+async def _run(args) -> Dict:
+    rng = random.Random(args.seed)
+    markets = _markets(args.coins)
+    clock = [float(int(time.time()))]
+    recent: List = []              # feed drží posledných --feed-len položiek
+    seq = [0]
+
+    def _entry(ts: float):
+        seq[0] += 1
+        picks = rng.sample(markets, rng.randint(1, 3))
+        title = " ".join((f"${m['symbol']}" if rng.random() < 0.3 else m["name"]) for m in picks)
+        return types.SimpleNamespace(id=f"e{seq[0]}", title=title, summary="", published_parsed=time.localtime(ts))
+
+    async def _feeds(feeds=None, timeout=None):
+        return [list(recent)]
+
+    real_now, real_fetch = news._now_ts, news.fetch_feeds
+    news._now_ts = lambda: clock[0]
+    news.fetch_feeds = _feeds
+    window_s = news.index.window_s
+    step_s = args.every_min * 60.0
+    polls = int(args.windows * window_s / step_s)
+    max_heap = 0; mismatched = 0; max_ref_lag = 0.0
+    try:
+        for _ in range(polls):
+            clock[0] += step_s
+            for _ in range(args.per_poll):
+                e = _entry(clock[0])
+                recent.append(e)
+            del recent[:-args.feed_len]
+            await news.poll(markets)
+            live = sum(len(rec) for ts, rec in news._entries.values() if ts >= clock[0] - window_s)
+            mismatched += len(news.index._heap) != live
+            max_heap = max(max_heap, len(news.index._heap))
+            max_ref_lag = max(max_ref_lag, clock[0] - news.index.ref)
+        heap_end = len(news.index._heap)
+
+        # dlhý uptime bez čítania: skok o gap_days a ďalší poll
+        clock[0] += args.gap_days * 86400.0
+        recent[:] = [_entry(clock[0] - 60.0 * i) for i in range(args.per_poll)]
+        gap_error = None
+        try:
+            await news.poll(markets)
+        except OverflowError as e:
+            gap_error = f"OverflowError: {e}"
+        top = {c["id"]: round(c["news_score"], 9) for c in news.top(args.coins)}
+        ref = {c["id"]: round(c["news_score"], 9)
+               for c in news.score_candidates(hours_back=int(news.NEWS_WINDOW_H), max_candidates=args.coins)}
+    finally:
+        news._now_ts, news.fetch_feeds = real_now, real_fetch
+        await async_engine.dispose()
+
+    per_window = int(window_s / step_s) * args.per_poll * 3 + args.per_poll * 3
+    res = {
+        "polls": polls, "heap_max": max_heap, "heap_end": heap_end, "heap_bound": per_window,
+        "heap_mismatched_polls": mismatched, "ref_lag_max_h": round(max_ref_lag / 3600.0, 2),
+        "gap_days": args.gap_days, "gap_error": gap_error, "heap_after_gap": len(news.index._heap),
+        "top_matches_score_candidates": top == ref,
+    }
+    res["ok"] = (max_heap <= per_window and not mismatched and max_ref_lag <= news.index.tau_s + step_s
+                 and gap_error is None and res["top_matches_score_candidates"])
+    return res
+
+def main() -> None:
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--windows", type=float, default=6.0, help="počet okien NEWS_WINDOW_H")
+    ap.add_argument("--every-min", type=float, default=5.0)
+    ap.add_argument("--per-poll", type=int, default=3, help="nové položky na poll")
+    ap.add_argument("--feed-len", type=int, default=50)
+    ap.add_argument("--coins", type=int, default=40)
+    ap.add_argument("--gap-days", type=float, default=400.0)
+    ap.add_argument("--seed", type=int, default=1)
+    args = ap.parse_args()
+    init_db()
+    res = asyncio.run(_run(args))
+    print(json.dumps(res, indent=2))
+    sys.exit(0 if res["ok"] else 1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,159 @@
+"""
+Kontrola zhody: features.extract_features a batch_indicators.batch_features
+(a builder-y v scheduler / main / dips, ktoré ich používajú) proti pôvodnému
+výpočtu cez indicators.ema / rsi / atr_from_closes (celé série, berie sa [-1]).
+
+Spustenie z koreňa repa:
+    python -m bench.parity_features --series 3000 --seed 1
+
+Náhodné série rôznych dĺžok (aj kratšie než perióda RSI/ATR), plus ploché
+série, nuly v strede a nulový posledný close. Vypíše JSON so súhrnom a prvými
+rozdielmi; pri akomkoľvek nesúlade skončí s kódom 1.
+"""
+import os
+import sys
+import json
+import math
+import random
+import argparse
+from typing import Dict, List, Optional
+
+# app.db vyžaduje DATABASE_URL pri importe; DB sa tu nepoužíva -> in-memory SQLite
+os.environ.setdefault("DATABASE_URL", "sqlite://")
+
+import numpy as np
+
+from app import scheduler, main as app_main
+from app.services import dips
+from app.services.features import extract_features
+from app.services.batch_indicators import batch_features, to_matrix
+from app.services.indicators import pct_change, ema, rsi, atr_from_closes
+
+REL_TOL = 1e-9
+ABS_TOL = 1e-12
+
+# ---------- pôvodné (baseline) výpočty ----------
+def _reference(closes: List[float]) -> Dict:
+    close = float(closes[-1])
+    n = len(closes)
+    atr = atr_from_closes(closes, period=14)
+    out = {
+        "price": close,
+        "mom_3h": float(pct_change(close, closes[-4])) if n > 4 else 0.0,
+        "mom_24h": float(pct_change(close, closes[-24])) if n > 24 else 0.0,
+        "mom_7d": float(pct_change(close, closes[-24*7])) if n > 24*7 else 0.0,
+        "atr_pct": float(atr[-1] / close) if close else 0.0,
+        "rsi": float(rsi(closes, 14)[-1]),
+        "spark": [float(x) for x in closes[-50:]],
+    }
+    for p in (10, 50, 100):
+        e = float(ema(closes, p)[-1])
+        out[f"ema{p}"] = e
+        out[f"ema_above_{p}"] = 1 if close > e else 0
+    return out
+
+def _ref_scan(id_: str, closes: List[float]) -> Optional[Dict]:
+    if len(closes) < 200:
+        return None
+    r = _reference(closes)
+    return {
+        "id": id_, "symbol": id_[:6].upper(), "name": id_, "price": r["price"], "vol24": 1.0,
+        "mom_3h": r["mom_3h"], "mom_24h": r["mom_24h"], "mom_7d": r["mom_7d"], "atr_pct": r["atr_pct"],
+        "ema50": r["ema50"], "ema100": r["ema100"], "ema_above_50": r["ema_above_50"],
+        "ema_above_100": r["ema_above_100"], "rsi": r["rsi"],
+        "trend_flag": 1 if r["mom_7d"] > 0 else 0, "spark": r["spark"],
+    }
+
+def _ref_wildcard(closes: List[float], seed: Dict) -> Optional[Dict]:
+    if len(closes) < 200:
+        return None
+    r = _reference(closes)
+    z = dict(seed)
+    z.update({k: r[k] for k in ("price", "mom_3h", "mom_24h", "mom_7d", "atr_pct", "ema50", "rsi")})
+    return z
+
+def _ref_dip(closes: List[float]) -> Optional[Dict]:
+    if not closes or len(closes) < 24*7+2:
+        return None
+    r = _reference(closes)
+    return {k: r[k] for k in ("price", "mom_3h", "mom_24h", "mom_7d", "atr_pct", "ema10", "rsi")}
+
+# ---------- porovnanie ----------
+def _same(a, b) -> bool:
+    if isinstance(a, (list, tuple)) or isinstance(b, (list, tuple)):
+        return len(a) == len(b) and all(_same(x, y) for x, y in zip(a, b))
+    if isinstance(a, (int, float, np.number)) and isinstance(b, (int, float, np.number)):
+        a, b = float(a), float(b)
+        if math.isnan(a) or math.isnan(b):
+            return math.isnan(a) and math.isnan(b)
+        return math.isclose(a, b, rel_tol=REL_TOL, abs_tol=ABS_TOL)
+    return a == b
+
+def _diff(got: Optional[Dict], want: Optional[Dict]) -> List[str]:
+    if got is None or want is None:
+        return [] if got is None and want is None else [f"got {got is not None}, want {want is not None}"]
+    keys = sorted(set(got) | set(want))
+    return [f"{k}: {got.get(k)!r} != {want.get(k)!r}" for k in keys if not _same(got.get(k), want.get(k))]
+
+def _series(rng: random.Random, i: int) -> List[float]:
+    n = i if i < 40 else rng.choice([rng.randint(1, 60), rng.randint(150, 420)])
+    kind = i % 7
+    if kind == 0:
+        return [round(rng.uniform(0.01, 100.0), 2)] * n                  # plochá
+    px = rng.uniform(1e-4, 5e4)
+    out = []
+    for _ in range(n):
+        px *= math.exp(rng.gauss(0.0, rng.choice([0.002, 0.02, 0.08])))
+        out.append(px)
+    if kind == 1 and n > 3:
+        out[rng.randrange(n - 1)] = 0.0                                   # nula v strede (lag momenta)
+    if kind == 2 and n:
+        out[-1] = 0.0                                                     # nulový close
+    if kind == 3:
+        out = [round(x, 1) for x in out]                                  # opakované hodnoty, nulový diff
+    return out
+
+def main() -> None:
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--series", type=int, default=3000)
+    ap.add_argument("--seed", type=int, default=1)
+    ap.add_argument("--show", type=int, default=10, help="koľko rozdielov vypísať")
+    args = ap.parse_args()
+    os.environ["INCREMENTAL_INDICATORS"] = "0"  # builder v scheduleri bez inkrementálneho stavu
+
+    rng = random.Random(args.seed)
+    series = [_series(rng, i) for i in range(args.series)]
+    counts = {"extract_features": 0, "batch_features": 0, "scheduler": 0, "wildcards": 0, "dips": 0}
+    mismatches: List[Dict] = []
+
+    def _check(kind: str, i: int, got, want) -> None:
+        d = _diff(got, want)
+        counts[kind] += 1
+        if d:
+            mismatches.append({"check": kind, "series": i, "n": len(series[i]), "diff": d[:5]})
+
+    for i, closes in enumerate(series):
+        if not closes:
+            _check("extract_features", i, extract_features(closes), None)
+            continue
+        _check("extract_features", i, extract_features(closes), _reference(closes))
+        prices = [[t * 3_600_000, v] for t, v in enumerate(closes)]
+        _check("scheduler", i, scheduler._enrich_from_prices(f"coin-{i}", prices), _ref_scan(f"coin-{i}", closes))
+        seed = {"id": f"coin-{i}", "headline": "x"}
+        _check("wildcards", i, app_main._enrich_from_prices(f"coin-{i}", prices, seed=seed), _ref_wildcard(closes, seed))
+        _check("dips", i, dips._metrics_from_prices(closes), _ref_dip(closes))
+
+    # batch: všetky neprázdne série v jednej matici (zarovnané doprava, NaN vľavo)
+    rows = [i for i, s in enumerate(series) if s]
+    F = batch_features(to_matrix([series[i] for i in rows]))
+    for j, i in enumerate(rows):
+        want = _reference(series[i]); want.pop("spark")
+        got = {k: F[k][j].item() for k in want}
+        _check("batch_features", i, got, want)
+
+    print(json.dumps({"series": args.series, "seed": args.seed, "checks": counts,
+                      "mismatches": len(mismatches), "first": mismatches[:args.show]}, indent=2))
+    sys.exit(1 if mismatches else 0)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,174 @@
+"""
+Latencia /run-wildcards proti lokálnemu RSS stubu:
+  before – feedy sekvenčne cez blokujúci feedparser.parse(url) (pôvodné správanie)
+  cold   – async fetch všetkých feedov naraz (200, parsovanie v threade)
+  warm   – to isté s ETag / If-Modified-Since (304, bez parsovania) a už videnými položkami
+  index  – job_news_poll už prebehol, endpoint iba číta top-N zo živého news indexu
+
+Spustenie z koreňa repa:
+    python -m bench.rss_latency --feeds 10 --delay-ms 150 --n 5
+
+Snapshot (markets + grafy) sa predvyplní syntetickými dátami, AI beží cez free
+pravidlá, takže endpoint nerobí iné sieťové volania. Okrem latencie sa meria aj
+najdlhšie zablokovanie event loopu počas requestu.
+"""
+import os
+import json
+import time
+import asyncio
+import hashlib
+import logging
+import argparse
+import tempfile
+import statistics
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from types import MappingProxyType
+from typing import Dict, List, Tuple
+
+os.environ.setdefault("PRICE_STORE", "0")
+os.environ["OPENAI_API_KEY"] = ""
+
+import feedparser
+import httpx
+
+from bench.run import make_universe, write_feeds  # nastaví DATABASE_URL pre app.db
+from app.services import news, snapshot
+from app.services.http import close_clients
+from app import main as app_main
+from app.db import async_engine, init_db
+
+def start_feed_stub(paths: List[str], delay_ms: float = 0.0) -> Tuple[ThreadingHTTPServer, List[str]]:
+    """Servíruje súbory z `paths` ako /feed{i}.xml s ETag/Last-Modified a umelou latenciou."""
+    bodies = {f"/feed{i}.xml": open(p, "rb").read() for i, p in enumerate(paths)}
+    etags = {k: '"' + hashlib.md5(v).hexdigest() + '"' for k, v in bodies.items()}
+    modified = time.strftime("%a, %d %b %Y %H:%M:%S GMT", time.gmtime())
+
+    class _Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+        disable_nagle_algorithm = True
+
+        def do_GET(self):
+            time.sleep(delay_ms / 1000.0)
+            body = bodies.get(self.path)
+            if body is None:
+                self.send_response(404); self.send_header("Content-Length", "0"); self.end_headers()
+                return
+            if self.headers.get("If-None-Match") == etags[self.path]:
+                self.send_response(304); self.send_header("ETag", etags[self.path]); self.end_headers()
+                return
+            self.send_response(200)
+            self.send_header("Content-Type", "application/rss+xml")
+            self.send_header("ETag", etags[self.path])
+            self.send_header("Last-Modified", modified)
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    class _Server(ThreadingHTTPServer):
+        request_queue_size = 256  # default 5 -> pri súbežných connectoch SYN retransmit (~1 s)
+
+    srv = _Server(("127.0.0.1", 0), _Handler)
+    threading.Thread(target=srv.serve_forever, daemon=True).start()
+    base = f"http://127.0.0.1:{srv.server_address[1]}"
+    return srv, [f"{base}/feed{i}.xml" for i in range(len(paths))]
+
+async def _legacy_candidates(markets: List[Dict], hours_back: int = 36, max_candidates: int = 12) -> List[Dict]:
+    """Pôvodný tok: feedy jeden po druhom cez blokujúci feedparser.parse(url) priamo v loope."""
+    matcher = news.get_matcher(markets)
+    hits: Dict[str, Dict] = {}
+    for url in news.FEEDS:
+        for e in feedparser.parse(url).entries:
+            matched, _ = matcher.match(news._text_of(e))
+            for cid, sym, nm in matched:
+                h = hits.setdefault(cid, {"id": cid, "symbol": sym, "name": nm, "news_hits": 0, "news_score": 0.0})
+                h["news_hits"] += 1; h["news_score"] += 1.0
+    out = sorted(hits.values(), key=lambda x: (x["news_score"], x["news_hits"]), reverse=True)
+    return out[:max_candidates]
+
+def _seed_snapshot(markets: List[Dict], charts: Dict[str, Dict]) -> None:
+    snapshot._publish(snapshot.MarketSnapshot(
+        version=1, generation=1, created_at=time.time(), markets=tuple(markets),
+        regime=1, days=10, charts=MappingProxyType(charts),
+    ))
+
+async def _call(client: httpx.AsyncClient) -> Tuple[float, float]:
+    """(latencia requestu, najdlhšia pauza event loopu počas neho) v sekundách."""
+    stall = 0.0
+    done = False
+
+    async def _ticker():
+        nonlocal stall
+        while not done:
+            t = time.perf_counter()
+            await asyncio.sleep(0.001)
+            stall = max(stall, time.perf_counter() - t - 0.001)
+
+    tick = asyncio.create_task(_ticker())
+    await asyncio.sleep(0)  # nech ticker beží ešte pred requestom
+    t0 = time.perf_counter()
+    r = await client.get("/run-wildcards")
+    lat = time.perf_counter() - t0
+    done = True
+    await tick
+    assert r.json().get("ok"), r.text
+    return lat, stall
+
+def _reset_news() -> None:
+    news._feed_cache.clear(); news._entries.clear()
+    news.index = news.NewsIndex(); news.LAST_POLL = None
+
+async def _run(n: int, legacy: bool, warmup: bool, indexed: bool = False) -> List[Tuple[float, float]]:
+    _reset_news()
+    app_main.fetch_candidates_from_rss = _legacy_candidates if legacy else news.fetch_candidates_from_rss
+    out: List[Tuple[float, float]] = []
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app_main.app), base_url="http://bench") as c:
+        if indexed:
+            await news.poll(list(snapshot.current().markets))
+        if warmup:
+            await _call(c)
+        for _ in range(n):
+            if not warmup:
+                _reset_news()
+            out.append(await _call(c))
+    await close_clients()
+    await async_engine.dispose()
+    return out
+
+def _summary(rows: List[Tuple[float, float]]) -> Dict[str, float]:
+    lat = [r[0] for r in rows]; stall = [r[1] for r in rows]
+    return {"n": len(rows), "p50_ms": statistics.median(lat) * 1000, "max_ms": max(lat) * 1000,
+            "loop_stall_max_ms": max(stall) * 1000}
+
+def main() -> None:
+    logging.getLogger("httpx").setLevel(logging.WARNING)
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--coins", type=int, default=200)
+    ap.add_argument("--feeds", type=int, default=10)
+    ap.add_argument("--entries", type=int, default=30)
+    ap.add_argument("--delay-ms", type=float, default=150.0, help="umelá latencia stubu na request")
+    ap.add_argument("--n", type=int, default=5)
+    args = ap.parse_args()
+
+    init_db()
+    markets, charts = make_universe(args.coins)
+    _seed_snapshot(markets, charts)
+    with tempfile.TemporaryDirectory() as tmp:
+        srv, urls = start_feed_stub(write_feeds(markets, tmp, feeds=args.feeds, entries=args.entries), args.delay_ms)
+        news.FEEDS = urls
+        try:
+            res = {
+                "before": _summary(asyncio.run(_run(args.n, legacy=True, warmup=False))),
+                "cold": _summary(asyncio.run(_run(args.n, legacy=False, warmup=False))),
+                "warm_304": _summary(asyncio.run(_run(args.n, legacy=False, warmup=True))),
+                "index": _summary(asyncio.run(_run(args.n, legacy=False, warmup=True, indexed=True))),
+            }
+        finally:
+            srv.shutdown()
+    print(json.dumps(res, indent=2))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,250 @@
+"""
+Mikro-benchmarky indikátorov, feature extrakcie, scoringu, dips a RSS kandidátov
+na seedovaných syntetických dátach.
+
+Spustenie z koreňa repa:
+    python -m bench.run                         # 80, 200, 1000, 5000 coinov
+    python -m bench.run --sizes 80 200 --out bench/results/dev.json
+    python -m bench.run --compare bench/results/v1.json
+
+Pre každý prípad: wall time (medián z --repeat), tracemalloc peak + počet
+alokácií (samostatný beh) a throughput v coinoch/s. Výsledok ide do JSON.
+"""
+import os
+import atexit
+import sys
+import json
+import time
+import random
+import shutil
+import asyncio
+import argparse
+import platform
+import statistics
+import subprocess
+import tempfile
+import tracemalloc
+from datetime import datetime, timezone
+from typing import Callable, Dict, List, Tuple
+
+# app.db vyžaduje DATABASE_URL už pri importe; news store potrebuje súbor (nie :memory: per thread).
+# Dočasný adresár sa zmaže pri skončení procesu.
+if "DATABASE_URL" not in os.environ:
+    _tmp_db = tempfile.mkdtemp(prefix="bench-")
+    atexit.register(shutil.rmtree, _tmp_db, True)
+    os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(_tmp_db, 'bench.db')}"
+os.environ.setdefault("INCREMENTAL_INDICATORS", "0")
+os.environ.setdefault("PRICE_STORE", "0")
+
+import numpy as np
+from sqlalchemy import delete
+
+from app.services import indicators, batch_indicators, scorer, dips, news
+from app.services.features import extract_features
+from app.services.http import close_clients
+from app import scheduler, main as app_main
+from app.db import SessionLocal, NewsEntry, async_engine, init_db
+
+HOURS = 240
+DEFAULT_SIZES = (80, 200, 1000, 5000)
+
+# ---------- syntetické dáta ----------
+def make_universe(n: int, seed: int = 42) -> Tuple[List[Dict], Dict[str, Dict]]:
+    """markets (ako /coins/markets) + charts {id: {"prices": [[ts, close], ...]}}."""
+    rng = np.random.default_rng(seed)
+    t0 = 1_700_000_000_000
+    ts = t0 + np.arange(HOURS) * 3600_000
+    drift = rng.normal(0.0, 0.002, size=(n, 1))
+    vol = rng.uniform(0.005, 0.04, size=(n, 1))
+    steps = rng.normal(0.0, 1.0, size=(n, HOURS)) * vol + drift
+    closes = 10 ** rng.uniform(-2, 4, size=(n, 1)) * np.exp(np.cumsum(steps, axis=1))
+    markets: List[Dict] = []
+    charts: Dict[str, Dict] = {}
+    for i in range(n):
+        cid = f"coin-{i}"
+        markets.append({
+            "id": cid, "symbol": f"c{i}", "name": f"Coin{i} Token",
+            "current_price": float(closes[i, -1]),
+            "total_volume": float(10 ** rng.uniform(6, 10)),
+            "price_change_percentage_24h_in_currency": float((closes[i, -1] / closes[i, -24] - 1) * 100),
+        })
+        charts[cid] = {"prices": np.column_stack([ts, closes[i]]).tolist()}
+    return markets, charts
+
+def write_feeds(markets: List[Dict], d: str, feeds: int = 10, entries: int = 30, seed: int = 7) -> List[str]:
+    """Lokálne RSS súbory s náhodnými zmienkami symbolov/mien z markets."""
+    rnd = random.Random(seed)
+    now = time.gmtime()
+    pub = time.strftime("%a, %d %b %Y %H:%M:%S GMT", now)
+    words = ["market", "rally", "update", "price", "network", "launch", "whales", "bitcoin"]
+    paths: List[str] = []
+    for f in range(feeds):
+        items = []
+        for e in range(entries):
+            m = rnd.choice(markets)
+            title = f"{m['name']} {rnd.choice(words)} ${m['symbol'].upper()} {rnd.choice(words)}"
+            summary = " ".join(rnd.choice(words) for _ in range(30)) + f" {m['symbol']}"
+            items.append(
+                f"<item><title>{title}</title><description>{summary}</description>"
+                f"<link>https://example.com/{f}/{e}</link><guid>{f}-{e}</guid><pubDate>{pub}</pubDate></item>"
+            )
+        path = os.path.join(d, f"feed{f}.xml")
+        with open(path, "w", encoding="utf-8") as fh:
+            fh.write('<?xml version="1.0"?><rss version="2.0"><channel><title>t</title>'
+                     + "".join(items) + "</channel></rss>")
+        paths.append(path)
+    return paths
+
+_stubs: List = []
+
+def _feed_urls(paths: List[str]) -> List[str]:
+    """Feedy cez lokálny HTTP stub (ETag -> po prvom behu 304)."""
+    from bench.rss_latency import start_feed_stub
+    srv, urls = start_feed_stub(paths)
+    _stubs.append(srv)
+    return urls
+
+def _reset_news() -> None:
+    """Zabudne podmienený GET, videné položky (pamäť aj news_entries) a živý index."""
+    news._feed_cache.clear()
+    news._entries.clear()
+    news._loaded = False
+    news.index = news.NewsIndex()
+    db = SessionLocal()
+    try:
+        db.execute(delete(NewsEntry))
+        db.commit()
+    finally:
+        db.close()
+
+# ---------- meranie ----------
+def measure(fn: Callable[[], object], repeat: int) -> Dict[str, float]:
+    times: List[float] = []
+    for _ in range(repeat):
+        t = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - t)
+    tracemalloc.start()
+    fn()
+    _, peak = tracemalloc.get_traced_memory()
+    snap = tracemalloc.take_snapshot()
+    tracemalloc.stop()
+    blocks = sum(s.count for s in snap.statistics("filename"))
+    return {
+        "wall_s": statistics.median(times),
+        "wall_min_s": min(times),
+        "peak_kib": peak / 1024,
+        "live_blocks": blocks,
+    }
+
+def cases(n: int, feeds_dir: str) -> Dict[str, Tuple[Callable[[], object], int]]:
+    """name -> (funkcia, počet spracovaných coinov)."""
+    markets, charts = make_universe(n)
+    series = [[p[1] for p in charts[m["id"]]["prices"]] for m in markets]
+    matrix = batch_indicators.to_matrix(series, HOURS)
+    rows = [scheduler._enrich_from_prices(m["id"], charts[m["id"]]["prices"], m["total_volume"]) for m in markets]
+    weights = {"w1": 0.20, "w2": 0.25, "w3": 0.15, "w4": 0.20, "w5": 0.10, "w6": 0.10}
+    grid = scorer.weight_matrix([dict(zip(scorer.WEIGHT_KEYS, w)) for w in np.random.default_rng(1).random((1000, 6))])
+    feed_urls = _feed_urls(write_feeds(markets, feeds_dir))
+
+    async def _rss_once():
+        try:
+            return await news.fetch_candidates_from_rss(markets, hours_back=36, max_candidates=12)
+        finally:
+            await close_clients()  # klient aj DB pool sú viazané na loop z asyncio.run
+            await async_engine.dispose()
+
+    def _rss():
+        news.FEEDS = feed_urls
+        return asyncio.run(_rss_once())
+
+    def _rss_cold():
+        # bez ETag cache a seen store: každé opakovanie stiahne, sparsuje a spáruje všetko
+        _reset_news()
+        return _rss()
+
+    def _rss_warm():
+        # všetky feedy 304, položky už videné (steady state pollera)
+        if not all(u in news._feed_cache for u in feed_urls):
+            _rss_cold()
+        return _rss()
+
+    return {
+        "indicators.ema50": (lambda: [indicators.ema(s, 50) for s in series], n),
+        "indicators.rsi14": (lambda: [indicators.rsi(s, 14) for s in series], n),
+        "indicators.atr14": (lambda: [indicators.atr_from_closes(s, 14) for s in series], n),
+        "batch_indicators.batch_features": (lambda: batch_indicators.batch_features(matrix), n),
+        "features.extract_features": (lambda: [extract_features(s) for s in series], n),
+        "scheduler._enrich_from_prices": (
+            lambda: [scheduler._enrich_from_prices(m["id"], charts[m["id"]]["prices"], 1.0) for m in markets], n),
+        "main._enrich_from_prices": (
+            lambda: [app_main._enrich_from_prices(m["id"], charts[m["id"]]["prices"], {"id": m["id"]}) for m in markets], n),
+        "dips._metrics_from_prices": (lambda: [dips._metrics_from_prices(s) for s in series], n),
+        "scorer.compute_scores": (lambda: scorer.compute_scores([dict(r) for r in rows], weights), n),
+        "scorer.score_batch_1000w_top10": (
+            lambda: scorer.top_k(scorer.score_batch(scorer.normalize(scorer.feature_matrix(rows)), grid), 10), n),
+        "dips.pick_dips": (lambda: dips.pick_dips(markets, charts, count=2, min_vol24=0.0), n),
+        "news.fetch_candidates_from_rss": (_rss_cold, n),
+        "news.fetch_candidates_from_rss_warm": (_rss_warm, n),
+    }
+
+def _git_rev() -> str:
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], stderr=subprocess.DEVNULL).decode().strip()
+    except Exception:
+        return ""
+
+def compare(cur: Dict, old_path: str) -> None:
+    with open(old_path, "r", encoding="utf-8") as f:
+        old = json.load(f)
+    prev = {(r["case"], r["coins"]): r for r in old.get("results", [])}
+    print(f"\n{'case':40s} {'coins':>6s} {'wall':>8s} {'peak':>8s}")
+    for r in cur["results"]:
+        o = prev.get((r["case"], r["coins"]))
+        if not o:
+            continue
+        print(f"{r['case']:40s} {r['coins']:6d} {r['wall_s'] / o['wall_s']:7.2f}x {r['peak_kib'] / max(o['peak_kib'], 1e-9):7.2f}x")
+
+def main() -> None:
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--sizes", type=int, nargs="+", default=list(DEFAULT_SIZES))
+    ap.add_argument("--repeat", type=int, default=3)
+    ap.add_argument("--only", nargs="*", default=None, help="iba prípady obsahujúce tieto reťazce")
+    ap.add_argument("--out", default="bench/results/latest.json")
+    ap.add_argument("--compare", default=None, help="starší JSON na porovnanie (pomer nový/starý)")
+    args = ap.parse_args()
+
+    init_db()
+    results: List[Dict] = []
+    with tempfile.TemporaryDirectory() as tmp:
+        for n in args.sizes:
+            feeds_dir = os.path.join(tmp, str(n))
+            os.makedirs(feeds_dir, exist_ok=True)
+            for name, (fn, coins) in cases(n, feeds_dir).items():
+                if args.only and not any(s in name for s in args.only):
+                    continue
+                m = measure(fn, args.repeat)
+                m.update({"case": name, "coins": coins, "throughput_coins_s": coins / m["wall_s"] if m["wall_s"] else None})
+                results.append(m)
+                print(f"{name:40s} n={coins:5d} {m['wall_s'] * 1000:10.2f} ms  peak {m['peak_kib']:10.1f} KiB", flush=True)
+            while _stubs:
+                _stubs.pop().shutdown()
+
+    out = {
+        "created_at": datetime.now(timezone.utc).isoformat(),
+        "git_rev": _git_rev(),
+        "python": sys.version.split()[0],
+        "numpy": np.__version__,
+        "platform": platform.platform(),
+        "repeat": args.repeat,
+        "results": results,
+    }
+    os.makedirs(os.path.dirname(args.out) or ".", exist_ok=True)
+    with open(args.out, "w", encoding="utf-8") as f:
+        json.dump(out, f, indent=2)
+    print(f"-> {args.out}")
+    if args.compare:
+        compare(out, args.compare)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,135 @@
+"""
+Kontrola single-flight v coingecko.py: coingecko._get_json je nahradený
+počítadlom (bez siete), --callers súbežných volajúcich musí vyvolať práve
+jedno upstream volanie.
+
+Spustenie z koreňa repa:
+    python -m bench.single_flight --callers 50
+
+Prípady:
+  chart        – get_market_chart + get_btc_daily na ten istý kľúč
+  markets      – get_markets_top200_cached pri prázdnej cache
+  error        – prvé volanie zlyhá: chybu dostane každý čakajúci, nič neostane v _inflight
+                 a ďalšie volanie ide znova na upstream (chyba sa necachuje)
+  cancel       – zrušenie jedného volajúceho nezruší request ostatným
+  distinct     – rôzne kľúče sa nezlučujú
+Vypíše JSON; pri zlyhaní niektorého prípadu skončí s kódom 1.
+"""
+import os
+import sys
+import json
+import asyncio
+import argparse
+from typing import Callable, Dict, List
+
+# app.db vyžaduje DATABASE_URL pri importe; DB sa tu nepoužíva -> in-memory SQLite
+os.environ.setdefault("DATABASE_URL", "sqlite://")
+
+from app.services import coingecko as cg
+
+class _Upstream:
+    """Fake _get_json: počíta volania, odpovedá po `delay_s` (alebo vyhodí `fail`)."""
+    def __init__(self, delay_s: float, fail: Exception = None) -> None:
+        self.delay_s = delay_s
+        self.fail = fail
+        self.urls: List[str] = []
+
+    async def __call__(self, url: str, tries: int = 4, base_sleep: float = 1.0):
+        self.urls.append(url)
+        await asyncio.sleep(self.delay_s)
+        if self.fail is not None:
+            raise self.fail
+        if "/coins/markets" in url:
+            return [{"id": f"coin-{i}", "symbol": f"c{i}"} for i in range(200)]
+        return {"prices": [[0, 1.0]], "url": url}
+
+def _reset() -> None:
+    cg._inflight.clear()
+    cg._markets_cache.update({"ts": 0.0, "data": None, "last_error": None, "last_attempt": 0.0})
+
+async def _case(fake: _Upstream, body: Callable) -> Dict:
+    _reset()
+    real = cg._get_json
+    cg._get_json = fake
+    try:
+        res = await body()
+    finally:
+        cg._get_json = real
+    res["upstream_calls"] = len(fake.urls)
+    res["inflight_left"] = len(cg._inflight)
+    return res
+
+async def _chart(n: int, delay_s: float) -> Dict:
+    fake = _Upstream(delay_s)
+    async def body():
+        calls = [cg.get_market_chart("bitcoin", 365) for _ in range(n - n // 2)]
+        calls += [cg.get_btc_daily(365) for _ in range(n // 2)]
+        out = await asyncio.gather(*calls)
+        return {"same_result": all(r is out[0] for r in out)}
+    res = await _case(fake, body)
+    res["ok"] = res["upstream_calls"] == 1 and res["same_result"] and not res["inflight_left"]
+    return res
+
+async def _markets(n: int, delay_s: float) -> Dict:
+    fake = _Upstream(delay_s)
+    async def body():
+        out = await asyncio.gather(*(cg.get_markets_top200_cached("usd") for _ in range(n)))
+        return {"same_result": all(r is out[0] for r in out), "size": len(out[0])}
+    res = await _case(fake, body)
+    res["ok"] = res["upstream_calls"] == 1 and res["same_result"] and res["size"] == 200 and not res["inflight_left"]
+    return res
+
+async def _error(n: int, delay_s: float) -> Dict:
+    boom = RuntimeError("upstream down")
+    fake = _Upstream(delay_s, fail=boom)
+    async def body():
+        out = await asyncio.gather(*(cg.get_market_chart("bitcoin", 30) for _ in range(n)), return_exceptions=True)
+        first_calls = len(fake.urls)
+        left = len(cg._inflight)
+        fake.fail = None
+        again = await cg.get_market_chart("bitcoin", 30)
+        return {"errors": sum(1 for r in out if r is boom), "first_calls": first_calls,
+                "inflight_after_error": left, "retry_ok": "prices" in again}
+    res = await _case(fake, body)
+    res["ok"] = (res["errors"] == n and res["first_calls"] == 1 and not res["inflight_after_error"]
+                 and res["retry_ok"] and res["upstream_calls"] == 2)
+    return res
+
+async def _cancel(n: int, delay_s: float) -> Dict:
+    fake = _Upstream(delay_s)
+    async def body():
+        tasks = [asyncio.ensure_future(cg.get_market_chart("ethereum", 10)) for _ in range(n)]
+        await asyncio.sleep(delay_s / 4)
+        tasks[0].cancel()
+        out = await asyncio.gather(*tasks, return_exceptions=True)
+        return {"cancelled": sum(1 for r in out if isinstance(r, asyncio.CancelledError)),
+                "delivered": sum(1 for r in out if isinstance(r, dict))}
+    res = await _case(fake, body)
+    res["ok"] = res["upstream_calls"] == 1 and res["cancelled"] == 1 and res["delivered"] == n - 1
+    return res
+
+async def _distinct(n: int, delay_s: float) -> Dict:
+    fake = _Upstream(delay_s)
+    ids = [f"coin-{i % 5}" for i in range(n)]
+    async def body():
+        await asyncio.gather(*(cg.get_market_chart(cid, 10) for cid in ids))
+        return {"keys": len(set(ids))}
+    res = await _case(fake, body)
+    res["ok"] = res["upstream_calls"] == res["keys"]
+    return res
+
+async def _run(n: int, delay_s: float) -> Dict:
+    return {name: await fn(n, delay_s) for name, fn in
+            (("chart", _chart), ("markets", _markets), ("error", _error), ("cancel", _cancel), ("distinct", _distinct))}
+
+def main() -> None:
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--callers", type=int, default=50)
+    ap.add_argument("--delay-ms", type=float, default=50.0, help="odozva fake upstreamu")
+    args = ap.parse_args()
+    res = asyncio.run(_run(max(2, args.callers), args.delay_ms / 1000.0))
+    print(json.dumps(res, indent=2))
+    sys.exit(0 if all(r["ok"] for r in res.values()) else 1)
+
+if __name__ == "__main__":
+    main()